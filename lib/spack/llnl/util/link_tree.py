@@ -24,13 +24,16 @@
 ##############################################################################
 """LinkTree class for setting up trees of symbolic links."""
 
+import errno
 import os
 import shutil
+import stat
 import filecmp
+from multiprocessing.pool import ThreadPool
 
 from llnl.util.filesystem import traverse_tree, mkdirp, touch
 
-__all__ = ['LinkTree']
+__all__ = ['LinkTree', 'link_files']
 
 empty_file_name = '.spack-empty'
 
@@ -53,6 +56,38 @@ class LinkTree(object):
 
         self._root = source_root
 
+    def get_file_map(self, ignore=None):
+        """Walk the source tree once and return what it contains.
+
+        Symbolic links, including links to directories, count as files,
+        as in ``merge()``.  Nothing in the destination is looked at.
+
+        Args:
+            ignore (function): called with the path of each entry
+                relative to the source root; entries for which it
+                returns True are skipped, with all their contents
+
+        Returns:
+            tuple: ``(dirs, files)``, two lists of paths relative to the
+            source root.  ``dirs`` is in pre-order, so that parents come
+            before their subdirectories.
+        """
+        dirs, files = [], []
+        stack = ['']
+        while stack:
+            rel_dir = stack.pop()
+            for name, is_dir in sorted(_list_dir(
+                    os.path.join(self._root, rel_dir))):
+                rel_path = os.path.join(rel_dir, name)
+                if ignore and ignore(rel_path):
+                    continue
+                if is_dir:
+                    dirs.append(rel_path)
+                    stack.append(rel_path)
+                else:
+                    files.append(rel_path)
+        return dirs, files
+
     def find_conflict(self, dest_root, **kwargs):
         """Returns the first file in dest that conflicts with src"""
         kwargs['follow_nonexisting'] = False
@@ -103,9 +138,12 @@ class LinkTree(object):
         """Unlink all files in dest that exist in src.
 
         Unlinks directories in dest if they are empty.
+        If links_only is False, files that are not symbolic links are
+        removed too: use it for trees made of hard links or copies.
 
         """
         kwargs['order'] = 'post'
+        links_only = kwargs.pop('links_only', True)
         for src, dest in traverse_tree(self._root, dest_root, **kwargs):
             if os.path.isdir(src):
                 # Skip non-existing links.
@@ -125,10 +163,54 @@ class LinkTree(object):
                     os.remove(marker)
 
             elif os.path.exists(dest):
-                if not os.path.islink(dest):
+                if links_only and not os.path.islink(dest):
                     raise ValueError("%s is not a link tree!" % dest)
-                # remove if dest is a hardlink/symlink to src; this will only
-                # be false if two packages are merged into a prefix and have a
-                # conflicting file
+                # remove if dest is a link to (or a copy of) src; this will
+                # only be false if two packages are merged into a prefix and
+                # have a conflicting file
                 if filecmp.cmp(src, dest, shallow=True):
                     os.remove(dest)
+
+
+def link_files(pairs, link=os.symlink, jobs=1):
+    """Create a link for each ``(src, dest)`` pair, using ``jobs`` threads.
+
+    The directories containing the links must already exist.  Linking is
+    mostly waiting on the filesystem, so threads are enough to have many
+    requests in flight at once on network filesystems.
+    """
+    pairs = list(pairs)
+    if jobs <= 1 or len(pairs) < 2:
+        for src, dest in pairs:
+            link(src, dest)
+        return
+
+    def link_pair(pair):
+        link(*pair)
+
+    pool = ThreadPool(min(jobs, len(pairs)))
+    try:
+        pool.map(link_pair, pairs, chunksize=64)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _list_dir(path):
+    """Yield ``(name, is_dir)`` for the entries of path, without following
+    symbolic links.  Uses ``os.scandir`` where available, which gets the
+    type of each entry without an extra ``stat`` call."""
+    scandir = getattr(os, 'scandir', None)
+    if scandir is not None:
+        for entry in scandir(path):
+            yield entry.name, entry.is_dir(follow_symlinks=False)
+        return
+
+    for name in os.listdir(path):
+        try:
+            mode = os.lstat(os.path.join(path, name)).st_mode
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                continue
+            raise
+        yield name, stat.S_ISDIR(mode)
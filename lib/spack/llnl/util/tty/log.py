@@ -24,6 +24,8 @@
 ##############################################################################
 """Utility classes for logging the output of blocks of code.
 """
+import codecs
+import errno
 import multiprocessing
 import os
 import re
@@ -36,8 +38,9 @@ from six import StringIO
 
 import llnl.util.tty as tty
 
-# Use this to strip escape sequences
-_escape = re.compile(r'\x1b[^m]*m|\x1b\[?1034h')
+# Use this to strip escape sequences.  Sequences never span lines, so
+# that the pattern can be applied to whole buffers of lines at once.
+_escape = re.compile(r'\x1b[^m\n]*m|\x1b\[?1034h')
 
 # control characters for enabling/disabling echo
 #
@@ -47,12 +50,30 @@ _escape = re.compile(r'\x1b[^m]*m|\x1b\[?1034h')
 xon, xoff = '\x11\n', '\x13\n'
 control = re.compile('(\x11\n|\x13\n)')
 
+#: Bytes read at once from the pipe by the writer daemon
+_chunk_size = 64 * 1024
+
+#: The writer daemon waits for the end of a line before writing output,
+#: unless this many bytes are already waiting.
+_max_pending = 1024 * 1024
+
 
 def _strip(line):
     """Strip color and control characters from a line."""
     return _escape.sub('', line)
 
 
+def _select(rlist):
+    """``select.select()`` on rlist without timeout, retried when it is
+    interrupted by a signal (python 2 does not do it by itself)."""
+    while True:
+        try:
+            return select.select(rlist, [], [])[0]
+        except (select.error, OSError) as e:
+            if e.args[0] != errno.EINTR:
+                raise
+
+
 class keyboard_input(object):
     """Context manager to disable line editing and echoing.
 
@@ -430,59 +451,93 @@ class log_output(object):
         sys.stdout.flush()
 
     def _writer_daemon(self, stdin):
-        """Daemon that writes output to the log file and stdout."""
-        # Use line buffering (3rd param = 1) since Python 3 has a bug
-        # that prevents unbuffered text I/O.
-        in_pipe = os.fdopen(self.read_fd, 'r', 1)
+        """Daemon that writes output to the log file and stdout.
+
+        The daemon sleeps in ``select()`` until there is output or a
+        keypress, then reads all the output available (up to
+        ``_chunk_size`` bytes) at once.  Control characters and escape
+        sequences are handled for the whole buffer, and each buffer is
+        written with a single call to the log file and to stdout.
+        """
+        # Read the pipe at the OS level: a Python file object would buffer
+        # data that select() can't see.
+        in_fd = self.read_fd
         os.close(self.write_fd)
 
+        if sys.version_info[0] < 3:
+            decode = None
+        else:
+            decode = codecs.getincrementaldecoder('utf-8')(
+                errors='replace').decode
+
         echo = self.echo        # initial echo setting, user-controllable
         force_echo = False      # parent can force echo for certain output
 
         # list of streams to select from
-        istreams = [in_pipe, stdin] if stdin else [in_pipe]
+        istreams = [in_fd, stdin] if stdin else [in_fd]
 
         log_file = self.log_file
+        pending = ''            # output received after the last newline
         try:
             with keyboard_input(stdin):
                 while True:
-                    # Without the last parameter (timeout) select will
-                    # wait until at least one of the two streams are
-                    # ready. This may cause the function to hang.
-                    rlist, _, xlist = select.select(istreams, [], [], 0)
+                    rlist = _select(istreams)
 
                     # Allow user to toggle echo with 'v' key.
                     # Currently ignores other chars.
                     if stdin in rlist:
-                        if stdin.read(1) == 'v':
+                        key = stdin.read(1)
+                        if key == 'v':
                             echo = not echo
+                        elif not key:
+                            istreams.remove(stdin)  # closed, stop watching
 
                     # Handle output from the with block process.
-                    if in_pipe in rlist:
-                        # If we arrive here it means that in_pipe was
-                        # ready for reading : it should never happen that
-                        # line is false-ish
-                        line = in_pipe.readline()
-                        if not line:
-                            break  # EOF
-
-                        # find control characters and strip them.
-                        controls = control.findall(line)
-                        line = re.sub(control, '', line)
-
-                        # Echo to stdout if requested or forced
+                    if in_fd not in rlist:
+                        continue
+
+                    # EOF is an empty read: the decoded data can also be
+                    # empty when the read ends inside a multibyte character
+                    data = os.read(in_fd, _chunk_size)
+                    eof = not data
+                    if decode:
+                        data = decode(data, final=eof)
+
+                    # Control characters and escape sequences end with a
+                    # newline, or before one: only write complete lines.
+                    pending += data
+                    if not eof:
+                        end = pending.rfind('\n') + 1
+                        if not end and len(pending) < _max_pending:
+                            continue
+                        if not end:
+                            end = len(pending)
+                    else:
+                        end = len(pending)   # EOF: write what is left
+
+                    output, pending = pending[:end], pending[end:]
+                    echoed, logged = [], []
+                    for i, part in enumerate(control.split(output)):
+                        if i % 2:
+                            # odd parts are the control characters
+                            force_echo = (part == xon)
+                            continue
                         if echo or force_echo:
-                            sys.stdout.write(line)
-                            sys.stdout.flush()
+                            echoed.append(part)
+                        logged.append(part)
+
+                    # Echo to stdout if requested or forced
+                    echoed = ''.join(echoed)
+                    if echoed:
+                        sys.stdout.write(echoed)
+                        sys.stdout.flush()
 
-                        # Stripped output to log file.
-                        log_file.write(_strip(line))
-                        log_file.flush()
+                    # Stripped output to log file.
+                    log_file.write(_strip(''.join(logged)))
+                    log_file.flush()
 
-                        if xon in controls:
-                            force_echo = True
-                        if xoff in controls:
-                            force_echo = False
+                    if eof:
+                        break
         except BaseException:
             tty.error("Exception occurred in writer daemon!")
             traceback.print_exc()
@@ -492,6 +547,7 @@ class log_output(object):
             if self.write_log_in_parent:
                 self.child.send(log_file.getvalue())
             log_file.close()
+            os.close(in_fd)
 
         # send echo value back to the parent so it can be preserved.
         self.child.send(echo)
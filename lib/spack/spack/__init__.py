@@ -28,6 +28,7 @@ import os
 import sys
 import tempfile
 import getpass
+import types
 from llnl.util.filesystem import *
 import llnl.util.tty as tty
 
@@ -76,195 +77,318 @@ gpg_path           = join_path(opt_path, "spack", "gpg")
 
 
 #-----------------------------------------------------------------------------
-# Initial imports (only for use in this file -- see __all__ below.)
+# Lazily initialized attributes.
+#
+# Importing the modules at the core of Spack and setting up the objects
+# below takes most of the time of a short command like 'spack location',
+# so nothing is done until an attribute is used: the first access to
+# e.g. 'spack.repo' calls the function registered for it, and stores the
+# result in the module like a regular attribute.
+#
+# This also means that no spack submodule is imported here: they would
+# bind the module object that is replaced at the end of this file.
 #-----------------------------------------------------------------------------
-# These imports depend on the paths above, or on each other
-# Group them here so it's easy to understand the order.
-# TODO: refactor this stuff to be more init order agnostic.
-import spack.repository
-import spack.error
-import spack.config
-import spack.fetch_strategy
-from spack.file_cache import FileCache
-from spack.abi import ABI
-from spack.concretize import DefaultConcretizer
-from spack.version import Version
-from spack.util.path import canonicalize_path
-from spack.package_prefs import PackageTesting
+_lazy_attributes = {}
+
+
+def _lazy(*names):
+    """Register the decorated function to compute the attributes ``names``.
+
+    The function takes no arguments and returns a dictionary with the
+    value of (at least) each of ``names``.
+    """
+    def _register(func):
+        for name in names:
+            _lazy_attributes[name] = func
+        return func
+    return _register
+
+
+@_lazy('spack_version')
+def _init_version():
+    from spack.version import Version
+    return {'spack_version': Version("0.10.0")}
+
+
+@_lazy('misc_cache_path', 'misc_cache')
+def _init_misc_cache():
+    # cache for miscellaneous stuff. Repositories save their indexes in
+    # it, so it must be set up before them.
+    import spack.config
+    from spack.file_cache import FileCache
+    from spack.util.path import canonicalize_path
+
+    path = canonicalize_path(
+        spack.config.get_config('config').get(
+            'misc_cache', join_path(user_config_path, 'cache')))
+    return {'misc_cache_path': path, 'misc_cache': FileCache(path)}
+
+
+@_lazy('repo')
+def _init_repo():
+    # Set up the default packages database.
+    import spack.error
+    import spack.repository
+    try:
+        repo = spack.repository.RepoPath()
+    except spack.error.SpackError as e:
+        tty.die('while initializing Spack RepoPath:', e.message)
+    sys.meta_path.append(repo)
+    return {'repo': repo}
 
-#-----------------------------------------------------------------------------
-# Initialize various data structures & objects at the core of Spack.
-#-----------------------------------------------------------------------------
-# Version information
-spack_version = Version("0.10.0")
 
+class _RepoFinder(object):
+    """Import hook for ``spack.pkg`` modules imported before ``spack.repo``
+    exists: it creates the repository, which then handles the import.
+    """
+
+    def find_module(self, fullname, path=None):
+        if fullname.split('.')[:2] != ['spack', 'pkg']:
+            return None
+        return sys.modules[__name__].repo.find_module(fullname, path)
 
-# Set up the default packages database.
-try:
-    repo = spack.repository.RepoPath()
-    sys.meta_path.append(repo)
-except spack.error.SpackError as e:
-    tty.die('while initializing Spack RepoPath:', e.message)
 
+sys.meta_path.append(_RepoFinder())
 
-# Tests ABI compatibility between packages
-abi = ABI()
 
+@_lazy('abi', 'concretizer', 'package_testing')
+def _init_policies():
+    from spack.abi import ABI
+    from spack.concretize import DefaultConcretizer
+    from spack.package_prefs import PackageTesting
+    return {
+        # Tests ABI compatibility between packages
+        'abi': ABI(),
+        # This controls how things are concretized in spack.
+        # Replace it with a subclass if you want different
+        # policies.
+        'concretizer': DefaultConcretizer(),
+        # Needed for test dependencies
+        'package_testing': PackageTesting(),
+    }
 
-# This controls how things are concretized in spack.
-# Replace it with a subclass if you want different
-# policies.
-concretizer = DefaultConcretizer()
 
 #-----------------------------------------------------------------------------
 # config.yaml options
 #-----------------------------------------------------------------------------
-_config = spack.config.get_config('config')
-
-
-# Path where downloaded source code is cached
-cache_path = canonicalize_path(
-    _config.get('source_cache', join_path(var_path, "cache")))
-fetch_cache = spack.fetch_strategy.FsCache(cache_path)
-
-
-# cache for miscellaneous stuff.
-misc_cache_path = canonicalize_path(
-    _config.get('misc_cache', join_path(user_config_path, 'cache')))
-misc_cache = FileCache(misc_cache_path)
+@_lazy('cache_path', 'fetch_cache')
+def _init_fetch_cache():
+    # Path where downloaded source code is cached
+    import spack.config
+    import spack.fetch_strategy
+    from spack.util.path import canonicalize_path
+
+    path = canonicalize_path(
+        spack.config.get_config('config').get(
+            'source_cache', join_path(var_path, "cache")))
+    return {'cache_path': path,
+            'fetch_cache': spack.fetch_strategy.FsCache(path)}
+
+
+@_lazy('template_dirs', 'insecure', 'url_fetch_method', 'do_checksum',
+       'dirty', 'build_jobs', 'concretization_cache_size', 'install_jobs')
+def _init_config_options():
+    import spack.config
+    from spack.util.path import canonicalize_path
+
+    config = spack.config.get_config('config')
+    return {
+        # Directories where to search for templates
+        'template_dirs': [
+            canonicalize_path(x) for x in config['template_dirs']],
+
+        # If this is enabled, tools that use SSL should not verify
+        # certifiates. e.g., curl should use the -k option.
+        'insecure': not config.get('verify_ssl', True),
+
+        # How URLFetchStrategy downloads archives: by running 'curl', or
+        # with urllib in-process, checksumming them while they are
+        # downloaded.
+        'url_fetch_method': config.get('url_fetch_method', 'curl'),
+
+        # Whether spack should allow installation of unsafe versions of
+        # software. "Unsafe" versions are ones it doesn't have a checksum
+        # for.
+        'do_checksum': config.get('checksum', True),
+
+        # If this is True, spack will not clean the environment to remove
+        # potentially harmful variables before builds.
+        'dirty': config.get('dirty', False),
+
+        # The number of jobs to use when building in parallel.
+        # By default, use all cores on the machine.
+        'build_jobs': config.get('build_jobs', multiprocessing.cpu_count()),
+
+        # Size in megabytes of the cache of concretized specs. 0 disables
+        # it.
+        'concretization_cache_size': config.get(
+            'concretization_cache_size', 32),
+
+        # The number of packages to install at the same time. The
+        # build_jobs above are split among them.
+        'install_jobs': config.get('install_jobs', 1),
+    }
 
 
 binary_cache_retrieved_specs = set()
 
 
-#: Directories where to search for templates
-template_dirs = spack.config.get_config('config')['template_dirs']
-template_dirs = [canonicalize_path(x) for x in template_dirs]
-
-# If this is enabled, tools that use SSL should not verify
-# certifiates. e.g., curl should use the -k option.
-insecure = not _config.get('verify_ssl', True)
-
-
-# Whether spack should allow installation of unsafe versions of software.
-# "Unsafe" versions are ones it doesn't have a checksum for.
-do_checksum = _config.get('checksum', True)
-
-
-# If this is True, spack will not clean the environment to remove
-# potentially harmful variables before builds.
-dirty = _config.get('dirty', False)
-
-
-# The number of jobs to use when building in parallel.
-# By default, use all cores on the machine.
-build_jobs = _config.get('build_jobs', multiprocessing.cpu_count())
-
-
-# Needed for test dependencies
-package_testing = PackageTesting()
-
-
 #-----------------------------------------------------------------------------
 # When packages call 'from spack import *', this extra stuff is brought in.
 #
 # Spack internal code should call 'import spack' and accesses other
 # variables (spack.repo, paths, etc.) directly.
 #
+# __all__ is lazy too: packages are only imported once a repository is
+# used, and 'from spack import *' is what pulls in the build systems.
+#
 # TODO: maybe this should be separated out to build_environment.py?
 # TODO: it's not clear where all the stuff that needs to be included in
 #       packages should live.  This file is overloaded for spack core vs.
 #       for packages.
 #
 #-----------------------------------------------------------------------------
-__all__ = []
-
-from spack.package import Package, run_before, run_after, on_package_attributes
-from spack.build_systems.makefile import MakefilePackage
-from spack.build_systems.aspell_dict import AspellDictPackage
-from spack.build_systems.autotools import AutotoolsPackage
-from spack.build_systems.cmake import CMakePackage
-from spack.build_systems.cuda import CudaPackage
-from spack.build_systems.qmake import QMakePackage
-from spack.build_systems.scons import SConsPackage
-from spack.build_systems.waf import WafPackage
-from spack.build_systems.octave import OctavePackage
-from spack.build_systems.python import PythonPackage
-from spack.build_systems.r import RPackage
-from spack.build_systems.perl import PerlPackage
-from spack.build_systems.intel import IntelPackage
-
-__all__ += [
-    'run_before',
-    'run_after',
-    'on_package_attributes',
-    'Package',
-    'MakefilePackage',
-    'AspellDictPackage',
-    'AutotoolsPackage',
-    'CMakePackage',
-    'CudaPackage',
-    'QMakePackage',
-    'SConsPackage',
-    'WafPackage',
-    'OctavePackage',
-    'PythonPackage',
-    'RPackage',
-    'PerlPackage',
-    'IntelPackage',
-]
-
-from spack.version import Version, ver
-__all__ += ['Version', 'ver']
-
-from spack.spec import Spec
-__all__ += ['Spec']
-
-from spack.dependency import all_deptypes
-__all__ += ['all_deptypes']
-
-from spack.multimethod import when
-__all__ += ['when']
-
-import llnl.util.filesystem
-from llnl.util.filesystem import *
-__all__ += llnl.util.filesystem.__all__
-
-import spack.directives
-from spack.directives import *
-__all__ += spack.directives.__all__
-
-import spack.util.executable
-from spack.util.executable import *
-__all__ += spack.util.executable.__all__
-
-
-# Set up the user's editor
-# $EDITOR environment variable has the highest precedence
-editor = os.environ.get('EDITOR')
-
-# if editor is not set, use some sensible defaults
-if editor is not None:
-    editor = Executable(editor)
-else:
-    editor = which('vim', 'vi', 'emacs', 'nano')
-
-# If there is no editor, only raise an error if we actually try to use it.
-if not editor:
-    def editor_not_found(*args, **kwargs):
-        raise EnvironmentError(
-            'No text editor found! Please set the EDITOR environment variable '
-            'to your preferred text editor.')
-    editor = editor_not_found
-
-from spack.package import \
-    install_dependency_symlinks, flatten_dependencies, \
-    DependencyConflictError, InstallError, ExternalPackageError
-__all__ += [
-    'install_dependency_symlinks', 'flatten_dependencies',
-    'DependencyConflictError', 'InstallError', 'ExternalPackageError']
+@_lazy('__all__', 'run_before', 'run_after', 'on_package_attributes',
+       'Package', 'MakefilePackage', 'AspellDictPackage', 'AutotoolsPackage',
+       'CMakePackage', 'CudaPackage', 'QMakePackage', 'SConsPackage',
+       'WafPackage', 'OctavePackage', 'PythonPackage', 'RPackage',
+       'PerlPackage', 'IntelPackage', 'Version', 'ver', 'Spec',
+       'all_deptypes', 'when', 'install_dependency_symlinks',
+       'flatten_dependencies', 'DependencyConflictError', 'InstallError',
+       'ExternalPackageError')
+def _init_package_api():
+    import llnl.util.filesystem
+    import spack.directives
+    import spack.package
+    import spack.util.executable
+    from spack.build_systems.makefile import MakefilePackage
+    from spack.build_systems.aspell_dict import AspellDictPackage
+    from spack.build_systems.autotools import AutotoolsPackage
+    from spack.build_systems.cmake import CMakePackage
+    from spack.build_systems.cuda import CudaPackage
+    from spack.build_systems.qmake import QMakePackage
+    from spack.build_systems.scons import SConsPackage
+    from spack.build_systems.waf import WafPackage
+    from spack.build_systems.octave import OctavePackage
+    from spack.build_systems.python import PythonPackage
+    from spack.build_systems.r import RPackage
+    from spack.build_systems.perl import PerlPackage
+    from spack.build_systems.intel import IntelPackage
+    from spack.version import Version, ver
+    from spack.spec import Spec
+    from spack.dependency import all_deptypes
+    from spack.multimethod import when
+
+    api = {
+        'run_before': spack.package.run_before,
+        'run_after': spack.package.run_after,
+        'on_package_attributes': spack.package.on_package_attributes,
+        'Package': spack.package.Package,
+        'MakefilePackage': MakefilePackage,
+        'AspellDictPackage': AspellDictPackage,
+        'AutotoolsPackage': AutotoolsPackage,
+        'CMakePackage': CMakePackage,
+        'CudaPackage': CudaPackage,
+        'QMakePackage': QMakePackage,
+        'SConsPackage': SConsPackage,
+        'WafPackage': WafPackage,
+        'OctavePackage': OctavePackage,
+        'PythonPackage': PythonPackage,
+        'RPackage': RPackage,
+        'PerlPackage': PerlPackage,
+        'IntelPackage': IntelPackage,
+        'Version': Version,
+        'ver': ver,
+        'Spec': Spec,
+        'all_deptypes': all_deptypes,
+        'when': when,
+    }
+    for name in ('install_dependency_symlinks', 'flatten_dependencies',
+                 'DependencyConflictError', 'InstallError',
+                 'ExternalPackageError'):
+        api[name] = getattr(spack.package, name)
+
+    for module in (spack.directives, spack.util.executable):
+        for name in module.__all__:
+            api[name] = getattr(module, name)
+
+    api['__all__'] = sorted(api) + llnl.util.filesystem.__all__
+    return api
+
+
+@_lazy('editor')
+def _init_editor():
+    from spack.util.executable import Executable, which
+
+    # Set up the user's editor
+    # $EDITOR environment variable has the highest precedence
+    editor = os.environ.get('EDITOR')
+
+    # if editor is not set, use some sensible defaults
+    if editor is not None:
+        editor = Executable(editor)
+    else:
+        editor = which('vim', 'vi', 'emacs', 'nano')
+
+    # If there is no editor, only raise an error if we actually try to use
+    # it.
+    if not editor:
+        def editor_not_found(*args, **kwargs):
+            raise EnvironmentError(
+                'No text editor found! Please set the EDITOR environment '
+                'variable to your preferred text editor.')
+        editor = editor_not_found
+
+    return {'editor': editor}
+
 
 # Add default values for attributes that would otherwise be modified from
 # Spack main script
 debug = False
 spack_working_dir = None
+
+
+class _SpackModule(types.ModuleType):
+    """Type of the ``spack`` module, which computes the lazy attributes
+    registered with ``_lazy`` the first time they are used.
+    """
+
+    def __getattr__(self, name):
+        # Only called when regular lookup fails
+        init = _lazy_attributes.get(name)
+        if init is None:
+            # Submodules used to be all imported by this file, and some
+            # code still relies on it: import them when first used.
+            if (os.path.isfile(join_path(module_path, name + '.py')) or
+                    os.path.isdir(join_path(module_path, name))):
+                __import__(__name__ + '.' + name)
+                return sys.modules[__name__ + '.' + name]
+
+            # Directives are only known once spack.directives is imported
+            if name.startswith('_') or '__all__' in self.__dict__:
+                raise AttributeError(
+                    "'module' object has no attribute '%s'" % name)
+            init = _init_package_api
+
+        # Values set before (e.g. spack.insecure by 'spack -k') win over
+        # the ones computed here, but submodules (like spack.abi or
+        # spack.version) are shadowed, as they always were.
+        for key, value in init().items():
+            if (key not in self.__dict__ or
+                    isinstance(self.__dict__[key], types.ModuleType)):
+                setattr(self, key, value)
+
+        if name not in self.__dict__:
+            raise AttributeError(
+                "'module' object has no attribute '%s'" % name)
+        return self.__dict__[name]
+
+
+# Python 2 has no module-level __getattr__, so replace this module in
+# sys.modules with an instance of _SpackModule sharing its attributes.
+# The functions above still use the globals of this module, which python
+# 2 clears when the module is deleted: keep a reference to it.
+_module = _SpackModule(__name__, __doc__)
+_module.__dict__.update(globals())
+_module._original_module = sys.modules[__name__]
+sys.modules[__name__] = _module
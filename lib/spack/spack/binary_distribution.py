@@ -23,28 +23,47 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
 
+import multiprocessing
 import os
 import re
 import tarfile
+import tempfile
+import time
 import yaml
 import shutil
+import socket
 import platform
+from io import BytesIO
+
+from ordereddict_backport import OrderedDict
 
 import llnl.util.tty as tty
+from llnl.util.lock import Lock, WriteTransaction
 from spack.util.gpg import Gpg
-from llnl.util.filesystem import mkdirp, join_path, install_tree
-from spack.util.web import spider
+from spack.util.compression import ParallelGzipWriter
+from llnl.util.filesystem import mkdirp, join_path
+import spack.util.spack_json as sjson
+from spack.util.web import spider, read_if_modified
 import spack.cmd
 import spack
 from spack.stage import Stage
 import spack.fetch_strategy as fs
 from contextlib import closing
+from six.moves.urllib.error import HTTPError
 import spack.util.gpg as gpg_util
 import hashlib
 from spack.util.executable import ProcessError
 import spack.relocate as relocate
 
 
+#: Name of the file listing all the specs in a build cache, with their
+#: checksums, so that clients don't have to spider the mirror for them.
+_index_json_name = 'index.json'
+
+#: Version of the format of index.json
+_index_json_version = 1
+
+
 class NoOverwriteException(Exception):
     pass
 
@@ -96,17 +115,16 @@ def read_buildinfo_file(prefix):
     return buildinfo
 
 
-def write_buildinfo_file(prefix, workdir, rel=False):
+def get_buildinfo(prefix, rel=False):
     """
-    Create a cache file containing information
-    required for the relocation
+    Return the information required for the relocation of prefix
     """
     text_to_relocate = []
     binary_to_relocate = []
     blacklist = (".spack", "man")
     os_id = platform.system()
     # Do this at during tarball creation to save time when tarball unpacked.
-    # Used by make_package_relative to determine binaries to change.
+    # Used by build_tarball to determine binaries to change.
     for root, dirs, files in os.walk(prefix, topdown=True):
         dirs[:] = [d for d in dirs if d not in blacklist]
         for filename in files:
@@ -123,15 +141,13 @@ def write_buildinfo_file(prefix, workdir, rel=False):
                     rel_path_name = os.path.relpath(path_name, prefix)
                     text_to_relocate.append(rel_path_name)
 
-    # Create buildinfo data and write it to disk
+    # Create buildinfo data
     buildinfo = {}
     buildinfo['relative_rpaths'] = rel
     buildinfo['buildpath'] = spack.store.layout.root
     buildinfo['relocate_textfiles'] = text_to_relocate
     buildinfo['relocate_binaries'] = binary_to_relocate
-    filename = buildinfo_file_name(workdir)
-    with open(filename, 'w') as outfile:
-        outfile.write(yaml.dump(buildinfo, default_flow_style=True))
+    return buildinfo
 
 
 def tarball_directory_name(spec):
@@ -214,6 +230,79 @@ def generate_index(outdir, indexfile_path):
     f.close()
 
 
+def _index_entry(specfile_name, spec_dict):
+    """
+    Entry of a spec in index.json: where its spec.yaml is, its checksum
+    and the spec itself, so that clients need to download nothing else.
+    """
+    return {
+        'spec_file': specfile_name,
+        'binary_cache_checksum': spec_dict['binary_cache_checksum'],
+        'spec': dict((k, v) for k, v in spec_dict.items()
+                     if k != 'binary_cache_checksum'),
+    }
+
+
+def _spec_from_index_entry(entry):
+    """
+    Concrete spec stored in an entry of index.json
+    """
+    spec_dict = dict(entry['spec'])
+    spec_dict['binary_cache_checksum'] = entry['binary_cache_checksum']
+    spec = spack.spec.Spec.from_dict(spec_dict)
+    spec._mark_concrete()
+    return spec
+
+
+def update_index_json(outdir, specfile_name=None, spec_dict=None):
+    """
+    Add the spec in specfile_name to the index.json of the build cache
+    in outdir.  If there is no index yet, or no spec is given, the index
+    is made from all the spec.yaml files in the build cache.
+    """
+    cache_dir = join_path(outdir, "build_cache")
+    index_path = join_path(cache_dir, _index_json_name)
+
+    # Builds adding specs to the same build cache at the same time
+    # must not lose each other's entries
+    with WriteTransaction(Lock(index_path + '.lock')):
+        entries = None
+        if specfile_name is not None and os.path.exists(index_path):
+            with open(index_path, 'r') as f:
+                index = sjson.load(f)['buildcache']
+            if index.get('version') == _index_json_version:
+                entries = index['specs']
+
+        if entries is None:
+            entries = {}
+            for name in os.listdir(cache_dir):
+                if name.endswith('.spec.yaml') and name != specfile_name:
+                    with open(join_path(cache_dir, name), 'r') as f:
+                        other_dict = yaml.load(f)
+                    if 'binary_cache_checksum' not in other_dict:
+                        continue
+                    other_hash = name[:-len('.spec.yaml')].rsplit('-', 1)[-1]
+                    entries[other_hash] = _index_entry(name, other_dict)
+
+        if specfile_name is not None:
+            spec_hash = specfile_name[:-len('.spec.yaml')].rsplit('-', 1)[-1]
+            entries[spec_hash] = _index_entry(specfile_name, spec_dict)
+
+        # Write to a temporary file first, so that clients never download
+        # half an index
+        tmp_path = index_path + (
+            '.%s.%s.temp' % (socket.getfqdn(), os.getpid()))
+        try:
+            with open(tmp_path, 'w') as f:
+                sjson.dump({'buildcache': {'version': _index_json_version,
+                                           'specs': entries}}, f)
+            os.rename(tmp_path, index_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
 def build_tarball(spec, outdir, force=False, rel=False, yes_to_all=False,
                   key=None):
     """
@@ -224,7 +313,6 @@ def build_tarball(spec, outdir, force=False, rel=False, yes_to_all=False,
     tarfile_name = tarball_name(spec, '.tar.gz')
     tarfile_dir = join_path(outdir, "build_cache",
                             tarball_directory_name(spec))
-    tarfile_path = join_path(tarfile_dir, tarfile_name)
     mkdirp(tarfile_dir)
     spackfile_path = os.path.join(
         outdir, "build_cache", tarball_path_name(spec, '.spack'))
@@ -246,82 +334,169 @@ def build_tarball(spec, outdir, force=False, rel=False, yes_to_all=False,
             os.remove(specfile_path)
         else:
             raise NoOverwriteException(str(specfile_path))
-    # make a copy of the install directory to work with
-    workdir = join_path(outdir, os.path.basename(spec.prefix))
-    if os.path.exists(workdir):
-        shutil.rmtree(workdir)
-    install_tree(spec.prefix, workdir, symlinks=True)
-
-    # create info for later relocation and create tar
-    write_buildinfo_file(spec.prefix, workdir, rel=rel)
-
-    # optinally make the paths in the binaries relative to each other
-    # in the spack install tree before creating tarball
-    if rel:
-        make_package_relative(workdir, spec.prefix)
-    # create compressed tarball of the install prefix
-    with closing(tarfile.open(tarfile_path, 'w:gz')) as tar:
-        tar.add(name='%s' % workdir,
-                arcname='%s' % os.path.basename(workdir))
-    # remove copy of install directory
-    shutil.rmtree(workdir)
-
-    # get the sha256 checksum of the tarball
-    checksum = checksum_tarball(tarfile_path)
-
-    # add sha256 checksum to spec.yaml
-    spec_dict = {}
-    with open(spec_file, 'r') as inputfile:
-        content = inputfile.read()
-        spec_dict = yaml.load(content)
-    bchecksum = {}
-    bchecksum['hash_algorithm'] = 'sha256'
-    bchecksum['hash'] = checksum
-    spec_dict['binary_cache_checksum'] = bchecksum
-    with open(specfile_path, 'w') as outfile:
-        outfile.write(yaml.dump(spec_dict))
+    # the tarball of the prefix is streamed into the .spack archive,
+    # compressed on several threads and hashed as it is written
     signed = False
-    if not yes_to_all:
-        # sign the tarball and spec file with gpg
-        try:
-            sign_tarball(yes_to_all, key, force, specfile_path)
-            signed = True
-        except NoGpgException:
-            raise NoGpgException()
-        except PickKeyException:
-            raise PickKeyException()
-        except NoKeyException():
-            raise NoKeyException()
-    # put tarball, spec and signature files in .spack archive
-    with closing(tarfile.open(spackfile_path, 'w')) as tar:
-        tar.add(name='%s' % tarfile_path, arcname='%s' % tarfile_name)
-        tar.add(name='%s' % specfile_path, arcname='%s' % specfile_name)
-        if signed:
-            tar.add(name='%s.asc' % specfile_path,
-                    arcname='%s.asc' % specfile_name)
+    hasher = hashlib.sha256()
+    try:
+        with open(spackfile_path, 'wb') as spackfile:
+            def write_tarball(fileobj):
+                with ParallelGzipWriter(fileobj, jobs=spack.build_jobs,
+                                        hasher=hasher) as gzfile:
+                    write_prefix_tarball(spec.prefix, gzfile, rel=rel)
+
+            write_streamed_tar_member(spackfile, tarfile_name,
+                                      write_tarball)
+            checksum = hasher.hexdigest()
+
+            # add sha256 checksum to spec.yaml
+            spec_dict = {}
+            with open(spec_file, 'r') as inputfile:
+                content = inputfile.read()
+                spec_dict = yaml.load(content)
+            bchecksum = {}
+            bchecksum['hash_algorithm'] = 'sha256'
+            bchecksum['hash'] = checksum
+            spec_dict['binary_cache_checksum'] = bchecksum
+            with open(specfile_path, 'w') as outfile:
+                outfile.write(yaml.dump(spec_dict))
+            if not yes_to_all:
+                # sign the tarball and spec file with gpg
+                try:
+                    sign_tarball(yes_to_all, key, force, specfile_path)
+                    signed = True
+                except NoGpgException:
+                    raise NoGpgException()
+                except PickKeyException:
+                    raise PickKeyException()
+                except NoKeyException():
+                    raise NoKeyException()
+
+            # add spec and signature files after the tarball
+            with closing(tarfile.open(fileobj=spackfile, mode='w',
+                                      format=tarfile.GNU_FORMAT)) as tar:
+                tar.add(name='%s' % specfile_path,
+                        arcname='%s' % specfile_name)
+                if signed:
+                    tar.add(name='%s.asc' % specfile_path,
+                            arcname='%s.asc' % specfile_name)
+    except BaseException:
+        # don't leave a truncated archive in the mirror
+        if os.path.exists(spackfile_path):
+            os.remove(spackfile_path)
+        raise
 
     # cleanup file moved to archive
-    os.remove(tarfile_path)
     if signed:
         os.remove('%s.asc' % specfile_path)
 
+    # list the spec in index.json only once its archive is complete
+    update_index_json(outdir, specfile_name, spec_dict)
+
     # create an index.html for the build_cache directory so specs can be found
+    # by clients that don't know about index.json
     if os.path.exists(indexfile_path):
         os.remove(indexfile_path)
     generate_index(outdir, indexfile_path)
     return None
 
 
+def write_prefix_tarball(prefix, fileobj, rel=False):
+    """
+    Write a tar stream of prefix to fileobj, with the relocation
+    information in it.  Files are read directly from the prefix: only
+    the binaries whose RPATHs are made relative (if rel is True) are
+    copied first, one at a time, to be modified.
+    """
+    buildinfo = get_buildinfo(prefix, rel=rel)
+    old_path = buildinfo['buildpath']
+    relative = set(buildinfo['relocate_binaries']) if rel else set()
+    buildinfo_path = os.path.relpath(buildinfo_file_name(prefix), prefix)
+    topdir = os.path.basename(prefix)
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        with closing(tarfile.open(fileobj=fileobj, mode='w|',
+                                  format=tarfile.GNU_FORMAT)) as tar:
+            tar.add(prefix, arcname=topdir, recursive=False)
+            for root, dirs, files in os.walk(prefix):
+                dirs.sort()
+                for name in sorted(dirs + files):
+                    path_name = os.path.join(root, name)
+                    rel_path_name = os.path.relpath(path_name, prefix)
+                    arcname = os.path.join(topdir, rel_path_name)
+                    if rel_path_name == buildinfo_path:
+                        # replaced by the one generated above
+                        continue
+
+                    if rel_path_name in relative:
+                        tmp_path = os.path.join(tmpdir, name)
+                        shutil.copy2(path_name, tmp_path)
+                        relocate.make_binary_relative(
+                            [tmp_path], [path_name], old_path)
+                        tar.add(tmp_path, arcname=arcname)
+                        os.remove(tmp_path)
+                    else:
+                        tar.add(path_name, arcname=arcname, recursive=False)
+
+            content = yaml.dump(buildinfo, default_flow_style=True)
+            content = content.encode('utf-8')
+            info = tarfile.TarInfo(os.path.join(topdir, buildinfo_path))
+            info.size = len(content)
+            info.mtime = time.time()
+            info.mode = 0o644
+            tar.addfile(info, BytesIO(content))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def write_streamed_tar_member(fileobj, arcname, write_content):
+    """
+    Add a regular file named arcname at the current position of the
+    tar file fileobj, with content written by write_content(fileobj).
+    The size of the content doesn't have to be known in advance: the
+    header of the member is written again once it is.
+    """
+    info = tarfile.TarInfo(arcname)
+    info.mtime = time.time()
+    info.mode = 0o644
+
+    start = fileobj.tell()
+    header = info.tobuf(tarfile.GNU_FORMAT)
+    fileobj.write(header)
+    write_content(fileobj)
+    end = fileobj.tell()
+
+    info.size = end - start - len(header)
+    remainder = info.size % tarfile.BLOCKSIZE
+    if remainder:
+        fileobj.write(tarfile.NUL * (tarfile.BLOCKSIZE - remainder))
+        end = fileobj.tell()
+
+    # GNU headers have the same length whatever the size of the member
+    fileobj.seek(start)
+    fileobj.write(info.tobuf(tarfile.GNU_FORMAT))
+    fileobj.seek(end)
+
+
 def download_tarball(spec):
     """
     Download binary tarball for given package into stage area
     Return True if successful
     """
+    return _download_tarball_path(tarball_path_name(spec, '.spack'))
+
+
+def _download_tarball_path(tarball):
+    """
+    Download the tarball at path tarball in the build cache of the first
+    mirror that has it.  Module level function, so that it can be run
+    in a multiprocessing pool.
+    """
     mirrors = spack.config.get_config('mirrors')
     if len(mirrors) == 0:
         tty.die("Please add a spack mirror to allow " +
                 "download of pre-compiled packages.")
-    tarball = tarball_path_name(spec, '.spack')
     for key in mirrors:
         url = mirrors[key] + "/build_cache/" + tarball
         # stage the tarball into standard place
@@ -334,19 +509,39 @@ def download_tarball(spec):
     return None
 
 
-def make_package_relative(workdir, prefix):
+def download_tarballs(specs, jobs=None):
     """
-    Change paths in binaries to relative paths
+    Download the binary tarballs of specs into the stage area, running
+    up to jobs downloads at the same time (default: spack.build_jobs).
+    Tarballs already in the stage area are not downloaded again, so
+    download_tarball() returns at once for the specs prefetched here.
+
+    Return a dictionary mapping the DAG hash of each spec to the path of
+    its tarball, or to None if its download failed.
     """
-    buildinfo = read_buildinfo_file(workdir)
-    old_path = buildinfo['buildpath']
-    orig_path_names = list()
-    cur_path_names = list()
-    for filename in buildinfo['relocate_binaries']:
-        orig_path_names.append(os.path.join(prefix, filename))
-        cur_path_names.append(os.path.join(workdir, filename))
-        relocate.make_binary_relative(cur_path_names, orig_path_names,
-                                      old_path)
+    specs = list(OrderedDict((s.dag_hash(), s) for s in specs).values())
+    if not specs:
+        return {}
+    if len(spack.config.get_config('mirrors')) == 0:
+        tty.die("Please add a spack mirror to allow " +
+                "download of pre-compiled packages.")
+    tarballs = [tarball_path_name(spec, '.spack') for spec in specs]
+    jobs = min(len(specs), jobs or spack.build_jobs)
+
+    if jobs > 1:
+        # All the tarballs go in the same stage: create it before the
+        # workers race to do it.
+        Stage(tarballs[0], name="build_cache", keep=True).create()
+        pool = multiprocessing.Pool(jobs)
+        try:
+            paths = pool.map(_download_tarball_path, tarballs)
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        paths = [_download_tarball_path(t) for t in tarballs]
+
+    return dict((spec.dag_hash(), path) for spec, path in zip(specs, paths))
 
 
 def relocate_package(prefix):
@@ -447,8 +642,17 @@ def get_specs(force=False):
 
     path = str(spack.architecture.sys_type())
     urls = set()
+    specs = set()
     for key in mirrors:
         url = mirrors[key]
+        index = read_index_json(url, force=force)
+        if index is not None:
+            for entry in index.values():
+                if url.startswith('file') or re.search(
+                        path, entry['spec_file']):
+                    specs.add(_spec_from_index_entry(entry))
+            continue
+
         if url.startswith('file'):
             mirror = url.replace('file://', '') + '/build_cache'
             tty.msg("Finding buildcaches in %s" % mirror)
@@ -464,7 +668,6 @@ def get_specs(force=False):
                 if re.search("spec.yaml", link) and re.search(path, link):
                     urls.add(link)
 
-    specs = set()
     for link in urls:
         with Stage(link, name="build_cache", keep=True) as stage:
             if force and os.path.exists(stage.save_filename):
@@ -486,6 +689,65 @@ def get_specs(force=False):
     return specs
 
 
+def read_index_json(mirror_url, force=False):
+    """
+    Read the index.json of the build cache of a mirror, or return None if
+    it has none.
+
+    The index is kept in spack.misc_cache along with its ETag and
+    Last-Modified headers: it is only downloaded again if the server says
+    it changed, or if force is True.
+    """
+    url = mirror_url + "/build_cache/" + _index_json_name
+    cache_key = 'build_cache/{0}-index.json'.format(
+        hashlib.sha1(mirror_url.encode('utf-8')).hexdigest())
+
+    cached = None
+    if not force and spack.misc_cache.init_entry(cache_key):
+        try:
+            with spack.misc_cache.read_transaction(cache_key) as f:
+                cached = sjson.load(f)
+        except (ValueError, sjson.SpackJSONError):
+            cached = None
+
+    etag = last_modified = None
+    if cached is not None:
+        etag, last_modified = cached['etag'], cached['last_modified']
+
+    try:
+        content, etag, last_modified = read_if_modified(
+            url, etag, last_modified)
+    except Exception as e:
+        tty.debug("No usable {0} at {1}: {2}".format(
+            _index_json_name, mirror_url, e))
+        offline = not (isinstance(e, HTTPError) or url.startswith('file'))
+        if offline and cached is not None:
+            # Keep working without a network with what we saw last time
+            return cached['specs']
+        return None
+
+    if content is None:
+        tty.debug("Using cached build cache index of " + mirror_url)
+        return cached['specs']
+
+    try:
+        index = sjson.load(content.decode('utf-8'))['buildcache']
+    except (ValueError, KeyError, sjson.SpackJSONError) as e:
+        tty.warn("Ignoring invalid build cache index " + url, str(e))
+        return None
+    if index.get('version') != _index_json_version:
+        tty.debug("Ignoring build cache index {0} of version {1}".format(
+            url, index.get('version')))
+        return None
+
+    spack.misc_cache.init_entry(cache_key)
+    with spack.misc_cache.write_transaction(cache_key) as (old, new):
+        sjson.dump({'etag': etag,
+                    'last_modified': last_modified,
+                    'specs': index['specs']}, new)
+    return index['specs']
+
+
 def get_keys(install=False, yes_to_all=False, force=False):
     """
     Get pgp public keys available on mirror
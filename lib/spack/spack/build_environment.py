@@ -87,6 +87,9 @@ SPACK_ENV_PATH = 'SPACK_ENV_PATH'
 SPACK_DEPENDENCIES = 'SPACK_DEPENDENCIES'
 SPACK_RPATH_DEPS = 'SPACK_RPATH_DEPS'
 SPACK_LINK_DEPS = 'SPACK_LINK_DEPS'
+SPACK_INCLUDE_DIRS = 'SPACK_INCLUDE_DIRS'
+SPACK_LINK_DIRS = 'SPACK_LINK_DIRS'
+SPACK_RPATH_DIRS = 'SPACK_RPATH_DIRS'
 SPACK_PREFIX = 'SPACK_PREFIX'
 SPACK_INSTALL = 'SPACK_INSTALL'
 SPACK_DEBUG = 'SPACK_DEBUG'
@@ -234,6 +237,14 @@ def set_build_environment_variables(pkg, env, dirty):
     env.set_path(SPACK_RPATH_DEPS, rpath_prefixes)
     env.set_path(SPACK_LINK_DEPS, link_prefixes)
 
+    # The wrapper runs for every compile and link: find the directories it
+    # passes with -I, -L and rpath flags once, here, instead of there.
+    include_dirs, link_dirs, rpath_dirs = get_dependency_dirs(
+        build_link_prefixes, link_prefixes, rpath_prefixes)
+    env.set_path(SPACK_INCLUDE_DIRS, include_dirs)
+    env.set_path(SPACK_LINK_DIRS, link_dirs)
+    env.set_path(SPACK_RPATH_DIRS, rpath_dirs)
+
     # Add dependencies to CMAKE_PREFIX_PATH
     env.set_path('CMAKE_PREFIX_PATH', build_link_prefixes)
 
@@ -496,6 +507,39 @@ def get_rpath_deps(pkg):
         return pkg.spec.dependencies(deptype='link')
 
 
+def get_dependency_dirs(prefixes, link_prefixes, rpath_prefixes):
+    """Find the directories of dependencies that the compiler wrapper adds
+    to compile and link lines.
+
+    Args:
+        prefixes (list): prefixes of the build and link dependencies
+        link_prefixes (list): prefixes whose libraries are searched (-L)
+        rpath_prefixes (list): prefixes whose libraries are RPATHs
+
+    Returns:
+        tuple: ``(include_dirs, link_dirs, rpath_dirs)``, lists of the
+        ``include``, ``lib64`` and ``lib`` directories that exist, in the
+        order the wrapper passes them.  Later prefixes come first, and
+        ``lib64`` comes before ``lib`` within a prefix.
+    """
+    link_prefixes, rpath_prefixes = set(link_prefixes), set(rpath_prefixes)
+    include_dirs, link_dirs, rpath_dirs = [], [], []
+    for prefix in reversed(prefixes):
+        include_dir = join_path(prefix, 'include')
+        if os.path.isdir(include_dir):
+            include_dirs.append(include_dir)
+
+        if prefix not in link_prefixes and prefix not in rpath_prefixes:
+            continue
+        for lib_dir in (join_path(prefix, 'lib64'), join_path(prefix, 'lib')):
+            if os.path.isdir(lib_dir):
+                if prefix in link_prefixes:
+                    link_dirs.append(lib_dir)
+                if prefix in rpath_prefixes:
+                    rpath_dirs.append(lib_dir)
+    return include_dirs, link_dirs, rpath_dirs
+
+
 def get_rpaths(pkg):
     """Get a list of all the rpaths for a package."""
     rpaths = [pkg.prefix.lib, pkg.prefix.lib64]
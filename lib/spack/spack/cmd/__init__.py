@@ -34,17 +34,23 @@ from llnl.util.tty.colify import colify
 from llnl.util.tty.color import colorize
 from llnl.util.filesystem import working_dir
 
+# This module is imported by every command, including the ones that
+# only print paths or help: spack.config, spack.spec and spack.store are
+# only imported by the functions below that use them.
 import spack
-import spack.config
-import spack.spec
-import spack.store
+
 
 #
 # Settings for commands that modify configuration
 #
-# Commands that modify configuration by default modify the *highest*
-# priority scope.
-default_modify_scope = spack.config.highest_precedence_scope().name
+def default_modify_scope():
+    """Scope modified by commands that modify configuration by default:
+    the *highest* priority one.
+    """
+    import spack.config
+    return spack.config.highest_precedence_scope().name
+
+
 # Commands that list configuration list *all* scopes by default.
 default_list_scope = None
 
@@ -105,10 +111,45 @@ def get_command(name):
     return getattr(get_module(python_name), python_name)
 
 
+#: Properties that commands define at the top of their module, as
+#: ``name = "value"``.
+command_properties = ('description', 'section', 'level')
+
+_property_regex = re.compile(
+    r'^(%s) = ' % '|'.join(command_properties) +
+    r'''(?:"([^"\\]*)"|'([^'\\]*)')$''', re.MULTILINE)
+
+
+def get_command_properties(name):
+    """Returns a dictionary with the description, section and level of
+    a command, or None for the ones it does not define.
+
+    Help lists all the commands, and importing all of them takes a long
+    time: the properties are read from the source of the module when
+    they are simple string literals, and the module is imported only
+    when they are not.
+    """
+    python_name = get_python_name(name)
+    path = os.path.join(command_path, python_name + '.py')
+    with open(path) as f:
+        properties = dict(
+            (m.group(1), m.group(2) if m.group(2) is not None else m.group(3))
+            for m in _property_regex.finditer(f.read()))
+
+    if len(properties) < len(command_properties):
+        module = get_module(python_name)
+        properties = dict((p, getattr(module, p, None))
+                          for p in command_properties)
+    return properties
+
+
 def parse_specs(args, **kwargs):
     """Convenience function for parsing arguments from specs.  Handles common
        exceptions and dies if there are errors.
     """
+    import spack.parse
+    import spack.spec
+
     concretize = kwargs.get('concretize', False)
     normalize = kwargs.get('normalize', False)
 
@@ -153,6 +194,7 @@ def elide_list(line_list, max_num=10):
 
 
 def disambiguate_spec(spec):
+    import spack.store
     matching_specs = spack.store.db.query(spec)
     if not matching_specs:
         tty.die("Spec '%s' matches no installed packages." % spec)
@@ -204,6 +246,8 @@ def display_specs(specs, args=None, **kwargs):
         variants (bool): Show variants with specs
 
     """
+    import spack.spec
+
     def get_arg(name, default=None):
         """Prefer kwargs, then args, then default."""
         if name in kwargs:
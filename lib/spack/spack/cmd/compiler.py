@@ -54,7 +54,7 @@ def setup_parser(subparser):
         help='search the system for compilers to add to Spack configuration')
     find_parser.add_argument('add_paths', nargs=argparse.REMAINDER)
     find_parser.add_argument(
-        '--scope', choices=scopes, default=spack.cmd.default_modify_scope,
+        '--scope', choices=scopes, default=spack.cmd.default_modify_scope(),
         help="configuration scope to modify")
 
     # Remove
@@ -65,7 +65,7 @@ def setup_parser(subparser):
         help='remove ALL compilers that match spec')
     remove_parser.add_argument('compiler_spec')
     remove_parser.add_argument(
-        '--scope', choices=scopes, default=spack.cmd.default_modify_scope,
+        '--scope', choices=scopes, default=spack.cmd.default_modify_scope(),
         help="configuration scope to modify")
 
     # List
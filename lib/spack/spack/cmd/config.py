@@ -58,7 +58,7 @@ def config_get(args):
 def config_edit(args):
     if not args.scope:
         if args.section == 'compilers':
-            args.scope = spack.cmd.default_modify_scope
+            args.scope = spack.cmd.default_modify_scope()
         else:
             args.scope = 'user'
     if not args.section:
@@ -399,6 +399,9 @@ def setup_parser(subparser):
     subparser.add_argument(
         '--keep-stage', action='store_true',
         help="don't clean up staging area when command completes")
+    subparser.add_argument(
+        '-j', '--jobs', action='store', type=int,
+        help="number of archives downloaded at the same time. default is 16")
     subparser.add_argument(
         '-n', '--name',
         help="name of the package to create")
@@ -584,7 +587,7 @@ def get_versions(args, name):
 
         versions = spack.util.web.get_checksums_for_versions(
             url_dict, name, first_stage_function=guesser,
-            keep_stage=args.keep_stage)
+            keep_stage=args.keep_stage, jobs=args.jobs)
 
     return versions, guesser
 
@@ -22,16 +22,23 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
+from __future__ import print_function
+
+import json
 import os
 import re
+import shutil
+import sys
+import tempfile
+import time
 from datetime import datetime
 from glob import glob
 
 import llnl.util.tty as tty
-from llnl.util.filesystem import working_dir
+from llnl.util.filesystem import join_path, mkdirp, working_dir
 
 import spack
-from spack.util.executable import which
+from spack.util.executable import Executable, which
 
 description = "debugging commands for troubleshooting Spack"
 section = "developer"
@@ -43,6 +50,52 @@ def setup_parser(subparser):
     sp.add_parser('create-db-tarball',
                   help="create a tarball of Spack's installation metadata")
 
+    import_times = sp.add_parser(
+        'import-times',
+        help="show the time spent importing each part of Spack")
+    import_times.add_argument(
+        '-m', '--by-module', action='store_true',
+        help="show the time of each module instead of each subsystem")
+    import_times.add_argument(
+        '-r', '--runs', type=int, default=3,
+        help="report the fastest of this many runs (default 3)")
+    import_times.add_argument(
+        'modules', nargs='*', default=['spack.main'],
+        help="modules to import (default: spack.main)")
+
+    parse_times = sp.add_parser(
+        'parse-times',
+        help="time the spec parser on the directives of a repository")
+    parse_times.add_argument(
+        '-n', '--namespace', default='builtin',
+        help="namespace of the repository (default: builtin)")
+    parse_times.add_argument(
+        '-r', '--runs', type=int, default=3,
+        help="report the fastest of this many runs (default 3)")
+
+    log_throughput = sp.add_parser(
+        'log-throughput',
+        help="time the logging of build output to a file")
+    log_throughput.add_argument(
+        '-s', '--size', type=int, default=16,
+        help="megabytes of colored output to log (default 16)")
+    log_throughput.add_argument(
+        '-b', '--block-size', type=int, default=8192,
+        help="bytes written at once by the build (default 8192)")
+    log_throughput.add_argument(
+        '-r', '--runs', type=int, default=3,
+        help="report the fastest of this many runs (default 3)")
+
+    cc_times = sp.add_parser(
+        'cc-times',
+        help="time the compiler wrapper on compile and link lines")
+    cc_times.add_argument(
+        '-d', '--dependencies', type=int, default=100,
+        help="number of dependencies of the package built (default 100)")
+    cc_times.add_argument(
+        '-n', '--invocations', type=int, default=50,
+        help="report the mean of this many invocations (default 50)")
+
 
 def _debug_tarball_suffix():
     now = datetime.now()
@@ -86,6 +139,8 @@ def create_db_tarball(args):
     wd = os.path.dirname(spack.store.root)
     with working_dir(wd):
         files = [spack.store.db._index_path]
+        if os.path.exists(spack.store.db._journal_path):
+            files.append(spack.store.db._journal_path)
         files += glob('%s/*/*/*/.spack/spec.yaml' % base)
         files = [os.path.relpath(f) for f in files]
 
@@ -97,6 +152,273 @@ def create_db_tarball(args):
     tty.msg('Created %s' % tarball_name)
 
 
+#: Run by import_times() in a new interpreter, so that nothing is imported
+#: yet. Prints a JSON dictionary with the time spent importing each module,
+#: not counting the modules it imports itself.
+_import_times_script = r'''
+import json
+import sys
+import time
+
+try:
+    import __builtin__ as builtins
+except ImportError:
+    import builtins
+
+sys.path[:0] = json.loads(sys.argv[1])
+
+real_import = builtins.__import__
+default_level = -1 if sys.version_info[0] < 3 else 0
+times = {}
+nested_time = [0.0]
+
+
+def candidates(name, globals, level):
+    """Modules that an import statement can load."""
+    names = []
+    if level != 0 and globals and '__name__' in globals:
+        package = globals['__name__']
+        if '__path__' not in globals:
+            package = package.rpartition('.')[0]
+        for i in range(level - 1):
+            package = package.rpartition('.')[0]
+        if package:
+            names.append(package + '.' + name if name else package)
+    if level <= 0:
+        names.append(name)
+
+    result = []
+    for n in names:
+        parts = n.split('.')
+        result.extend('.'.join(parts[:i + 1]) for i in range(len(parts)))
+    return result
+
+
+def timed_import(name, globals=None, locals=None, fromlist=None,
+                 level=default_level):
+    missing = [n for n in candidates(name, globals, level)
+               if sys.modules.get(n) is None]
+    outer_nested_time, nested_time[0] = nested_time[0], 0.0
+    start = time.time()
+    try:
+        return real_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.time() - start
+        self_time = elapsed - nested_time[0]
+        nested_time[0] = outer_nested_time + elapsed
+
+        loaded = [n for n in missing if sys.modules.get(n) is not None]
+        if loaded:
+            module = max(loaded, key=len)
+            times[module] = times.get(module, 0.0) + self_time
+
+
+builtins.__import__ = timed_import
+for module in sys.argv[2:]:
+    __import__(module)
+builtins.__import__ = real_import
+
+sys.stdout.write(json.dumps(times))
+'''
+
+
+def _subsystem(module):
+    """Group spack modules by subpackage, the others by package."""
+    parts = module.split('.')
+    if parts[0] in ('spack', 'llnl'):
+        return '.'.join(parts[:2])
+    return parts[0]
+
+
+def import_times(args):
+    python = Executable(sys.executable)
+    runs = []
+    for i in range(max(1, args.runs)):
+        output = python('-c', _import_times_script, json.dumps(sys.path),
+                        *args.modules, output=str)
+        runs.append(json.loads(output))
+    times = min(runs, key=lambda t: sum(t.values()))
+
+    totals = {}
+    for module, seconds in times.items():
+        key = module if args.by_module else _subsystem(module)
+        totals[key] = totals.get(key, 0.0) + seconds
+
+    width = max(len(k) for k in totals) if totals else 0
+    for key, seconds in sorted(
+            totals.items(), key=lambda item: (-item[1], item[0])):
+        print('%-*s %8.1f ms' % (width, key, seconds * 1000))
+    print('%-*s %8.1f ms' % (width, 'total', sum(times.values()) * 1000))
+
+
+def _directive_spec_strings(repo):
+    """Spec strings parsed while the package classes of repo are loaded,
+    i.e. those of depends_on(), conflicts(), when=, etc."""
+    import spack.spec
+
+    strings = []
+    parsed_specs = spack.spec._parsed_specs
+
+    def _record(string):
+        strings.append(string)
+        return parsed_specs(string)
+
+    spack.spec._parsed_specs = _record
+    try:
+        for name in repo.all_package_names():
+            repo.get_pkg_class(name)
+    finally:
+        spack.spec._parsed_specs = parsed_specs
+    return strings
+
+
+def _fastest(runs, function):
+    """Fastest time out of several runs of function, in seconds."""
+    times = []
+    for i in range(max(1, runs)):
+        start = time.time()
+        function()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def parse_times(args):
+    import spack.spec
+
+    strings = _directive_spec_strings(spack.repo.get_repo(args.namespace))
+    if not strings:
+        tty.die('No spec strings in the directives of %s' % args.namespace)
+
+    def parse():
+        for string in strings:
+            spack.spec.SpecParser().parse(string)
+
+    def parse_cached():
+        for string in strings:
+            spack.spec.parse(string)
+
+    def parse_cold_cache():
+        spack.spec._parse_cache.clear()
+        parse_cached()
+
+    print('%d spec strings, %d distinct' % (len(strings), len(set(strings))))
+    for label, function in (('parser', parse),
+                            ('cache, cold', parse_cold_cache),
+                            ('cache, warm', parse_cached)):
+        seconds = _fastest(args.runs, function)
+        print('%-12s %8.1f ms %8.1f us/spec' % (
+            label, seconds * 1000, seconds * 1e6 / len(strings)))
+
+
+def _children_cpu_time():
+    """CPU time used by the child processes waited for, in seconds."""
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def log_throughput(args):
+    from llnl.util.tty.log import log_output
+
+    lines, size = [], 0
+    while size < args.size * 2 ** 20:
+        line = '\x1b[1;32m==>\x1b[0m [%3d%%] Building CXX object ' \
+               'src/CMakeFiles/lib.dir/file%d.cpp.o\n' % (
+                   len(lines) % 100, len(lines))
+        lines.append(line)
+        size += len(line)
+    output = ''.join(lines)
+    block = max(1, args.block_size)
+
+    tmpdir = tempfile.mkdtemp()
+    runs = []
+    try:
+        log_file = join_path(tmpdir, 'build.out')
+        for i in range(max(1, args.runs)):
+            cpu_time = _children_cpu_time()
+            start = time.time()
+            with log_output(log_file):
+                for j in range(0, size, block):
+                    sys.stdout.write(output[j:j + block])
+            # the daemon is joined on exit, so its time is accounted for
+            runs.append((time.time() - start,
+                         _children_cpu_time() - cpu_time))
+    finally:
+        shutil.rmtree(tmpdir)
+    seconds, cpu_time = min(runs)
+
+    print('%.1f MB in %d lines, %d byte blocks' % (
+        size / 2.0 ** 20, len(lines), block))
+    print('%-12s %8.1f MB/s' % ('throughput', size / 2.0 ** 20 / seconds))
+    print('%-12s %8.1f ms' % ('elapsed', seconds * 1000))
+    print('%-12s %8.1f ms' % ('daemon cpu', cpu_time * 1000))
+
+
+def cc_times(args):
+    from spack.build_environment import get_dependency_dirs
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        prefixes = []
+        for i in range(args.dependencies):
+            prefix = join_path(tmpdir, 'dep%d' % i)
+            for d in ('include', 'lib', 'lib64'):
+                mkdirp(join_path(prefix, d))
+            prefixes.append(prefix)
+        include_dirs, link_dirs, rpath_dirs = get_dependency_dirs(
+            prefixes, prefixes, prefixes)
+
+        # What spack.build_environment sets for a build, with a compiler
+        # that the wrapper doesn't run: it prints the command line instead.
+        env = {
+            'SPACK_CC': '/bin/mycc',
+            'SPACK_PREFIX': join_path(tmpdir, 'prefix'),
+            'SPACK_ENV_PATH': spack.build_env_path,
+            'SPACK_DEBUG_LOG_DIR': tmpdir,
+            'SPACK_DEBUG_LOG_ID': 'foo-hashabc',
+            'SPACK_COMPILER_SPEC': 'gcc@4.4.7',
+            'SPACK_SHORT_SPEC': 'foo@1.2 arch=linux-rhel6-x86_64 /hashabc',
+            'SPACK_TEST_COMMAND': 'dump-args',
+            'SPACK_INCLUDE_DIRS': ':'.join(include_dirs),
+            'SPACK_LINK_DIRS': ':'.join(link_dirs),
+            'SPACK_RPATH_DIRS': ':'.join(rpath_dirs),
+        }
+        for lang in ('CC', 'CXX', 'F77', 'FC'):
+            env['SPACK_%s_RPATH_ARG' % lang] = '-Wl,-rpath,'
+
+        # An empty script run like the wrapper: the cost of starting it
+        cc = Executable(join_path(spack.build_env_path, 'cc'))
+        empty = join_path(tmpdir, 'empty')
+        with open(cc.exe[0]) as f:
+            shebang = f.readline()
+        with open(empty, 'w') as f:
+            f.write(shebang)
+        os.chmod(empty, 0o755)
+        commands = (
+            ('startup', lambda: Executable(empty)(env=env)),
+            ('compile', lambda: cc('-c', 'foo.c', '-o', 'foo.o',
+                                   output=str, env=env)),
+            ('link', lambda: cc('foo.o', '-o', 'foo', '-lfoo',
+                                output=str, env=env)),
+        )
+
+        invocations = max(1, args.invocations)
+        print('%d dependencies, mean of %d invocations' % (
+            args.dependencies, invocations))
+        for label, command in commands:
+            start = time.time()
+            for i in range(invocations):
+                command()
+            seconds = (time.time() - start) / invocations
+            print('%-12s %8.1f ms' % (label, seconds * 1000))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
 def debug(parser, args):
-    action = {'create-db-tarball': create_db_tarball}
+    action = {'create-db-tarball': create_db_tarball,
+              'import-times': import_times,
+              'parse-times': parse_times,
+              'log-throughput': log_throughput,
+              'cc-times': cc_times}
     action[args.debug_command](args)
@@ -57,9 +57,16 @@ def inverted_dependencies():
        actual dependents.
     """
     dag = {}
-    for pkg in spack.repo.all_packages():
-        dag.setdefault(pkg.name, set())
-        for dep in pkg.dependencies:
+    for pkg_name in spack.repo.all_package_names():
+        # Read the dependencies from the metadata index, so that we don't
+        # have to import every package
+        metadata = spack.repo.package_metadata(pkg_name)
+        dependencies = set()
+        for names in metadata['dependencies'].values():
+            dependencies.update(names)
+
+        dag.setdefault(pkg_name, set())
+        for dep in dependencies:
             deps = [dep]
 
             # expand virtuals if necessary
@@ -67,7 +74,7 @@ def inverted_dependencies():
                 deps += [s.name for s in spack.repo.providers_for(dep)]
 
             for d in deps:
-                dag.setdefault(d, set()).add(pkg.name)
+                dag.setdefault(d, set()).add(pkg_name)
     return dag
 
 
@@ -30,7 +30,7 @@ import llnl.util.tty as tty
 import spack
 import spack.cmd
 from spack.spec import Spec
-from spack.repository import Repo
+from spack.repository import Repo, FastPackageChecker
 
 description = "open package files in $EDITOR"
 section = "packaging"
@@ -66,6 +66,10 @@ def edit_package(name, repo_path, namespace):
 
     spack.editor(path)
 
+    # Make sure the next Spack command notices the changes
+    packages_path = os.path.dirname(os.path.dirname(path))
+    FastPackageChecker.invalidate(packages_path)
+
 
 def setup_parser(subparser):
     excl_args = subparser.add_mutually_exclusive_group()
@@ -250,5 +250,9 @@ def print_text_info(pkg):
 
 
 def info(parser, args):
+    # Unlike `spack list`, this can't use spack.repo.package_metadata():
+    # the fetch strategy of each version comes from the package's own
+    # url_for_version(), and the phases and the conditions on provided
+    # virtuals exist only in the package class.
     pkg = spack.repo.get(args.name)
     print_text_info(pkg)
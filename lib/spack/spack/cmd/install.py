@@ -61,6 +61,10 @@ the dependencies"""
     subparser.add_argument(
         '-j', '--jobs', action='store', type=int,
         help="explicitly set number of make jobs. default is #cpus")
+    subparser.add_argument(
+        '-p', '--install-jobs', action='store', type=int,
+        help="number of dependencies to install at the same time. "
+             "the make jobs are split among them")
     subparser.add_argument(
         '--overwrite', action='store_true',
         help="reinstall an existing spec, even if it has dependents")
@@ -340,6 +344,10 @@ def install_spec(cli_args, kwargs, spec):
         # recursive calls.
         decorator = junit_output(spec, test_suite)
 
+        # Concurrent installs run in other processes, where the test
+        # suite can't record them.
+        kwargs['install_jobs'] = 1
+
     # Do the actual installation
     try:
         # decorate the install if necessary
@@ -384,6 +392,10 @@ def install(parser, args, **kwargs):
         if args.jobs <= 0:
             tty.die("The -j option must be a positive integer!")
 
+    if args.install_jobs is not None:
+        if args.install_jobs <= 0:
+            tty.die("The -p option must be a positive integer!")
+
     if args.no_checksum:
         spack.do_checksum = False        # TODO: remove this global.
 
@@ -396,6 +408,7 @@ def install(parser, args, **kwargs):
         'install_source': args.install_source,
         'install_deps': 'dependencies' in args.things_to_install,
         'make_jobs': args.jobs,
+        'install_jobs': args.install_jobs,
         'verbose': args.verbose,
         'fake': args.fake,
         'dirty': args.dirty,
@@ -93,9 +93,11 @@ def filter_by_name(pkgs, args):
                 if f.match(p):
                     return True
 
-                pkg = spack.repo.get(p)
-                if pkg.__doc__:
-                    return f.match(pkg.__doc__)
+                # Read the description from the metadata index, so that
+                # we don't have to import every package
+                description = spack.repo.package_metadata(p)['description']
+                if description:
+                    return f.match(description)
                 return False
         else:
             def match(p, f):
@@ -66,6 +66,10 @@ def setup_parser(subparser):
         '-o', '--one-version-per-spec', action='store_const',
         const=1, default=0,
         help="only fetch one 'preferred' version per spec, not all known")
+    create_parser.add_argument(
+        '-j', '--jobs', action='store', type=int,
+        help="number of package versions fetched at the same time. "
+        "default is #cpus")
 
     scopes = spack.config.config_scopes
 
@@ -75,7 +79,7 @@ def setup_parser(subparser):
     add_parser.add_argument(
         'url', help="url of mirror directory from 'spack mirror create'")
     add_parser.add_argument(
-        '--scope', choices=scopes, default=spack.cmd.default_modify_scope,
+        '--scope', choices=scopes, default=spack.cmd.default_modify_scope(),
         help="configuration scope to modify")
 
     # Remove
@@ -83,7 +87,7 @@ def setup_parser(subparser):
                                   help=mirror_remove.__doc__)
     remove_parser.add_argument('name')
     remove_parser.add_argument(
-        '--scope', choices=scopes, default=spack.cmd.default_modify_scope,
+        '--scope', choices=scopes, default=spack.cmd.default_modify_scope(),
         help="configuration scope to modify")
 
     # List
@@ -201,7 +205,8 @@ def mirror_create(args):
 
     # Actually do the work to create the mirror
     present, mirrored, error = spack.mirror.create(
-        directory, specs, num_versions=args.one_version_per_spec)
+        directory, specs, num_versions=args.one_version_per_spec,
+        jobs=args.jobs)
     p, m, e = len(present), len(mirrored), len(error)
 
     verb = "updated" if existed else "created"
@@ -22,6 +22,8 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
+import llnl.util.tty as tty
+
 import spack
 import spack.store
 description = "rebuild Spack's package database"
@@ -30,5 +32,19 @@ section = "admin"
 level = "long"
 
 
+def setup_parser(subparser):
+    subparser.add_argument(
+        '-j', '--jobs', action='store', type=int,
+        help="number of spec files read at the same time. default is #cpus")
+    subparser.add_argument(
+        '-i', '--incremental', action='store_true',
+        help="only read the spec files that changed since the last reindex")
+
+
 def reindex(parser, args):
-    spack.store.db.reindex(spack.store.layout)
+    if args.jobs is not None and args.jobs <= 0:
+        tty.die("The -j option must be a positive integer!")
+
+    spack.store.db.reindex(
+        spack.store.layout, jobs=args.jobs, incremental=args.incremental,
+        progress=True)
@@ -60,7 +60,7 @@ def setup_parser(subparser):
     add_parser.add_argument(
         'path', help="path to a Spack package repository directory")
     add_parser.add_argument(
-        '--scope', choices=scopes, default=spack.cmd.default_modify_scope,
+        '--scope', choices=scopes, default=spack.cmd.default_modify_scope(),
         help="configuration scope to modify")
 
     # Remove
@@ -70,7 +70,7 @@ def setup_parser(subparser):
         'path_or_namespace',
         help="path or namespace of a Spack package repository")
     remove_parser.add_argument(
-        '--scope', choices=scopes, default=spack.cmd.default_modify_scope,
+        '--scope', choices=scopes, default=spack.cmd.default_modify_scope(),
         help="configuration scope to modify")
 
 
@@ -42,6 +42,10 @@ The `view` can be built and tore down via a number of methods (the "actions"):
 
 - hardlink :: like the symlink view but hardlinks are used.
 
+- copy :: like the symlink view but files are copied, as copy-on-write
+  clones on filesystems that support them (btrfs, XFS) so that no data
+  is duplicated.
+
 - statlink :: a view producing a status report of a symlink or
   hardlink view.
 
@@ -58,13 +62,15 @@ import spack
 import spack.cmd
 import spack.store
 from spack.filesystem_view import YamlFilesystemView
+from llnl.util.filesystem import clone_file
 import llnl.util.tty as tty
 
 description = "produce a single-rooted directory view of packages"
 section = "environment"
 level = "short"
 
-actions_link = ["symlink", "add", "soft", "hardlink", "hard"]
+actions_link = ["symlink", "add", "soft", "hardlink", "hard", "copy",
+                "clone"]
 actions_remove = ["remove", "rm"]
 actions_status = ["statlink", "status", "check"]
 
@@ -124,6 +130,10 @@ def setup_parser(sp):
         "hardlink": ssp.add_parser(
             'hardlink', aliases=['hard'],
             help='add packages files to a filesystem via via hard links'),
+        "copy": ssp.add_parser(
+            'copy', aliases=['clone'],
+            help='add package files to a filesystem view via copy-on-write '
+            'clones where supported, else copies'),
         "remove": ssp.add_parser(
             'remove', aliases=['rm'],
             help='remove packages from a filesystem view'),
@@ -162,9 +172,13 @@ def setup_parser(sp):
             so["nargs"] = "+"
             act.add_argument('specs', **so)
 
-    for cmd in ["symlink", "hardlink"]:
+    for cmd in ["symlink", "hardlink", "copy"]:
         act = file_system_view_actions[cmd]
         act.add_argument("-i", "--ignore-conflicts", action='store_true')
+        act.add_argument(
+            '-j', '--jobs', action='store', type=int,
+            help="number of files linked at the same time. "
+            "default is the number of build jobs")
 
     return
 
@@ -174,11 +188,18 @@ def view(parser, args):
 
     path = args.path[0]
 
+    if args.action in ["hardlink", "hard"]:
+        link = os.link
+    elif args.action in ["copy", "clone"]:
+        link = clone_file
+    else:
+        link = os.symlink
+
     view = YamlFilesystemView(
         path, spack.store.layout,
         ignore_conflicts=getattr(args, "ignore_conflicts", False),
-        link=os.link if args.action in ["hardlink", "hard"]
-        else os.symlink,
+        link=link,
+        jobs=getattr(args, "jobs", None),
         verbose=args.verbose)
 
     # Process common args and specs
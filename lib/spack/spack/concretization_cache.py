@@ -0,0 +1,280 @@
+##############################################################################
+# Copyright (c) 2013-2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/spack/spack
+# Please also see the NOTICE and LICENSE files for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""Cache of concretized specs, kept in ``spack.misc_cache``.
+
+``Spec.concretize()`` looks abstract specs up here before running the
+concretizer, and stores the concrete specs it computes.  Entries are
+keyed by the abstract spec and by the inputs of concretization that are
+cheap to hash: the ``packages``, ``compilers`` and ``repos`` configuration,
+the host architecture, the packages whose tests are enabled and the
+sources of Spack itself.
+
+Each entry also records the content hash of the ``package.py`` of every
+package involved (the nodes of the concrete spec, and all the providers
+of the virtual packages they depend on), and the providers of those
+virtual packages.  The entry is used only if none of them changed.
+
+Entries are evicted, least recently used first, once the cache is larger
+than ``spack.concretization_cache_size`` megabytes.
+"""
+import hashlib
+import json
+import os
+
+import llnl.util.tty as tty
+from llnl.util.lang import memoized
+
+import spack
+import spack.architecture
+import spack.config
+import spack.error
+import spack.util.spack_json as sjson
+
+__all__ = ['cache_key', 'restore', 'put']
+
+#: Version of the format of the entries; bump it when they change
+_format_version = 1
+
+#: Directory of the entries in ``spack.misc_cache``
+_cache_dir = 'concretization'
+
+#: Configuration sections that concretization depends on
+_config_sections = ('packages', 'compilers', 'repos')
+
+
+@memoized
+def _spack_sources_hash():
+    """Hash of the sources of Spack, which implement concretization.
+
+    Their content is hashed, rather than the version of Spack, as Spack is
+    often run from a git checkout that changes between releases.
+    """
+    sha = hashlib.sha1()
+    for root, dirs, files in os.walk(spack.module_path):
+        dirs[:] = sorted(d for d in dirs if d != 'test')
+        for name in sorted(files):
+            if not name.endswith('.py'):
+                continue
+            path = os.path.join(root, name)
+            sha.update(os.path.relpath(path, spack.module_path).encode())
+            with open(path, 'rb') as f:
+                sha.update(f.read())
+    return sha.hexdigest()
+
+
+def _tested_packages():
+    """Packages whose test dependencies are part of their spec."""
+    testing = spack.package_testing
+    if testing._test_all:
+        return True
+    return sorted(testing.packages_to_test)
+
+
+def cache_key(spec):
+    """Key of the cache entry of an abstract spec, or None if the
+    concretization of spec can't be cached."""
+    if spack.concretization_cache_size <= 0:
+        return None
+
+    # Specs that refer to installed specs, or that are part of a larger
+    # DAG, are concretized from scratch.
+    if spec._dependents or any(s._concrete for s in spec.traverse()):
+        return None
+
+    # The providers of a virtual root are not recorded in the entry
+    if spack.repo.is_virtual(spec.name):
+        return None
+
+    inputs = {
+        'format': _format_version,
+        'spack': _spack_sources_hash(),
+        'tests': _tested_packages(),
+        'arch': str(spack.architecture.sys_type()),
+        'spec': str(spec),
+        'config': dict((section, spack.config.get_config(section))
+                       for section in _config_sections),
+    }
+    data = json.dumps(inputs, sort_keys=True, default=str)
+    return '{0}/{1}.json'.format(
+        _cache_dir, hashlib.sha256(data.encode('utf-8')).hexdigest())
+
+
+def _package_hash(name):
+    """Hash of the content of the package.py of a package, or None if it
+    has none."""
+    try:
+        with open(spack.repo.filename_for_package_name(name), 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except (spack.error.SpackError, EnvironmentError, AttributeError):
+        return None
+
+
+def _providers(virtual):
+    return sorted(set(p.name for p in spack.repo.providers_for(virtual)))
+
+
+def _inputs_of(spec):
+    """Packages involved in the concretization of spec, and providers of
+    the virtual packages it depends on."""
+    virtuals = {}
+    names = set()
+    for s in spec.traverse():
+        names.add(s.name)
+        for dep in s.package_class.dependencies:
+            if dep not in virtuals and spack.repo.is_virtual(dep):
+                virtuals[dep] = _providers(dep)
+                names.update(virtuals[dep])
+
+    packages = dict((name, _package_hash(name)) for name in names)
+    return packages, virtuals
+
+
+def _to_nodes(spec):
+    """Nodes of a concrete spec, with their dependencies of all types
+    (``Spec.to_dict()`` leaves out build dependencies)."""
+    nodes = []
+    for s in spec.traverse(order='pre'):
+        node = s.to_node_dict()
+        node[s.name].pop('dependencies', None)
+        node[s.name]['edges'] = [
+            [name, sorted(dspec.deptypes)]
+            for name, dspec in sorted(s.dependencies_dict().items())]
+        nodes.append(node)
+    return nodes
+
+
+def _from_nodes(nodes):
+    specs = [spack.spec.Spec.from_node_dict(node) for node in nodes]
+    by_name = dict((s.name, s) for s in specs)
+    for spec, node in zip(specs, nodes):
+        for name, deptypes in node[spec.name]['edges']:
+            spec._add_dependency(by_name[name], tuple(deptypes))
+    return specs[0]
+
+
+def _patches_order(spec):
+    """Order of the patches of each node, which the spec doesn't keep."""
+    order = {}
+    for s in spec.traverse():
+        if 'patches' in s.variants:
+            order[s.name] = list(getattr(
+                s.variants['patches'], '_patches_in_order_of_appearance', []))
+    return order
+
+
+def get(key):
+    """Concrete spec stored for a cache key, and the order of the patches
+    of its nodes, or None if there is none or it is out of date."""
+    if key is None or not spack.misc_cache.init_entry(key):
+        return None
+
+    try:
+        with spack.misc_cache.read_transaction(key) as f:
+            entry = sjson.load(f)
+        packages, virtuals = entry['packages'], entry['virtuals']
+        if any(_providers(v) != providers
+               for v, providers in virtuals.items()):
+            return None
+        if any(_package_hash(name) != h for name, h in packages.items()):
+            return None
+
+        spec = _from_nodes(entry['nodes'])
+    except Exception as e:
+        tty.debug('Ignoring concretization cache entry {0}: {1}'.format(
+            key, e))
+        return None
+
+    # Mark the entry as recently used
+    os.utime(spack.misc_cache.cache_path(key), None)
+    return spec, entry['patches']
+
+
+def restore(spec, key):
+    """Make an abstract spec concrete from the cache entry for key.
+
+    Returns:
+        bool: whether the entry existed and was up to date
+    """
+    cached = get(key)
+    if cached is None:
+        return False
+
+    cached, patches = cached
+    spec._dup(cached)
+    for s in spec.traverse():
+        if s.name in patches:
+            s.variants['patches']._patches_in_order_of_appearance = \
+                patches[s.name]
+
+    spec._mark_concrete()
+    for s in spec.traverse():
+        s.package.spec = s
+    return True
+
+
+def put(key, spec):
+    """Store a concrete spec under a cache key, evicting the entries used
+    least recently if the cache gets too large."""
+    if key is None or any(s.external_module for s in spec.traverse()):
+        return
+
+    packages, virtuals = _inputs_of(spec)
+    if None in packages.values():
+        return
+
+    entry = {
+        'nodes': _to_nodes(spec),
+        'patches': _patches_order(spec),
+        'packages': packages,
+        'virtuals': virtuals,
+    }
+    spack.misc_cache.init_entry(key)
+    with spack.misc_cache.write_transaction(key) as (old, new):
+        sjson.dump(entry, new)
+
+    _evict(spack.concretization_cache_size * 2 ** 20)
+
+
+def _evict(max_size):
+    root = spack.misc_cache.cache_path(_cache_dir)
+    entries = []
+    for name in os.listdir(root):
+        if name.startswith('.') or not name.endswith('.json'):
+            continue
+        try:
+            st = os.stat(os.path.join(root, name))
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, name))
+
+    size = sum(e[1] for e in entries)
+    for mtime, entry_size, name in sorted(entries):
+        if size <= max_size:
+            break
+        try:
+            spack.misc_cache.remove('{0}/{1}'.format(_cache_dir, name))
+        except OSError:
+            pass  # Evicted by someone else
+        size -= entry_size
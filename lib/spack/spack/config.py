@@ -47,23 +47,35 @@ it. Callers can then modify the data and write it back with
 When read in, Spack validates configurations with jsonschemas.  The
 schemas are in submodules of :py:mod:`spack.schema`.
 
+Configuration files are read and validated once, and read again only
+when they change on disk.  The merged contents of each section are
+cached too, until one of the files they come from changes, or
+``update_config`` or ``clear_config_caches`` is called.
+
+Across Spack invocations, the parsed and validated contents of each file
+are kept in ``spack.misc_cache``, so that unchanged files are loaded
+without parsing YAML or validating them against their schema.
+
 """
 
 import copy
+import hashlib
+import json
 import os
 import re
 import sys
 from six import string_types
+from six import integer_types
 from six import iteritems
+from six import text_type
 
 import yaml
-import jsonschema
 from yaml.error import MarkedYAMLError
-from jsonschema import Draft4Validator, validators
 from ordereddict_backport import OrderedDict
 
 import llnl.util.tty as tty
-from llnl.util.filesystem import mkdirp
+from llnl.util.filesystem import mkdirp, join_path
+from llnl.util.lang import memoized
 
 import spack
 import spack.architecture
@@ -88,6 +100,11 @@ section_schemas = {
 #: Later scopes will override earlier scopes.
 config_scopes = OrderedDict()
 
+#: Merged sections returned by ``get_config``, keyed by section and
+#: scope names. Each entry holds the (scope, data) pairs it was merged
+#: from, and is only used while every scope still has the same data.
+_merged_sections = {}
+
 
 def validate_section_name(section):
     """Exit if the section is not a valid section."""
@@ -105,6 +122,8 @@ def extend_with_default(validator_class):
        commented out.
 
     """
+    from jsonschema import validators
+
     validate_properties = validator_class.VALIDATORS["properties"]
     validate_pattern_properties = validator_class.VALIDATORS[
         "patternProperties"]
@@ -135,7 +154,12 @@ def extend_with_default(validator_class):
     })
 
 
-DefaultSettingValidator = extend_with_default(Draft4Validator)
+@memoized
+def default_setting_validator():
+    """Validator class that sets defaults. jsonschema is imported the first
+    time a configuration file is validated: cached files are not."""
+    from jsonschema import Draft4Validator
+    return extend_with_default(Draft4Validator)
 
 
 def validate_section(data, schema):
@@ -145,8 +169,9 @@ def validate_section(data, schema):
     on Spack YAML structures.
 
     """
+    import jsonschema
     try:
-        DefaultSettingValidator(schema).validate(data)
+        default_setting_validator()(schema).validate(data)
     except jsonschema.ValidationError as e:
         raise ConfigFormatError(e, data)
 
@@ -162,6 +187,7 @@ class ConfigScope(object):
         self.name = name           # scope name.
         self.path = path           # path to directory containing configs.
         self.sections = syaml.syaml_dict()  # sections read from config files.
+        self._stats = {}           # stat of each file when it was read.
 
         # Register in a dict of all ConfigScopes
         # TODO: make this cleaner.  Mocking up for testing is brittle.
@@ -173,14 +199,16 @@ class ConfigScope(object):
         return os.path.join(self.path, "%s.yaml" % section)
 
     def get_section(self, section):
-        if section not in self.sections:
-            path   = self.get_section_filename(section)
-            schema = section_schemas[section]
-            data   = _read_config_file(path, schema)
+        path = self.get_section_filename(section)
+        stat = _file_stat(path)
+        if section not in self.sections or self._stats[section] != stat:
+            data = _load_config_file(path, section, stat)
             self.sections[section] = data
+            self._stats[section] = stat
         return self.sections[section]
 
     def write_section(self, section):
+        import jsonschema
         filename = self.get_section_filename(section)
         data = self.get_section(section)
         try:
@@ -188,6 +216,10 @@ class ConfigScope(object):
             with open(filename, 'w') as f:
                 validate_section(data, section_schemas[section])
                 syaml.dump(data, stream=f, default_flow_style=False)
+            # What we have in memory is what is in the file now.
+            self._stats[section] = _file_stat(filename)
+            _cache_config_file(
+                filename, section, self._stats[section], data)
         except jsonschema.ValidationError as e:
             raise ConfigSanityError(e, data)
         except (yaml.YAMLError, IOError) as e:
@@ -197,6 +229,7 @@ class ConfigScope(object):
     def clear(self):
         """Empty cached config information."""
         self.sections = syaml.syaml_dict()
+        self._stats = {}
 
     def __repr__(self):
         return '<ConfigScope: %s: %s>' % (self.name, self.path)
@@ -259,6 +292,16 @@ def validate_scope(scope):
                          % (scope, config_scopes.keys()))
 
 
+def _file_stat(filename):
+    """Identify the version of a file on disk: its inode, size and
+    modification time, or None if it doesn't exist."""
+    try:
+        st = os.stat(filename)
+        return (st.st_ino, st.st_size, st.st_mtime)
+    except OSError:
+        return None
+
+
 def _read_config_file(filename, schema):
     """Read a YAML configuration file."""
     # Ignore nonexisting files.
@@ -290,11 +333,211 @@ def _read_config_file(filename, schema):
             "Error reading configuration file %s: %s" % (filename, str(e)))
 
 
+#: Version of the format of cached configuration files. Bump it when the
+#: way data is encoded in them changes.
+_cache_format_version = 2
+
+#: Directory of cached configuration files in the misc cache
+_cache_dir = 'config'
+
+#: Entries that could not be written yet, because the misc cache was not
+#: set up when the file was read (e.g. while reading its own location).
+_pending_cache_entries = {}
+
+
+@memoized
+def _schema_hash(section):
+    """Hash of the schema of a section, so that cached files are
+    validated again when it changes."""
+    schema = json.dumps(section_schemas[section], sort_keys=True)
+    return hashlib.sha1(schema.encode('utf-8')).hexdigest()
+
+
+def _cache_key(filename):
+    """Key of the cached contents of a configuration file."""
+    sha = hashlib.sha1(os.path.abspath(filename).encode('utf-8'))
+    return '{0}/{1}.json'.format(_cache_dir, sha.hexdigest())
+
+
+def _cache_header(filename, section, stat):
+    """Everything a cached file has to match to be used."""
+    return {
+        'version': _cache_format_version,
+        'path': os.path.abspath(filename),
+        'stat': list(stat),
+        'schema': _schema_hash(section),
+    }
+
+
+def _config_cache(section, readonly=False):
+    """The misc cache, or None if it can't be used.
+
+    The location of the misc cache is itself configurable, so it can't be
+    set up while the ``config`` section is read. In that case, entries
+    can still be read from the default location, if it exists.
+    """
+    import spack
+    if 'misc_cache' in spack.__dict__ or section != 'config':
+        return spack.misc_cache
+
+    if readonly:
+        from spack.file_cache import FileCache
+        from spack.util.path import canonicalize_path
+        path = canonicalize_path(join_path(spack.user_config_path, 'cache'))
+        if os.path.isdir(path):
+            return FileCache(path)
+    return None
+
+
+def _encode_mark(mark):
+    return [mark.name, mark.index, mark.line, mark.column]
+
+
+def _decode_mark(mark):
+    name, index, line, column = mark
+    return yaml.Mark(name, index, line, column, None, None)
+
+
+#: Tags of the types that cached data is made of, and their classes
+_cached_types = (
+    ('D', syaml.syaml_dict), ('d', dict),
+    ('L', syaml.syaml_list), ('l', list),
+    ('S', syaml.syaml_str), ('s', str), ('u', text_type),
+)
+
+
+def _encode(data):
+    """Encode the contents of a configuration file as plain JSON data.
+
+    Strings, lists and dicts keep their type, their YAML marks (for the
+    line information of error messages) and whether they are overrides.
+    Other objects than those read from YAML raise a TypeError.
+    """
+    if data is None or isinstance(data, (bool, float) + integer_types):
+        return data
+
+    for tag, cls in _cached_types:
+        if isinstance(data, cls):
+            break
+    else:
+        raise TypeError("cannot cache %s" % type(data).__name__)
+
+    if isinstance(data, dict):
+        value = [[_encode(k), _encode(v)] for k, v in iteritems(data)]
+    elif isinstance(data, list):
+        value = [_encode(v) for v in data]
+    else:
+        value = data
+
+    node = {'t': tag, 'v': value}
+    if getattr(data, '_start_mark', None) is not None:
+        node['m'] = [_encode_mark(data._start_mark),
+                     _encode_mark(data._end_mark)]
+    if override(data):
+        node['o'] = True
+    return node
+
+
+def _decode(node):
+    """Inverse of ``_encode()``."""
+    if not isinstance(node, dict):
+        return node
+
+    cls = dict(_cached_types)[node['t']]
+    value = node['v']
+    if issubclass(cls, dict):
+        data = cls((_decode(k), _decode(v)) for k, v in value)
+    elif issubclass(cls, list):
+        data = cls(_decode(v) for v in value)
+    else:
+        data = cls(value)
+
+    if 'm' in node:
+        data._start_mark, data._end_mark = [
+            _decode_mark(m) for m in node['m']]
+    if node.get('o'):
+        data.override = True
+    return data
+
+
+def _read_cached_config_file(filename, section, stat):
+    """Contents of a configuration file from the misc cache, or None if
+    they are not cached or the file changed since.
+
+    The misc cache may be shared: entries written by other users are
+    ignored, as they could change the configuration.
+    """
+    cache = _config_cache(section, readonly=True)
+    key = _cache_key(filename)
+    if cache is None or not os.path.exists(cache.cache_path(key)):
+        return None
+
+    try:
+        if os.stat(cache.cache_path(key)).st_uid != os.getuid():
+            tty.debug("Ignoring cached config file %s: not owned by the "
+                      "current user" % filename)
+            return None
+
+        with cache.read_transaction(key) as f:
+            entry = json.load(f)
+        if entry['header'] != _cache_header(filename, section, stat):
+            return None
+        data = _decode(entry['data'])
+        tty.debug("Read cached config file %s" % filename)
+        return data
+    except Exception as e:
+        # A broken cache is only a cache miss
+        tty.debug("Ignoring cached config file %s: %s" % (filename, e))
+        return None
+
+
+def _cache_config_file(filename, section, stat, data):
+    """Store the parsed and validated contents of a configuration file in
+    the misc cache, or remember them until the misc cache is set up."""
+    try:
+        _pending_cache_entries[_cache_key(filename)] = json.dumps({
+            'header': _cache_header(filename, section, stat),
+            'data': _encode(data),
+        })
+    except Exception as e:
+        tty.debug("Cannot cache config file %s: %s" % (filename, e))
+        return
+
+    cache = _config_cache(section)
+    if cache is None:
+        return
+
+    while _pending_cache_entries:
+        key, contents = _pending_cache_entries.popitem()
+        try:
+            cache.init_entry(key)
+            with cache.write_transaction(key) as (old, new):
+                new.write(contents)
+        except Exception as e:
+            tty.debug("Cannot write config cache entry %s: %s" % (key, e))
+
+
+def _load_config_file(filename, section, stat):
+    """Read a configuration file, from the misc cache if it didn't change
+    since it was last parsed and validated."""
+    if stat is None:
+        # Ignore nonexisting files.
+        return None
+
+    data = _read_cached_config_file(filename, section, stat)
+    if data is None:
+        data = _read_config_file(filename, section_schemas[section])
+        if data is not None:
+            _cache_config_file(filename, section, stat, data)
+    return data
+
+
 def clear_config_caches():
     """Clears the caches for configuration files, which will cause them
        to be re-read upon the next request"""
     for scope in config_scopes.values():
         scope.clear()
+    _merged_sections.clear()
 
 
 def override(string):
@@ -395,18 +638,38 @@ def get_config(section, scope=None):
 
     """
     validate_section_name(section)
-    merged_section = syaml.syaml_dict()
 
     if scope is None:
-        scopes = config_scopes.values()
+        scopes = list(config_scopes.values())
     else:
         scopes = [validate_scope(scope)]
 
-    for scope in scopes:
-        # read potentially cached data from the scope.
+    # read potentially cached data from the scopes, and reuse the merged
+    # section if none of them changed.
+    sources = [(s, s.get_section(section)) for s in scopes]
+    key = (section, tuple(s.name for s in scopes))
+    cached = _merged_sections.get(key)
+    if cached is None or not _same_sources(cached[0], sources):
+        cached = (sources, _merge_sections(section, sources))
+        _merged_sections[key] = cached
+
+    # Callers may modify what they get (e.g., to pass it to
+    # update_config), so they get their own copy of the top level.
+    return copy.copy(cached[1])
+
 
-        data = scope.get_section(section)
+def _same_sources(cached, sources):
+    """Whether the (scope, data) pairs of a merged section are still the
+    same objects as those in ``sources``."""
+    return len(cached) == len(sources) and all(
+        cs is s and cd is d for (cs, cd), (s, d) in zip(cached, sources))
+
+
+def _merge_sections(section, sources):
+    """Merge the data of a section read from (scope, data) pairs."""
+    merged_section = syaml.syaml_dict()
 
+    for scope, data in sources:
         # Skip empty configs
         if not data or not isinstance(data, dict):
             continue
@@ -445,8 +708,10 @@ def update_config(section, update_data, scope=None):
     validate_section_name(section)  # validate section name
     scope = validate_scope(scope)  # get ConfigScope object from string.
 
-    # read only the requested section's data.
+    # read only the requested section's data, and don't let the file on
+    # disk take precedence over it before it is written.
     scope.sections[section] = {section: update_data}
+    scope._stats[section] = _file_stat(scope.get_section_filename(section))
     scope.write_section(section)
 
 
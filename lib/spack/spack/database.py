@@ -38,11 +38,21 @@ as the authoritative database of packages in Spack.  This module
 provides a cache and a sanity checking mechanism for what is in the
 filesystem.
 
+On disk, the database is a snapshot of all its records (``index.json``)
+plus a journal of the records changed since the snapshot was taken
+(``index.journal``).  Write transactions append the records they changed
+to the journal, and read transactions only replay the journal entries
+written since the last time they read it.  When the journal gets larger
+than the snapshot, it is compacted into a new snapshot.
+
 """
 import os
 import sys
 import socket
 import contextlib
+import json
+import uuid
+from ordereddict_backport import OrderedDict
 from six import string_types
 from six import iteritems
 
@@ -52,7 +62,6 @@ import llnl.util.tty as tty
 from llnl.util.filesystem import join_path, mkdirp
 from llnl.util.lock import Lock, WriteTransaction, ReadTransaction
 
-import spack.store
 import spack.repository
 import spack.spec
 import spack.util.spack_yaml as syaml
@@ -60,14 +69,20 @@ import spack.util.spack_json as sjson
 from spack.util.crypto import bit_length
 from spack.directory_layout import DirectoryLayoutError
 from spack.error import SpackError
-from spack.version import Version
+from spack.version import Version, VersionList
 
 
 # DB goes in this directory underneath the root
 _db_dirname = '.spack-db'
 
 # DB version.  This is stuck in the DB file to track changes in format.
-_db_version = Version('0.9.3')
+# Version 0.9.4 added the journal: 0.9.3 files can still be read as they
+# are, while older ones have to be reindexed.
+_db_version = Version('0.9.4')
+_oldest_readable_db_version = Version('0.9.3')
+
+# Journals smaller than this are never compacted into a new snapshot
+_journal_min_compaction_size = 64 * 1024
 
 # Timeout for spack database locks in seconds
 _db_lock_timeout = 60
@@ -112,14 +127,16 @@ class InstallRecord(object):
         self.ref_count = ref_count
         self.explicit = explicit
 
-    def to_dict(self):
-        return {
-            'spec': self.spec.to_node_dict(),
+    def to_dict(self, include_spec=True):
+        rec_dict = {
             'path': self.path,
             'installed': self.installed,
             'ref_count': self.ref_count,
             'explicit': self.explicit
         }
+        if include_spec:
+            rec_dict['spec'] = self.spec.to_node_dict()
+        return rec_dict
 
     @classmethod
     def from_dict(cls, spec, dictionary):
@@ -128,6 +145,123 @@ class InstallRecord(object):
                              d.get('explicit', False))
 
 
+class _RecordIndex(object):
+    """Secondary indexes over the install records of a Database.
+
+    Each index maps the value of one field of a record (package name,
+    version, compiler name, architecture components, installed and
+    explicit flags) to the set of DAG hashes of the records that have
+    it.  ``Database.query`` uses them to find the few records that
+    *can* satisfy an abstract query before running ``satisfies`` on
+    them.
+
+    Records must be re-added with ``add()`` whenever one of their
+    indexed fields changes.
+    """
+
+    _fields = ('name', 'version', 'compiler', 'platform', 'platform_os',
+               'target', 'installed', 'explicit')
+
+    def __init__(self, data=None):
+        self.clear()
+        if data:
+            for key, rec in data.items():
+                self.add(key, rec)
+
+    def clear(self):
+        self._index = dict((field, {}) for field in self._fields)
+        self._values = {}
+
+    @staticmethod
+    def _record_values(rec):
+        spec = rec.spec
+        arch = spec.architecture
+        return {
+            'name': spec.name,
+            'version': spec.versions.concrete,
+            'compiler': spec.compiler.name if spec.compiler else None,
+            'platform': arch.platform if arch else None,
+            'platform_os': arch.platform_os if arch else None,
+            'target': arch.target if arch else None,
+            'installed': rec.installed,
+            'explicit': rec.explicit,
+        }
+
+    def add(self, key, rec):
+        """Index (or re-index) the record with DAG hash ``key``."""
+        self.remove(key)
+        values = self._record_values(rec)
+        for field, value in values.items():
+            self._index[field].setdefault(value, set()).add(key)
+        self._values[key] = values
+
+    def remove(self, key):
+        """Drop the record with DAG hash ``key`` from all the indexes."""
+        values = self._values.pop(key, None)
+        if values is None:
+            return
+        for field, value in values.items():
+            bucket = self._index[field][value]
+            bucket.discard(key)
+            if not bucket:
+                del self._index[field][value]
+
+    def _lookup(self, field, *values):
+        keys = set()
+        for value in values:
+            keys.update(self._index[field].get(value, ()))
+        return keys
+
+    def candidates(self, query_spec=any, installed=any, explicit=any):
+        """Keys of the records that may match a query.
+
+        Returns None if the query constrains none of the indexed fields,
+        meaning that every record is a candidate. Otherwise the result
+        is a superset of the matching records: the caller still has to
+        check ``satisfies`` on each candidate.
+        """
+        constraints = []
+        if installed is not any:
+            constraints.append(self._lookup('installed', installed))
+        if explicit is not any:
+            constraints.append(self._lookup('explicit', explicit))
+
+        if isinstance(query_spec, spack.spec.Spec):
+            # Virtual names are satisfied by providers with other names
+            if query_spec.name and not query_spec.virtual:
+                constraints.append(self._lookup('name', query_spec.name))
+
+            # Records without a concrete version, a compiler or an
+            # architecture are unconstrained, so they are candidates for
+            # any query.
+            versions = query_spec.versions
+            if versions and versions != spack.spec._any_version:
+                constraints.append(self._lookup('version', None, *[
+                    v for v in self._index['version'] if v is not None and
+                    VersionList([v]).satisfies(versions)]))
+
+            if query_spec.compiler:
+                constraints.append(self._lookup(
+                    'compiler', query_spec.compiler.name, None))
+
+            arch = query_spec.architecture
+            if arch:
+                for field in ('platform', 'platform_os', 'target'):
+                    value = getattr(arch, field)
+                    if value:
+                        constraints.append(self._lookup(field, value, None))
+
+        if not constraints:
+            return None
+
+        # Intersect starting from the most selective index
+        constraints.sort(key=len)
+        keys = constraints[0]
+        for other in constraints[1:]:
+            keys &= other
+        return keys
+
+
 class Database(object):
 
     """Per-process lock objects for each install prefix."""
@@ -167,6 +301,8 @@ class Database(object):
         # Set up layout of database files within the db dir
         self._old_yaml_index_path = join_path(self._db_dir, 'index.yaml')
         self._index_path = join_path(self._db_dir, 'index.json')
+        self._journal_path = join_path(self._db_dir, 'index.journal')
+        self._spec_files_path = join_path(self._db_dir, 'spec_files.json')
         self._lock_path = join_path(self._db_dir, 'lock')
 
         # This is for other classes to use to lock prefix directories.
@@ -179,10 +315,29 @@ class Database(object):
         # initialize rest of state.
         self.lock = Lock(self._lock_path)
         self._data = {}
+        self._index = _RecordIndex()
 
         # whether there was an error at the start of a read transaction
         self._error = None
 
+        # Id of the snapshot _data was read from, and position in its
+        # journal up to which entries were applied.  An offset of None
+        # means the journal can't be appended to, so the next write
+        # takes a new snapshot instead.
+        self._journal_id = None
+        self._journal_offset = None
+
+        # Whether _data is the same as what was on disk at the last read
+        # or write, in which case it can be updated from the journal.
+        self._synced = False
+
+        # Records changed in memory and not yet written, mapped to
+        # whether they were in the database before the change.
+        self._dirty = OrderedDict()
+
+        # Generation of the files on disk at the last read or write.
+        self._last_generation = None
+
     def write_transaction(self, timeout=_db_lock_timeout):
         """Get a write lock context manager for use in a `with` block."""
         return WriteTransaction(self.lock, self._read, self._write, timeout)
@@ -232,7 +387,7 @@ class Database(object):
         finally:
             prefix_lock.release_write()
 
-    def _write_to_file(self, stream):
+    def _write_to_file(self, stream, journal_id=None):
         """Write out the databsae to a JSON file.
 
         This function does not do any locking or transactions.
@@ -249,7 +404,8 @@ class Database(object):
         database = {
             'database': {
                 'installs': installs,
-                'version': str(_db_version)
+                'version': str(_db_version),
+                'journal': journal_id
             }
         }
 
@@ -319,6 +475,11 @@ class Database(object):
         except Exception as e:
             raise CorruptDatabaseError("error parsing database:", str(e))
 
+        # Whatever was in memory is replaced by the snapshot.
+        self._dirty = OrderedDict()
+        self._journal_id = None
+        self._journal_offset = None
+
         if fdata is None:
             return
 
@@ -340,7 +501,8 @@ class Database(object):
         version = Version(db['version'])
         if version > _db_version:
             raise InvalidDatabaseVersionError(_db_version, version)
-        elif version < _db_version:
+        elif version < _oldest_readable_db_version:
+            import spack.store
             self.reindex(spack.store.layout)
             installs = dict((k, v.to_dict()) for k, v in self._data.items())
 
@@ -391,12 +553,140 @@ class Database(object):
             rec.spec._mark_concrete()
 
         self._data = data
+        self._index = _RecordIndex(data)
+        self._journal_id = db.get('journal')
+        self._journal_offset = 0
+
+    def _read_journal(self, fresh=False):
+        """Apply the journal entries written since the last read.
+
+        Args:
+            fresh (bool): whether the snapshot was just read, so the
+                whole journal has to be applied
+
+        Returns:
+            bool: False if _data can't be brought up to date from the
+                journal alone (e.g. it was compacted into a new
+                snapshot), in which case the snapshot must be read again.
+
+        Does not do any locking.
+        """
+        if not fresh and (not self._synced or self._dirty or
+                          self._journal_offset is None):
+            return False
+
+        try:
+            with open(self._journal_path, 'rb') as f:
+                header = f.readline()
+                if fresh:
+                    offset = len(header)
+                else:
+                    offset = self._journal_offset
+                    f.seek(offset)
+                contents = f.read()
+        except (IOError, OSError):
+            header, contents = None, b''
+
+        try:
+            journal_id = sjson.load(header.decode('utf-8'))['journal']['id']
+        except Exception:
+            journal_id = None
+
+        if journal_id is None or journal_id != self._journal_id:
+            if not fresh:
+                return False
+            # The journal belongs to another snapshot, or there is none:
+            # the snapshot is all there is, and the next write will take
+            # a new one.
+            self._journal_offset = None
+            self._synced = True
+            return True
+
+        # Apply complete lines only: a line without a newline at the end
+        # is a write that did not finish.
+        entries = []
+        for line in contents.split(b'\n')[:-1]:
+            try:
+                entries.append(sjson.load(line.decode('utf-8')))
+            except Exception as e:
+                tty.warn("Ignoring corrupt entries in database journal: ",
+                         self._journal_path, str(e))
+                break
+            offset += len(line) + 1
+
+        self._apply_journal(entries)
+        self._journal_offset = offset
+        self._synced = True
+        return True
+
+    def _apply_journal(self, entries):
+        """Apply a list of journal entries to the in-memory database.
+
+        Does not do any locking.
+        """
+        # Records new to the in-memory database.  Their specs are built
+        # at the end, once all of their dependencies are known.
+        added = OrderedDict()
+
+        for entry in entries:
+            op, hash_key = entry['op'], entry['hash']
+            if op == 'add' and hash_key not in self._data:
+                added[hash_key] = entry['record']
+            elif op in ('add', 'update'):
+                if hash_key in added:
+                    added[hash_key].update(entry['record'])
+                elif hash_key in self._data:
+                    rec = self._data[hash_key]
+                    fields = entry['record']
+                    rec.path = fields['path']
+                    rec.installed = fields['installed']
+                    rec.ref_count = fields['ref_count']
+                    rec.explicit = fields['explicit']
+                    self._index.add(hash_key, rec)
+            elif op == 'remove':
+                added.pop(hash_key, None)
+                if hash_key in self._data:
+                    del self._data[hash_key]
+                    self._index.remove(hash_key)
+            else:
+                raise CorruptDatabaseError(
+                    "Invalid database journal entry: %s" % op,
+                    self._journal_path)
+
+        # Same three passes as when reading the snapshot
+        for hash_key, rec in added.items():
+            spec = self._read_spec_from_dict(hash_key, added)
+            self._data[hash_key] = InstallRecord.from_dict(spec, rec)
 
-    def reindex(self, directory_layout):
+        for hash_key in added:
+            self._assign_dependencies(hash_key, added, self._data)
+
+        for hash_key in added:
+            rec = self._data[hash_key]
+            rec.spec._mark_concrete()
+            self._index.add(hash_key, rec)
+
+    def _changed(self, hash_key):
+        """Note that the record for ``hash_key`` is about to change, so
+        that the next write journals it.
+        """
+        if hash_key not in self._dirty:
+            self._dirty[hash_key] = hash_key in self._data
+
+    def reindex(self, directory_layout, jobs=None, incremental=False,
+                progress=False):
         """Build database index from scratch based on a directory layout.
 
         Locks the DB if it isn't locked already.
 
+        Args:
+            directory_layout (DirectoryLayout): layout of the installs
+            jobs (int): number of processes reading spec files at the
+                same time. Default is ``spack.build_jobs``.
+            incremental (bool): only read the spec files that changed
+                since the last reindex, and take the specs of the others
+                from the database, if it is readable.
+            progress (bool): report how many spec files were read
         """
         # Special transaction to avoid recursive reindex calls and to
         # ignore errors if we need to rebuild a corrupt database.
@@ -404,9 +694,11 @@ class Database(object):
             try:
                 if os.path.isfile(self._index_path):
                     self._read_from_file(self._index_path)
+                    self._read_journal(fresh=True)
             except CorruptDatabaseError as e:
                 self._error = e
                 self._data = {}
+                self._index.clear()
 
         transaction = WriteTransaction(
             self.lock, _read_suppress_error, self._write, _db_lock_timeout
@@ -419,6 +711,7 @@ class Database(object):
                     str(self._error)
                 )
                 self._error = None
+                incremental = False
 
             # Read first the `spec.yaml` files in the prefixes. They should be
             # considered authoritative with respect to DB reindexing, as
@@ -428,13 +721,25 @@ class Database(object):
 
             old_data = self._data
             try:
-                # Initialize data in the reconstructed DB
+                # Initialize data in the reconstructed DB, which is
+                # written out as a new snapshot.
                 self._data = {}
+                self._index = _RecordIndex()
+                self._journal_offset = None
 
-                # Start inspecting the installed prefixes
+                # Start inspecting the installed prefixes, keeping track
+                # of the DAG hashes of the specs already added.
                 processed_specs = set()
 
-                for spec in directory_layout.all_specs():
+                # Specs whose prefix holds their spec file: they are
+                # installed, and their spec file doesn't have to be read
+                # again to check it.
+                spec_files = self._stat_spec_files(directory_layout)
+                specs, installed = self._read_spec_files(
+                    directory_layout, spec_files, old_data, jobs,
+                    incremental, progress)
+
+                for spec in specs:
                     # Try to recover explicit value from old DB, but
                     # default it to True if DB was corrupt. This is
                     # just to be conservative in case a command like
@@ -447,14 +752,15 @@ class Database(object):
                         if old_info is not None:
                             explicit = old_info.explicit
 
-                    self._add(spec, directory_layout, explicit=explicit)
+                    self._add(spec, directory_layout, explicit=explicit,
+                              installed_keys=installed)
 
-                    processed_specs.add(spec)
+                    processed_specs.add(spec.dag_hash())
 
                 for key, entry in old_data.items():
                     # We already took care of this spec using
                     # `spec.yaml` from its prefix.
-                    if entry.spec in processed_specs:
+                    if key in processed_specs:
                         msg = 'SKIPPING RECONSTRUCTION FROM OLD DB: {0}'
                         msg += ' [already reconstructed from spec.yaml]'
                         tty.debug(msg.format(entry.spec))
@@ -467,6 +773,7 @@ class Database(object):
                     # applications.
                     tty.debug(
                         'RECONSTRUCTING FROM OLD DB: {0}'.format(entry.spec))
+                    import spack.store
                     try:
                         layout = spack.store.layout
                         if entry.spec.external:
@@ -482,7 +789,7 @@ class Database(object):
                                 'explicit': entry.explicit
                             }
                             self._add(**kwargs)
-                            processed_specs.add(entry.spec)
+                            processed_specs.add(key)
                     except Exception as e:
                         # Something went wrong, so the spec was not restored
                         # from old data
@@ -494,8 +801,96 @@ class Database(object):
             except BaseException:
                 # If anything explodes, restore old data, skip write.
                 self._data = old_data
+                self._index = _RecordIndex(old_data)
                 raise
 
+            self._write_spec_files(spec_files, specs)
+
+    def _stat_spec_files(self, directory_layout):
+        """Map the path of each spec file in the layout to its
+        ``[mtime, size]``."""
+        spec_files = OrderedDict()
+        for path in directory_layout.all_spec_files():
+            try:
+                st = os.stat(path)
+            except OSError:
+                # Removed while we were looking
+                continue
+            spec_files[path] = [st.st_mtime, st.st_size]
+        return spec_files
+
+    def _read_spec_files(self, directory_layout, spec_files, old_data,
+                         jobs, incremental, progress):
+        """Read the specs in ``spec_files`` for ``reindex()``.
+
+        Returns:
+            tuple: the list of specs read, and the set of DAG hashes of
+                those whose spec file is the one in their prefix
+        """
+        # In incremental mode, the spec files with the same size and
+        # mtime as at the last reindex hold the specs of the database.
+        unchanged = {}
+        if incremental:
+            last_files = self._read_spec_files_stats()
+            for path, stat in spec_files.items():
+                last = last_files.get(path)
+                if last is None or last[:2] != stat:
+                    continue
+                rec = old_data.get(last[2])
+                if rec is not None and rec.installed:
+                    unchanged[path] = rec.spec
+
+        to_read = [p for p in spec_files if p not in unchanged]
+        if progress:
+            tty.msg('Reading {0} of {1} spec files'.format(
+                len(to_read), len(spec_files)))
+
+        specs, installed = [], set()
+
+        def found(path, spec):
+            specs.append(spec)
+            spec_files[path].append(spec.dag_hash())
+            if directory_layout.spec_file_path(spec) == path:
+                installed.add(spec.dag_hash())
+
+        for path, spec in unchanged.items():
+            found(path, spec)
+
+        jobs = jobs or spack.build_jobs
+        step = max(1, len(to_read) // 10)
+        spec_iter = directory_layout.read_spec_files(to_read, jobs)
+        for count, (path, spec) in enumerate(spec_iter, 1):
+            found(path, spec)
+            if progress and (count % step == 0 or count == len(to_read)):
+                tty.msg('Read {0}/{1} spec files'.format(count, len(to_read)))
+
+        return specs, installed
+
+    def _read_spec_files_stats(self):
+        """Stats of the spec files at the last reindex, mapping their
+        path to ``[mtime, size, dag_hash]``."""
+        try:
+            with open(self._spec_files_path) as f:
+                return sjson.load(f)['spec_files']
+        except (IOError, OSError, ValueError, KeyError, TypeError) as e:
+            tty.debug('Cannot read {0}: {1}'.format(
+                self._spec_files_path, str(e)))
+            return {}
+
+    def _write_spec_files(self, spec_files, specs):
+        """Record the stats of the spec files read by a reindex, for the
+        next incremental one."""
+        # Files that disappeared while being read have no hash
+        spec_files = OrderedDict(
+            (p, s) for p, s in spec_files.items() if len(s) == 3)
+        try:
+            self._write_atomically(
+                self._spec_files_path,
+                lambda f: sjson.dump({'spec_files': spec_files}, f))
+        except (IOError, OSError) as e:
+            tty.debug('Cannot write {0}: {1}'.format(
+                self._spec_files_path, str(e)))
+
     def _check_ref_counts(self):
         """Ensure consistency of reference counts in the DB.
 
@@ -532,24 +927,123 @@ class Database(object):
         This routine does no locking.
 
         """
-        # Do not write if exceptions were raised
+        # Do not write if exceptions were raised.  The next transaction
+        # has to read the whole database again.
         if type is not None:
+            self._synced = False
             return
 
-        temp_file = self._index_path + (
+        try:
+            if self._needs_snapshot():
+                self._write_snapshot()
+            else:
+                self._append_journal()
+        except BaseException:
+            self._synced = False
+            raise
+
+        self._dirty = OrderedDict()
+        self._synced = True
+        self._last_generation = self._generation()
+
+    def _generation(self):
+        """Return a marker that changes whenever the database files do.
+
+        The marker holds the inode, size and modification time of the
+        snapshot and of the journal (or None for a missing file).
+        Snapshots are moved into place and journal entries appended, so
+        every write changes it.
+        """
+        generation = []
+        for path in (self._index_path, self._journal_path):
+            try:
+                st = os.stat(path)
+                generation.append((st.st_ino, st.st_size, st.st_mtime))
+            except OSError:
+                generation.append(None)
+        return tuple(generation)
+
+    def _needs_snapshot(self):
+        """Whether the next write should compact the journal into a new
+        snapshot instead of appending to it."""
+        if self._journal_id is None or self._journal_offset is None:
+            return True
+
+        try:
+            snapshot_size = os.path.getsize(self._index_path)
+        except OSError:
+            return True
+        return self._journal_offset > max(
+            snapshot_size, _journal_min_compaction_size)
+
+    def _write_atomically(self, path, write_fn):
+        """Call ``write_fn`` on a temporary file, then move it to
+        ``path``."""
+        temp_file = path + (
             '.%s.%s.temp' % (socket.getfqdn(), os.getpid()))
 
-        # Write a temporary database file them move it into place
+        # Write a temporary file them move it into place
         try:
             with open(temp_file, 'w') as f:
-                self._write_to_file(f)
-            os.rename(temp_file, self._index_path)
+                write_fn(f)
+            os.rename(temp_file, path)
         except BaseException:
             # Clean up temp file if something goes wrong.
             if os.path.exists(temp_file):
                 os.remove(temp_file)
             raise
 
+    def _write_snapshot(self):
+        """Write all records to a new snapshot, with an empty journal.
+
+        The snapshot is moved into place first: if we die before the
+        journal is, the old journal won't match the new snapshot and
+        will be ignored.
+        """
+        journal_id = uuid.uuid4().hex
+        header = json.dumps({'journal': {'id': journal_id}}) + '\n'
+
+        self._write_atomically(
+            self._index_path,
+            lambda f: self._write_to_file(f, journal_id=journal_id))
+        self._write_atomically(
+            self._journal_path, lambda f: f.write(header))
+
+        self._journal_id = journal_id
+        self._journal_offset = len(header.encode('utf-8'))
+
+    def _append_journal(self):
+        """Append the records changed since the last write to the
+        journal."""
+        lines = []
+        for hash_key, existed in self._dirty.items():
+            rec = self._data.get(hash_key)
+            if rec is None:
+                if not existed:
+                    continue
+                entry = {'op': 'remove', 'hash': hash_key}
+            elif existed:
+                entry = {'op': 'update', 'hash': hash_key,
+                         'record': rec.to_dict(include_spec=False)}
+            else:
+                entry = {'op': 'add', 'hash': hash_key,
+                         'record': rec.to_dict()}
+            lines.append(json.dumps(entry, separators=(',', ':')))
+
+        if not lines:
+            return
+
+        data = ('\n'.join(lines) + '\n').encode('utf-8')
+        with open(self._journal_path, 'r+b') as f:
+            # Drop what a writer that died in the middle of an append
+            # may have left after the last complete entry.
+            f.seek(self._journal_offset)
+            f.truncate()
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_offset += len(data)
+
     def _read(self):
         """Re-read Database from the data in the set location.
 
@@ -558,9 +1052,19 @@ class Database(object):
         taking a write lock.
 
         """
-        if os.path.isfile(self._index_path):
-            # Read from JSON file if a JSON database exists
-            self._read_from_file(self._index_path, format='json')
+        generation = self._generation()
+        if generation[0] is not None:
+            # Nothing to do if no one wrote since we last did.
+            if (self._synced and not self._dirty and
+                    generation == self._last_generation):
+                return
+
+            # Read from JSON file if a JSON database exists, unless we
+            # can just catch up with the journal.
+            if not self._read_journal():
+                self._read_from_file(self._index_path, format='json')
+                self._read_journal(fresh=True)
+            self._last_generation = generation
 
         elif os.path.isfile(self._old_yaml_index_path):
             if os.access(self._db_dir, os.R_OK | os.W_OK):
@@ -577,15 +1081,19 @@ class Database(object):
             # reindex() takes its own write lock, so no lock here.
             with WriteTransaction(self.lock, timeout=_db_lock_timeout):
                 self._write(None, None, None)
+            import spack.store
             self.reindex(spack.store.layout)
 
-    def _add(self, spec, directory_layout=None, explicit=False):
+    def _add(self, spec, directory_layout=None, explicit=False,
+             installed_keys=()):
         """Add an install record for this spec to the database.
 
         Assumes spec is installed in ``layout.path_for_spec(spec)``.
 
         Also ensures dependencies are present and updated in the DB as
-        either intsalled or missing.
+        either intsalled or missing.  Specs (or dependencies) whose DAG
+        hash is in ``installed_keys`` are known to be installed, and
+        aren't checked against their prefix.
 
         """
         if not spec.concrete:
@@ -595,21 +1103,26 @@ class Database(object):
         for dep in spec.dependencies(_tracked_deps):
             dkey = dep.dag_hash()
             if dkey not in self._data:
-                self._add(dep, directory_layout, explicit=False)
+                self._add(dep, directory_layout, explicit=False,
+                          installed_keys=installed_keys)
 
         key = spec.dag_hash()
+        self._changed(key)
         if key not in self._data:
             installed = bool(spec.external)
             path = None
             if not spec.external and directory_layout:
                 path = directory_layout.path_for_spec(spec)
-                try:
-                    directory_layout.check_installed(spec)
+                if key in installed_keys:
                     installed = True
-                except DirectoryLayoutError as e:
-                    tty.warn(
-                        'Dependency missing due to corrupt install directory:',
-                        path, str(e))
+                else:
+                    try:
+                        directory_layout.check_installed(spec)
+                        installed = True
+                    except DirectoryLayoutError as e:
+                        tty.warn(
+                            'Dependency missing due to corrupt install '
+                            'directory:', path, str(e))
 
             # Create a new install record with no deps initially.
             new_spec = spec.copy(deps=False)
@@ -620,6 +1133,7 @@ class Database(object):
             for name, dep in iteritems(spec.dependencies_dict(_tracked_deps)):
                 dkey = dep.spec.dag_hash()
                 new_spec._add_dependency(self._data[dkey].spec, dep.deptypes)
+                self._changed(dkey)
                 self._data[dkey].ref_count += 1
 
             # Mark concrete once everything is built, and preserve
@@ -632,6 +1146,7 @@ class Database(object):
             self._data[key].installed = True
 
         self._data[key].explicit = explicit
+        self._index.add(key, self._data[key])
 
     @_autospec
     def add(self, spec, directory_layout, explicit=False):
@@ -668,11 +1183,13 @@ class Database(object):
             # not much we can do.
             return
 
+        self._changed(key)
         rec = self._data[key]
         rec.ref_count -= 1
 
         if rec.ref_count == 0 and not rec.installed:
             del self._data[key]
+            self._index.remove(key)
             for dep in spec.dependencies(_tracked_deps):
                 self._decrement_ref_count(dep)
 
@@ -680,13 +1197,16 @@ class Database(object):
         """Non-locking version of remove(); does real work.
         """
         key = self._get_matching_spec_key(spec)
+        self._changed(key)
         rec = self._data[key]
 
         if rec.ref_count > 0:
             rec.installed = False
+            self._index.add(key, rec)
             return rec.spec
 
         del self._data[key]
+        self._index.remove(key)
         for dep in rec.spec.dependencies(_tracked_deps):
             self._decrement_ref_count(dep)
 
@@ -710,6 +1230,20 @@ class Database(object):
         with self.write_transaction():
             return self._remove(spec)
 
+    @_autospec
+    def update_explicit(self, spec, explicit):
+        """Update the explicit flag of the record matching ``spec``.
+
+        Records must be updated through this method (rather than setting
+        ``InstallRecord.explicit``) so that queries on the flag see it.
+        """
+        with self.write_transaction():
+            key = self._get_matching_spec_key(spec)
+            self._changed(key)
+            rec = self._data[key]
+            rec.explicit = explicit
+            self._index.add(key, rec)
+
     @_autospec
     def installed_relatives(self, spec, direction='children', transitive=True):
         """Return installed specs related to this one."""
@@ -757,6 +1291,7 @@ class Database(object):
         the given spec
         """
         if extensions_layout is None:
+            import spack.store
             extensions_layout = spack.store.extensions
         for spec in self.query():
             try:
@@ -812,10 +1347,15 @@ class Database(object):
                 else:
                     return []
 
-            # Abstract specs require more work -- currently we test
-            # against everything.
+            # Abstract specs require more work: the indexes narrow down
+            # the records that can match, and we test against those.
+            keys = self._index.candidates(query_spec, installed, explicit)
+            if keys is None:
+                keys = self._data.keys()
+
             results = []
-            for key, rec in self._data.items():
+            for key in keys:
+                rec = self._data[key]
                 if installed is not any and rec.installed != installed:
                     continue
                 if explicit is not any and rec.explicit != explicit:
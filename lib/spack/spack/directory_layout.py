@@ -25,6 +25,7 @@
 import os
 import shutil
 import glob
+import multiprocessing
 import tempfile
 import yaml
 import re
@@ -70,6 +71,18 @@ class DirectoryLayout(object):
         """
         raise NotImplementedError()
 
+    def all_spec_files(self):
+        """To be implemented by subclasses to list the spec files of all the
+           specs for which there is a directory within the root.
+        """
+        raise NotImplementedError()
+
+    def read_spec_files(self, paths, jobs=1):
+        """To be implemented by subclasses to read the spec files in paths,
+           yielding (path, spec) pairs.
+        """
+        raise NotImplementedError()
+
     def relative_path_for_spec(self, spec):
         """Implemented by subclasses to return a relative path from the install
            root to a unique location for the provided spec."""
@@ -296,15 +309,47 @@ class YamlDirectoryLayout(DirectoryLayout):
             raise InconsistentInstallDirectoryError(
                 'Spec file in %s does not match hash!' % spec_file_path)
 
-    def all_specs(self):
+    def all_spec_files(self):
         if not os.path.isdir(self.root):
             return []
 
         path_elems = ["*"] * len(self.path_scheme.split(os.sep))
         path_elems += [self.metadata_dir, self.spec_file_name]
         pattern = join_path(self.root, *path_elems)
-        spec_files = glob.glob(pattern)
-        return [self.read_spec(s) for s in spec_files]
+        return glob.glob(pattern)
+
+    def read_spec_files(self, paths, jobs=1):
+        """Read the spec files in paths with up to jobs processes.
+
+        Yields (path, spec) pairs in the order the files are read, which
+        is not the order of paths when jobs > 1.
+
+        Raises:
+            SpecReadError: if one of the files can't be read
+        """
+        paths = list(paths)
+        jobs = min(len(paths), jobs or 1)
+        if jobs <= 1:
+            for path in paths:
+                yield path, self.read_spec(path)
+            return
+
+        pool = multiprocessing.Pool(jobs)
+        try:
+            args = [(self, path) for path in paths]
+            chunksize = max(1, len(paths) // (jobs * 8))
+            for path, spec, error in pool.imap_unordered(
+                    _read_spec_file, args, chunksize):
+                if error is not None:
+                    raise SpecReadError(*error)
+                yield path, spec
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def all_specs(self, jobs=1):
+        spec_files = self.all_spec_files()
+        return [spec for _, spec in self.read_spec_files(spec_files, jobs)]
 
     def specs_by_hash(self):
         by_hash = {}
@@ -313,6 +358,22 @@ class YamlDirectoryLayout(DirectoryLayout):
         return by_hash
 
 
+def _read_spec_file(args):
+    """Read a spec file in a worker process of a multiprocessing pool.
+
+    Errors are returned to the parent as the arguments of a
+    SpecReadError, since Spack's exceptions can't all be pickled.
+    """
+    layout, path = args
+    try:
+        return path, layout.read_spec(path), None
+    except SpecReadError as e:
+        return path, None, (e.message, e.long_message)
+    except Exception as e:
+        return path, None, ('Unable to read file: %s' % path,
+                            'Cause: ' + str(e))
+
+
 class YamlExtensionsLayout(ExtensionsLayout):
     """Implements globally activated extensions within a YamlDirectoryLayout.
     """
@@ -65,6 +65,15 @@ from spack.util.compression import decompressor_for, extension
 all_strategies = []
 
 
+def _file_stat(path):
+    """Identity of the content of a file, or None if it doesn't exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime)
+
+
 def _needs_stage(fun):
     """Many methods on fetch strategies require a stage to be set
        using set_stage().  This decorator adds a check for self.stage."""
@@ -186,6 +195,10 @@ class URLFetchStrategy(FetchStrategy):
         self.extra_curl_options = kwargs.get('curl_options', [])
         self._curl = None
 
+        # (path, stat, digest) of the last archive downloaded in-process,
+        # which check() doesn't need to read again
+        self._fetched_digest = None
+
         self.extension = kwargs.get('extension', None)
 
         if not self.url:
@@ -203,14 +216,46 @@ class URLFetchStrategy(FetchStrategy):
             tty.msg("Already downloaded %s" % self.archive_file)
             return
 
+        tty.msg("Fetching %s" % self.url)
+
+        if spack.url_fetch_method == 'urllib' and self.stage.save_filename:
+            self._fetch_urllib(self.stage.save_filename)
+        else:
+            self._fetch_curl()
+
+        if not self.archive_file:
+            raise FailedDownloadError(self.url)
+
+    def _fetch_urllib(self, save_file):
+        # Imported here, as spack.util.web needs spack to be initialized
+        import spack.util.web
+
+        # Hash the archive while it is downloaded, with the algorithm of
+        # the digest it will be checked against
+        hash_algorithm = None
+        if self.digest:
+            try:
+                hash_algorithm = crypto.Checker(self.digest).hash_fun
+            except ValueError:
+                pass
+
+        try:
+            digest, content_type = spack.util.web.download(
+                self.url, save_file, hash_algorithm, resume=True)
+        except spack.util.web.SpackWebError as e:
+            raise FailedDownloadError(self.url, e.long_message)
+
+        self._warn_if_html(content_type)
+        if digest:
+            self._fetched_digest = (save_file, _file_stat(save_file), digest)
+
+    def _fetch_curl(self):
         save_file = None
         partial_file = None
         if self.stage.save_filename:
             save_file = self.stage.save_filename
             partial_file = self.stage.save_filename + '.part'
 
-        tty.msg("Fetching %s" % self.url)
-
         if partial_file:
             save_args = ['-C',
                          '-',  # continue partial downloads
@@ -278,7 +323,14 @@ class URLFetchStrategy(FetchStrategy):
         # redirects properly.
         content_types = re.findall(r'Content-Type:[^\r\n]+', headers,
                                    flags=re.IGNORECASE)
-        if content_types and 'text/html' in content_types[-1]:
+        if content_types:
+            self._warn_if_html(content_types[-1])
+
+        if save_file:
+            os.rename(partial_file, save_file)
+
+    def _warn_if_html(self, content_type):
+        if content_type and 'text/html' in content_type:
             tty.warn("The contents of ",
                      (self.archive_file if self.archive_file is not None
                       else "the archive"),
@@ -286,11 +338,6 @@ class URLFetchStrategy(FetchStrategy):
                      "The checksum will likely be bad.  If it is, you can use",
                      "'spack clean <package>' to remove the bad archive, then",
                      "fix your internet gateway issue and install again.")
-        if save_file:
-            os.rename(partial_file, save_file)
-
-        if not self.archive_file:
-            raise FailedDownloadError(self.url)
 
     @property
     def archive_file(self):
@@ -365,7 +412,15 @@ class URLFetchStrategy(FetchStrategy):
                 "Attempt to check URLFetchStrategy with no digest.")
 
         checker = crypto.Checker(self.digest)
-        if not checker.check(self.archive_file):
+        if self._fetched_digest and self._fetched_digest[:2] == (
+                self.archive_file, _file_stat(self.archive_file)):
+            # Hashed while it was downloaded, and unchanged since
+            checker.sum = self._fetched_digest[2]
+            matches = checker.sum == self.digest
+        else:
+            matches = checker.check(self.archive_file)
+
+        if not matches:
             raise ChecksumError(
                 "%s checksum failed for %s" %
                 (checker.hash_name, self.archive_file),
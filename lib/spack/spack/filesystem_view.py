@@ -22,19 +22,22 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
+import errno
 import functools as ft
 import os
 import re
 import shutil
 import sys
+from multiprocessing.pool import ThreadPool
 
-from llnl.util.filesystem import join_path
-from llnl.util.link_tree import LinkTree
+from llnl.util.filesystem import join_path, mkdirp, touch
+from llnl.util.link_tree import LinkTree, link_files, empty_file_name
 from llnl.util import tty
 
 import spack
 import spack.spec
 import spack.store
+import spack.util.spack_json as sjson
 from spack.directory_layout import ExtensionAlreadyInstalledError
 from spack.directory_layout import YamlViewExtensionsLayout
 
@@ -46,6 +49,10 @@ if sys.version_info < (3, 0):
 
 __all__ = ["FilesystemView", "YamlFilesystemView"]
 
+#: Name of the file, in the metadata directory of a view, that records
+#: which spec each package in the view comes from and the paths it owns.
+manifest_name = "manifest.json"
+
 
 class FilesystemView(object):
     """
@@ -65,13 +72,15 @@ class FilesystemView(object):
             Initialize a filesystem view under the given `root` directory with
             corresponding directory `layout`.
 
-            Files are linked by method `link` (os.symlink by default).
+            Files are linked by method `link` (os.symlink by default), from
+            `jobs` threads (spack.build_jobs by default).
         """
         self.root = root
         self.layout = layout
 
         self.ignore_conflicts = kwargs.get("ignore_conflicts", False)
         self.link = kwargs.get("link", os.symlink)
+        self.jobs = kwargs.get("jobs", None) or spack.build_jobs
         self.verbose = kwargs.get("verbose", False)
 
     def add_specs(self, *specs, **kwargs):
@@ -104,6 +113,14 @@ class FilesystemView(object):
         """
         raise NotImplementedError
 
+    def add_standalones(self, specs):
+        """
+            Add (link) several standalone packages into this view.
+
+            Returns False if any of them could not be added.
+        """
+        return all(map(self.add_standalone, specs))
+
     def check_added(self, spec):
         """
             Check if the given concrete spec is active in this view.
@@ -144,6 +161,12 @@ class FilesystemView(object):
         """
         raise NotImplementedError
 
+    def remove_standalones(self, specs):
+        """
+            Remove (unlink) several standalone packages from this view.
+        """
+        set(map(self.remove_standalone, specs))
+
     def get_all_specs(self):
         """
             Get all specs currently active in this view.
@@ -188,6 +211,7 @@ class YamlFilesystemView(FilesystemView):
         self.extensions_layout = YamlViewExtensionsLayout(root, layout)
 
         self._croot = colorize_root(self.root) + " "
+        self._manifest = None
 
     def add_specs(self, *specs, **kwargs):
         assert all((s.concrete for s in specs))
@@ -211,7 +235,7 @@ class YamlFilesystemView(FilesystemView):
 
         set(map(self._check_no_ext_conflicts, extensions))
         # fail on first error, otherwise link extensions as well
-        if all(map(self.add_standalone, standalones)):
+        if self.add_standalones(standalones):
             all(map(self.add_extension, extensions))
 
     def add_extension(self, spec):
@@ -241,10 +265,169 @@ class YamlFilesystemView(FilesystemView):
         # extension-activation mechnism)
         if not self.check_added(spec):
             self.link_meta_folder(spec)
+            # the files of extensions are tracked by the extensions layout
+            self.read_manifest()[spec.name] = {'hash': spec.dag_hash()}
+            self.write_manifest()
 
         return True
 
     def add_standalone(self, spec):
+        return self.add_standalones([spec])
+
+    def add_standalones(self, specs):
+        """
+            Link the given standalone packages into this view at once.
+
+            Each prefix is walked a single time.  Conflicts, among the
+            packages and with the files already in the view, are looked up
+            in an in-memory index of the view, and nothing is linked unless
+            there are none (or `ignore_conflicts` is set).  The links are
+            then created by `jobs` threads.
+
+            The index is built from the manifest: only the prefixes of the
+            packages in the view that have no file list there are walked.
+            Paths that are not in the index are looked up in the view,
+            except in the directories created by this call.
+        """
+        to_link = []
+        for spec in sorted(specs, key=lambda s: s.name):
+            check = self._check_standalone(spec)
+            if check is False:
+                return False
+            elif check:
+                to_link.append(spec)
+
+        if not to_link:
+            return True
+
+        file_maps = self._get_file_maps([s.prefix for s in to_link])
+
+        # Index of the view as it will be once everything is linked: path
+        # relative to the root -> None for directories, or the name of the
+        # package that provides the file ('' if it is already in the view).
+        index = {}
+        nonempty = set()
+
+        def add_to_index(path, value):
+            index[path] = value
+            nonempty.add(os.path.dirname(path))
+
+        unlisted = []
+        for name, entry in self.read_manifest().items():
+            if 'created' in entry:
+                for d in entry['dirs']:
+                    add_to_index(d, None)
+                for f in entry['files']:
+                    add_to_index(f, name)
+        for spec in self.get_all_specs():
+            entry = self.read_manifest().get(spec.name, {})
+            if 'created' not in entry and os.path.isdir(spec.prefix):
+                unlisted.append(spec.prefix)
+        for dirs, files in self._get_file_maps(unlisted):
+            for d in dirs:
+                add_to_index(d, None)
+            for f in files:
+                add_to_index(f, '')
+
+        # Paths missing from the index may still have been put in the view
+        # by other means: those are looked up, unless their directory is
+        # created here.
+        fresh = set() if os.path.isdir(self.root) else set([''])
+
+        new_dirs, markers, pairs, conflicts = [], [], [], []
+        entries = {}
+        for spec, (dirs, files) in zip(to_link, file_maps):
+            linked, created = [], []
+            absent = set()
+            for d in dirs:
+                if d not in index:
+                    parent = os.path.dirname(d)
+                    path = join_path(self.root, d)
+                    if parent in fresh or parent in absent:
+                        absent.add(d)
+                    elif os.path.isdir(path):
+                        add_to_index(d, None)
+                        if os.listdir(path):
+                            nonempty.add(d)
+                    elif os.path.lexists(path):
+                        add_to_index(d, '')
+                    else:
+                        absent.add(d)
+                if d not in index:
+                    continue
+                if index[d] is not None:
+                    tty.error(self._croot +
+                              "Cannot link package %s, file blocks "
+                              "directory: %s"
+                              % (spec.name, join_path(self.root, d)))
+                    return False
+                # mark empty directories so they aren't removed on unmerge.
+                if d not in nonempty:
+                    markers.append(join_path(self.root, d, empty_file_name))
+                    add_to_index(os.path.join(d, empty_file_name), '')
+
+            for d in dirs:
+                if d not in index:
+                    new_dirs.append(d)
+                    created.append(d)
+                    fresh.add(d)
+                    add_to_index(d, None)
+
+            for f in files:
+                if f in index or (
+                        os.path.dirname(f) not in fresh and
+                        os.path.lexists(join_path(self.root, f))):
+                    conflicts.append((spec, f))
+                else:
+                    add_to_index(f, spec.name)
+                    linked.append(f)
+                    pairs.append((join_path(spec.prefix, f),
+                                  join_path(self.root, f)))
+
+            entries[spec.name] = {
+                'hash': spec.dag_hash(), 'files': linked, 'dirs': dirs,
+                'created': created}
+
+        if conflicts and not self.ignore_conflicts:
+            reported = set()
+            for spec, f in conflicts:
+                if spec.name not in reported:
+                    reported.add(spec.name)
+                    tty.error(self._croot +
+                              "Cannot link package %s, file already exists: "
+                              "%s" % (spec.name, join_path(self.root, f)))
+            return False
+
+        # Directories come before their contents in new_dirs
+        mkdirp(self.root)
+        for d in new_dirs:
+            os.mkdir(join_path(self.root, d))
+        for marker in markers:
+            touch(marker)
+
+        link_files(pairs, link=self.link, jobs=self.jobs)
+
+        for spec, f in conflicts:
+            tty.warn(self._croot +
+                     "Could not link: %s" % join_path(spec.prefix, f))
+
+        for spec in to_link:
+            self.link_meta_folder(spec)
+            if self.verbose:
+                tty.info(self._croot +
+                         'Linked package: %s' % colorize_spec(spec))
+
+        self.read_manifest().update(entries)
+        self.write_manifest()
+        return True
+
+    def _check_standalone(self, spec):
+        """
+            Check whether a standalone package can be linked in this view.
+
+            Returns True if it must be linked, None if it can be skipped and
+            False if it is an error to link it.
+        """
         if spec.package.is_extension:
             tty.error(self._croot + 'Package %s is an extension.'
                       % spec.name)
@@ -253,12 +436,12 @@ class YamlFilesystemView(FilesystemView):
         if spec.external:
             tty.warn(self._croot + 'Skipping external package: %s'
                      % colorize_spec(spec))
-            return True
+            return None
 
         if self.check_added(spec):
             tty.warn(self._croot + 'Skipping already linked package: %s'
                      % colorize_spec(spec))
-            return True
+            return None
 
         if spec.package.extendable:
             # Check for globally activated extensions in the extendee that
@@ -273,32 +456,81 @@ class YamlFilesystemView(FilesystemView):
                                         long=False)
                 return False
 
-        tree = LinkTree(spec.prefix)
-
-        if not self.ignore_conflicts:
-            conflict = tree.find_conflict(self.root)
-            if conflict is not None:
-                tty.error(self._croot +
-                          "Cannot link package %s, file already exists: %s"
-                          % (spec.name, conflict))
-                return False
+        return True
 
-        conflicts = tree.merge(self.root, link=self.link,
-                               ignore=ignore_metadata_dir,
-                               ignore_conflicts=self.ignore_conflicts)
-        self.link_meta_folder(spec)
+    def _get_file_maps(self, prefixes):
+        """
+            Walk the given prefixes with `jobs` threads, returning the
+            `(dirs, files)` of each that has to be linked.
+        """
+        def file_map(prefix):
+            return LinkTree(prefix).get_file_map(ignore=ignore_metadata_dir)
 
-        if self.ignore_conflicts:
-            for c in conflicts:
-                tty.warn(self._croot + "Could not link: %s" % c)
+        if self.jobs <= 1 or len(prefixes) < 2:
+            return [file_map(p) for p in prefixes]
 
-        if self.verbose:
-            tty.info(self._croot + 'Linked package: %s' % colorize_spec(spec))
-        return True
+        pool = ThreadPool(min(self.jobs, len(prefixes)))
+        try:
+            return pool.map(file_map, prefixes)
+        finally:
+            pool.terminate()
+            pool.join()
 
     def check_added(self, spec):
         assert spec.concrete
-        return spec == self.get_spec(spec)
+        return spec == self._get_linked_spec(spec)
+
+    @property
+    def manifest_path(self):
+        return join_path(self.root, spack.store.layout.metadata_dir,
+                         manifest_name)
+
+    def read_manifest(self):
+        """
+            Return the manifest of this view, as a dict mapping the name of
+            each package linked in the view to its entry.
+
+            Entries have the DAG hash of the spec (`hash`).  Those of
+            standalone packages also have the paths, relative to the root of
+            the view, of the files linked from the package (`files`), of all
+            its directories (`dirs`) and of the directories that linking it
+            created (`created`).
+
+            Packages linked by earlier versions of Spack have no entry.
+        """
+        if self._manifest is None:
+            self._manifest = {}
+            path = self.manifest_path
+            if os.path.exists(path):
+                try:
+                    with open(path) as f:
+                        self._manifest = sjson.load(f)['view']['specs']
+                except (ValueError, KeyError, TypeError) as e:
+                    tty.warn(self._croot +
+                             "Ignoring invalid view manifest %s" % path,
+                             str(e))
+        return self._manifest
+
+    def write_manifest(self):
+        """
+            Write the manifest of this view, replacing the old one at once.
+        """
+        path = self.manifest_path
+        mkdirp(os.path.dirname(path))
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            sjson.dump({'view': {'specs': self.read_manifest()}}, f)
+        os.rename(tmp_path, path)
+
+    def _get_linked_spec(self, spec):
+        """
+            Like `get_spec()`, but trust the manifest rather than reading the
+            spec file in the view when the hash of `spec` is recorded there.
+        """
+        entry = self.read_manifest().get(spec.name)
+        if entry is not None and entry['hash'] == spec.dag_hash():
+            return spec
+        return self.get_spec(spec)
 
     def remove_specs(self, *specs, **kwargs):
         assert all((s.concrete for s in specs))
@@ -348,9 +580,10 @@ class YamlFilesystemView(FilesystemView):
                                       with_dependents=with_dependents)
 
         set(map(remove_extension, extensions))
-        set(map(self.remove_standalone, standalones))
+        self.remove_standalones(standalones)
 
-        self.purge_empty_directories()
+        if extensions:
+            self.purge_empty_directories()
 
     def remove_extension(self, spec, with_dependents=True):
         """
@@ -370,35 +603,112 @@ class YamlFilesystemView(FilesystemView):
                 extensions_layout=self.extensions_layout)
         self.unlink_meta_folder(spec)
 
+        if self.read_manifest().pop(spec.name, None) is not None:
+            self.write_manifest()
+
     def remove_standalone(self, spec):
         """
             Remove (unlink) a standalone package from this view.
         """
-        if not self.check_added(spec):
-            tty.warn(self._croot +
-                     'Skipping package not linked in view: %s' % spec.name)
-            return
+        self.remove_standalones([spec])
 
-        tree = LinkTree(spec.prefix)
-        tree.unmerge(self.root, ignore=ignore_metadata_dir)
-        self.unlink_meta_folder(spec)
+    def remove_standalones(self, specs):
+        """
+            Remove (unlink) standalone packages from this view.
 
-        if self.verbose:
-            tty.info(self._croot + 'Removed package: %s' % colorize_spec(spec))
+            Only the files recorded for them in the manifest are removed:
+            their prefixes are not looked at.  Packages without an entry
+            (linked by earlier versions of Spack) are unmerged instead.
+        """
+        manifest = self.read_manifest()
+        unmerged = False
+        for spec in sorted(specs, key=lambda s: s.name):
+            if not self.check_added(spec):
+                tty.warn(self._croot +
+                         'Skipping package not linked in view: %s'
+                         % spec.name)
+                continue
+
+            entry = manifest.pop(spec.name, None)
+            if entry is not None and 'created' in entry:
+                self._unlink_entry(entry, manifest)
+            else:
+                tree = LinkTree(spec.prefix)
+                tree.unmerge(self.root, ignore=ignore_metadata_dir,
+                             links_only=self.link is os.symlink)
+                unmerged = True
+            self.unlink_meta_folder(spec)
+
+            if self.verbose:
+                tty.info(self._croot +
+                         'Removed package: %s' % colorize_spec(spec))
+
+        self.write_manifest()
+        if unmerged:
+            self.purge_empty_directories()
+
+    def _unlink_entry(self, entry, manifest):
+        """
+            Remove the files of a manifest entry, then the directories it
+            created once they are empty.
+
+            Directories that other packages in the `manifest` also have are
+            kept, and are handed over to one of them.
+        """
+        for f in entry['files']:
+            remove_if_exists(join_path(self.root, f))
+
+        others = {}
+        for name in sorted(manifest, reverse=True):
+            for d in manifest[name].get('dirs', ()):
+                others[d] = manifest[name]
+
+        # Subdirectories before their parents
+        for d in sorted(entry['created'], key=lambda d: d.count(os.sep),
+                        reverse=True):
+            if d in others:
+                others[d].setdefault('created', []).append(d)
+                continue
+            path = join_path(self.root, d)
+            remove_if_exists(join_path(path, empty_file_name))
+            try:
+                os.rmdir(path)
+            except OSError:
+                # still holds the files of packages linked without a manifest
+                pass
 
     def get_all_specs(self):
         dotspack = join_path(self.root, spack.store.layout.metadata_dir)
-        if os.path.exists(dotspack):
-            return list(filter(None, map(self.get_spec, os.listdir(dotspack))))
-        else:
+        if not os.path.exists(dotspack):
             return []
 
+        names = [n for n in sorted(os.listdir(dotspack))
+                 if not n.startswith(manifest_name)]
+
+        # The specs recorded in the manifest are taken from the database,
+        # which is read once, rather than from the spec file of each.
+        manifest = self.read_manifest()
+        installed = {}
+        if any(n in manifest for n in names):
+            installed = dict((s.dag_hash(), s)
+                             for s in spack.store.db.query())
+
+        specs = []
+        for name in names:
+            entry = manifest.get(name)
+            spec = installed.get(entry['hash']) if entry else None
+            if spec is None:
+                spec = self.get_spec(name)
+            if spec is not None:
+                specs.append(spec)
+        return specs
+
     def get_conflicts(self, *specs):
         """
             Return list of tuples (<spec>, <spec in view>) where the spec
             active in the view differs from the one to be activated.
         """
-        in_view = map(self.get_spec, specs)
+        in_view = map(self._get_linked_spec, specs)
         return [(s, v) for s, v in zip(specs, in_view)
                 if v is not None and s != v]
 
@@ -440,7 +750,7 @@ class YamlFilesystemView(FilesystemView):
             specs = set(get_dependencies(specs))
 
         specs = sorted(specs, key=lambda s: s.name)
-        in_view = list(map(self.get_spec, specs))
+        in_view = list(map(self._get_linked_spec, specs))
 
         for s, v in zip(specs, in_view):
             if not v:
@@ -545,3 +855,11 @@ def get_dependencies(specs):
 
 def ignore_metadata_dir(f):
     return f in spack.store.layout.hidden_file_paths
+
+
+def remove_if_exists(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
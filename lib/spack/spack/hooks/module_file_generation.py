@@ -22,20 +22,28 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
-import spack.modules
-import spack.modules.common
 import llnl.util.tty as tty
 
-try:
-    enabled = spack.modules.common.configuration['enable']
-except KeyError:
-    tty.debug('NO MODULE WRITTEN: list of enabled module files is empty')
-    enabled = []
+
+def _enabled():
+    """Names of the enabled module types.
+
+    Hook modules are loaded before every command: spack.modules (and
+    the configuration of module files) is only imported when a hook
+    actually writes or removes module files.
+    """
+    import spack.modules.common
+    try:
+        return spack.modules.common.configuration['enable']
+    except KeyError:
+        tty.debug('NO MODULE WRITTEN: list of enabled module files is empty')
+        return []
 
 
 def _for_each_enabled(spec, method_name):
     """Calls a method for each enabled module"""
-    for name in enabled:
+    import spack.modules
+    for name in _enabled():
         generator = spack.modules.module_types[name](spec)
         try:
             getattr(generator, method_name)()
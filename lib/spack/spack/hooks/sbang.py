@@ -29,7 +29,6 @@ import re
 import llnl.util.tty as tty
 
 import spack
-import spack.modules
 
 # Character limit for shebang line.  Using Linux's 127 characters
 # here, as it is the shortest I could find on a modern OS.
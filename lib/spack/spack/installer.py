@@ -0,0 +1,199 @@
+##############################################################################
+# Copyright (c) 2013-2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/spack/spack
+# Please also see the NOTICE and LICENSE files for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""Schedules the installation of the nodes of a DAG in parallel.
+
+``PackageBase.do_install`` installs the dependencies of a spec one at a
+time, in post-order.  When more than one concurrent install is allowed,
+it delegates to :func:`install_dag` instead, which runs every node whose
+dependencies are already installed in its own process.
+
+Each node is installed by calling ``do_install(install_deps=False)`` in
+a forked worker.  Nothing new is needed to keep concurrent builds from
+stepping on each other: ``do_install`` already takes the per-prefix
+locks in ``spack.store.db`` and registers the spec in the database
+inside a write transaction, and the build itself is forked again by
+``spack.build_environment.fork``.
+
+The global ``-j`` budget is split among the builds running at the same
+time, so that N concurrent builds do not each run ``make -j<ncpus>``.
+"""
+import multiprocessing
+import time
+
+import llnl.util.tty as tty
+
+import spack
+from spack.build_environment import InstallError
+
+__all__ = ['install_dag', 'jobs_per_build']
+
+#: Seconds to wait on a worker's pipe before polling the next one.
+_poll_interval = 0.1
+
+
+def jobs_per_build(total_jobs, concurrent_builds):
+    """Split a budget of ``total_jobs`` make jobs among concurrent builds.
+
+    Args:
+        total_jobs (int): global number of make jobs (e.g. ``-j``)
+        concurrent_builds (int): number of builds that will share them
+
+    Returns:
+        int: number of make jobs each build should use (at least 1)
+    """
+    return max(1, total_jobs // max(1, concurrent_builds))
+
+
+class InstallWorker(object):
+    """Installs a single node of the DAG in a separate process."""
+
+    def __init__(self, spec, make_jobs, install_args):
+        self.spec = spec
+        self.make_jobs = make_jobs
+        self.install_args = install_args
+        self.result = None
+
+        self._parent_pipe, child_pipe = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=self._install, args=(child_pipe,))
+
+    def _install(self, child_pipe):
+        # We are in the worker process: everything that goes wrong is
+        # shipped back to the parent, which decides what to do with it.
+        try:
+            self.spec.package.do_install(
+                install_deps=False, make_jobs=self.make_jobs,
+                **self.install_args)
+            child_pipe.send(None)
+        except BaseException as e:
+            try:
+                child_pipe.send(e)
+            except Exception:
+                # Not all exceptions can be pickled
+                child_pipe.send(InstallError(
+                    'Installation of {0} failed'.format(self.spec.name),
+                    '{0}: {1}'.format(type(e).__name__, str(e))))
+        finally:
+            child_pipe.close()
+
+    def start(self):
+        self._process.start()
+
+    def poll(self, timeout=0):
+        """Return True if the worker has finished, storing its result."""
+        if not self._parent_pipe.poll(timeout):
+            if self._process.is_alive():
+                return False
+            # The worker died without sending anything back
+            self.result = InstallError(
+                'Installation of {0} died unexpectedly'.format(
+                    self.spec.name))
+        else:
+            self.result = self._parent_pipe.recv()
+        self._process.join()
+        return True
+
+    def terminate(self):
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process.join()
+
+
+def install_dag(spec, install_jobs, make_jobs=None, **install_args):
+    """Install the dependencies of ``spec``, running independent nodes
+    at the same time.
+
+    The root of ``spec`` itself is not installed: this replaces the
+    post-order loop over dependencies in ``PackageBase.do_install``.
+
+    Args:
+        spec (Spec): concrete spec whose dependencies must be installed
+        install_jobs (int): maximum number of concurrent installs
+        make_jobs (int): global budget of make jobs shared by all the
+            concurrent installs. Default is ``spack.build_jobs``.
+        **install_args: forwarded to each ``do_install`` call
+
+    Raises:
+        InstallError: (or whatever the failing install raised) after
+            all the builds still running have completed. No node that
+            depends on a failed install is started.
+    """
+    total_jobs = make_jobs or spack.build_jobs
+
+    # Nodes of the DAG, and the dependencies of each that are still
+    # to be installed.
+    nodes = dict((s.dag_hash(), s) for s in spec.traverse(root=False))
+    waiting_on = dict(
+        (h, set(d.dag_hash() for d in s.dependencies()))
+        for h, s in nodes.items())
+
+    # Deterministic order: start from the post-order traversal, which is
+    # the order a serial install would use.
+    order = [s.dag_hash() for s in spec.traverse(order='post', root=False)]
+
+    running = {}
+    error = None
+    try:
+        while order or running:
+            ready = [h for h in order if not waiting_on[h]]
+            while error is None and ready and len(running) < install_jobs:
+                h = ready.pop(0)
+                order.remove(h)
+                concurrent = min(install_jobs, len(running) + len(ready) + 1)
+                worker = InstallWorker(
+                    nodes[h], jobs_per_build(total_jobs, concurrent),
+                    install_args)
+                tty.debug('Starting install of {0} with {1} make jobs'.format(
+                    nodes[h].name, worker.make_jobs))
+                worker.start()
+                running[h] = worker
+
+            if not running:
+                # Either something failed, or what is left can never
+                # become ready: stop here.
+                break
+
+            finished = [h for h, w in running.items() if w.poll()]
+            if not finished:
+                time.sleep(_poll_interval)
+                continue
+
+            for h in finished:
+                worker = running.pop(h)
+                if worker.result is None:
+                    for deps in waiting_on.values():
+                        deps.discard(h)
+                elif error is None:
+                    error = worker.result
+                    if isinstance(error, InstallError):
+                        error.pkg = worker.spec.package
+
+    except BaseException:
+        for worker in running.values():
+            worker.terminate()
+        raise
+
+    if error is not None:
+        raise error
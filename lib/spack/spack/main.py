@@ -97,34 +97,34 @@ def set_working_dir():
         spack.spack_working_dir = spack.spack_prefix
 
 
-def add_all_commands(parser):
-    """Add all spack subcommands to the parser."""
-    for cmd in spack.cmd.commands:
-        parser.add_command(cmd)
-
-
 def index_commands():
-    """create an index of commands by section for this help level"""
+    """create an index of commands by section for this help level
+
+    Returns:
+        (tuple): the index, and a dict of the properties of each command
+    """
     index = {}
+    properties = {}
     for command in spack.cmd.commands:
-        cmd_module = spack.cmd.get_module(command)
+        cmd_properties = spack.cmd.get_command_properties(command)
 
         # make sure command modules have required properties
         for p in required_command_properties:
-            prop = getattr(cmd_module, p, None)
-            if not prop:
+            if not cmd_properties.get(p):
                 tty.die("Command doesn't define a property '%s': %s"
                         % (p, command))
+        properties[command] = cmd_properties
 
         # add commands to lists for their level and higher levels
         for level in reversed(levels):
             level_sections = index.setdefault(level, {})
-            commands = level_sections.setdefault(cmd_module.section, [])
+            commands = level_sections.setdefault(
+                cmd_properties['section'], [])
             commands.append(command)
-            if level == cmd_module.level:
+            if level == cmd_properties['level']:
                 break
 
-    return index
+    return index, properties
 
 
 class SpackArgumentParser(argparse.ArgumentParser):
@@ -137,55 +137,41 @@ class SpackArgumentParser(argparse.ArgumentParser):
         if level not in levels:
             raise ValueError("level must be one of: %s" % levels)
 
-        # lazily add all commands to the parser when needed.
-        add_all_commands(self)
-
         """Print help on subcommands in neatly formatted sections."""
         formatter = self._get_formatter()
 
-        # Create a list of subcommand actions. Argparse internals are nasty!
-        # Note: you can only call _get_subactions() once.  Even nastier!
-        if not hasattr(self, 'actions'):
-            self.actions = self._subparsers._actions[-1]._get_subactions()
-
-        # make a set of commands not yet added.
-        remaining = set(spack.cmd.commands)
-
-        def add_group(group):
-            formatter.start_section(group.title)
-            formatter.add_text(group.description)
-            formatter.add_arguments(group._group_actions)
+        index, properties = index_commands()
+
+        # Help only shows the name and the description of commands, so it
+        # doesn't add them to the parser, which would import all of them:
+        # it formats one placeholder action per command instead.  They are
+        # handed to the formatter directly: adding them to a group of the
+        # parser would make them arguments it expects on the command line.
+        actions = dict(
+            (cmd, argparse.Action(option_strings=[], dest=cmd, metavar=cmd,
+                                  help=properties[cmd]['description']))
+            for cmd in spack.cmd.commands)
+
+        def add_group(title, group_actions, description=None):
+            formatter.start_section(title)
+            formatter.add_text(description)
+            formatter.add_arguments(group_actions)
             formatter.end_section()
 
         def add_subcommand_group(title, commands):
             """Add informational help group for a specific subcommand set."""
-            cmd_set = set(commands)
-
-            # make a dict of commands of interest
-            cmds = dict((action.metavar, action) for action in self.actions
-                        if action.metavar in cmd_set)
-
-            # add commands to a group in order, and add the group
-            group = argparse._ArgumentGroup(self, title=title)
-            for name in commands:
-                group._add_action(cmds[name])
-                if name in remaining:
-                    remaining.remove(name)
-            add_group(group)
+            add_group(title, [actions[name] for name in commands])
 
         # select only the options for the particular level we're showing.
         show_options = options_by_level[level]
+        optionals = self._optionals._group_actions
         if show_options != 'all':
             opts = dict((opt.option_strings[0].strip('-'), opt)
-                        for opt in self._optionals._group_actions)
-
-            new_actions = [opts[letter] for letter in show_options]
-            self._optionals._group_actions = new_actions
+                        for opt in optionals)
+            optionals = [opts[letter] for letter in show_options]
 
         options = ''.join(opt.option_strings[0].strip('-')
-                          for opt in self._optionals._group_actions)
-
-        index = index_commands()
+                          for opt in optionals)
 
         # usage
         formatter.add_text(
@@ -221,7 +207,8 @@ class SpackArgumentParser(argparse.ArgumentParser):
             add_subcommand_group(group_description, commands)
 
         # optionals
-        add_group(self._optionals)
+        add_group(self._optionals.title, optionals,
+                  self._optionals.description)
 
         # epilog
         formatter.add_text("""\
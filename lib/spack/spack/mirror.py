@@ -32,6 +32,12 @@ to download packages directly from a mirror (e.g., on an intranet).
 """
 import sys
 import os
+import multiprocessing
+from contextlib import contextmanager
+
+from ordereddict_backport import OrderedDict
+from six.moves.urllib.parse import urlparse
+
 import llnl.util.tty as tty
 from llnl.util.filesystem import mkdirp, join_path
 
@@ -39,10 +45,25 @@ import spack
 import spack.error
 import spack.url as url
 import spack.fetch_strategy as fs
+import spack.stage
+import spack.util.crypto as crypto
+import spack.util.spack_json as sjson
+from spack.patch import UrlPatch
 from spack.spec import Spec
 from spack.version import VersionList
 from spack.util.compression import allowed_archive
 
+#: Name of the file, at the root of a mirror, that lists its archives
+manifest_name = 'manifest.json'
+
+#: Default maximum number of archives fetched at the same time from the
+#: same host by create()
+jobs_per_host = 4
+
+#: Semaphores bounding the fetches from each host, in the workers of
+#: create()
+_host_slots = {}
+
 
 def mirror_archive_filename(spec, fetcher, resourceId=None):
     """Get the name of the spec's archive in the mirror."""
@@ -161,6 +182,10 @@ def create(path, specs, **kwargs):
         no_checksum: If True, do not checkpoint when fetching (default False)
         num_versions: Max number of versions to fetch per spec, \
             if spec is ambiguous (default is 0 for all of them)
+        jobs: Max number of package versions fetched at the same time \
+            (default is spack.build_jobs)
+        jobs_per_host: Max number of archives fetched at the same time \
+            from the same host (default is ``jobs_per_host``)
 
     Return Value:
         Returns a tuple of lists: (present, mirrored, error)
@@ -172,6 +197,12 @@ def create(path, specs, **kwargs):
     This routine iterates through all known package versions, and
     it creates specs for those versions.  If the version satisfies any spec
     in the specs list, it is downloaded and added to the mirror.
+
+    Archives already in the mirror are fetched again only if they don't
+    match their checksum.  Every archive of the mirror, including the
+    patches fetched from a URL, is listed with the URL and checksum it
+    was fetched with in the ``manifest_name`` file at the root of the
+    mirror.
     """
     # Make sure nothing is in the way.
     if os.path.isfile(path):
@@ -202,16 +233,187 @@ def create(path, specs, **kwargs):
         'error': []
     }
 
-    # Iterate through packages and download all safe tarballs for each
+    # Versions of the same package that share an archive are fetched by
+    # the same worker, one after the other.
+    groups = OrderedDict()
     for spec in version_specs:
-        add_single_spec(spec, mirror_root, categories, **kwargs)
+        groups.setdefault(spec.format('$_$@'), []).append(spec)
+    groups = list(groups.values())
+
+    no_checksum = kwargs.get('no_checksum', False)
+    jobs = min(len(groups), kwargs.get('jobs', None) or spack.build_jobs)
+    manifest = {}
+
+    if jobs > 1:
+        # Workers are separate processes, as fetchers change the working
+        # directory.  Specs are sent to them as YAML.
+        host_slots = dict(
+            (host, multiprocessing.BoundedSemaphore(
+                kwargs.get('jobs_per_host', None) or jobs_per_host))
+            for host in _fetch_hosts(version_specs))
+        tasks = [([s.to_yaml() for s in group], mirror_root, no_checksum)
+                 for group in groups]
+        pool = multiprocessing.Pool(
+            jobs, initializer=_init_worker, initargs=(host_slots,))
+        try:
+            results = pool.map(_add_specs, tasks)
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        results = [_add_specs((group, mirror_root, no_checksum))
+                   for group in groups]
+
+    for group, (spec_categories, entries) in zip(groups, results):
+        for spec, category in zip(group, spec_categories):
+            categories[category].append(spec)
+        manifest.update(entries)
+
+    _update_manifest(mirror_root, manifest)
 
     return categories['present'], categories['mirrored'], categories['error']
 
 
+def _fetch_host(fetcher):
+    """Host a fetcher downloads from, or None if it has no URL."""
+    fetch_url = getattr(fetcher, 'url', None)
+    return urlparse(fetch_url).netloc if fetch_url else None
+
+
+def _fetch_hosts(specs):
+    """Hosts the archives of specs (and of their resources and patches)
+    come from."""
+    hosts = set()
+    for spec in specs:
+        for stage in spec.package.stage:
+            hosts.add(_fetch_host(stage.fetcher))
+        for patch in _url_patches(spec):
+            hosts.add(urlparse(patch.url).netloc)
+    hosts.discard(None)
+    return hosts
+
+
+def _init_worker(host_slots):
+    global _host_slots
+    _host_slots = host_slots
+
+
+@contextmanager
+def _host_slot(fetcher):
+    """Wait until fewer than ``jobs_per_host`` archives are being fetched
+    from the host of fetcher by other workers."""
+    slot = _host_slots.get(_fetch_host(fetcher))
+    if slot is None:
+        yield
+    else:
+        with slot:
+            yield
+
+
+def _add_specs(args):
+    """Add specs that share their archives to the mirror, in a worker of
+    create().
+
+    Returns:
+        tuple: the category of each spec ('present', 'mirrored' or
+        'error'), and the manifest entries of their archives
+    """
+    specs, mirror_root, no_checksum = args
+    categories = []
+    manifest = {}
+    for spec in specs:
+        if not isinstance(spec, Spec):
+            spec = Spec.from_yaml(spec)
+            spec._mark_concrete()
+
+        spec_categories = {'present': [], 'mirrored': [], 'error': []}
+        add_single_spec(spec, mirror_root, spec_categories,
+                        no_checksum=no_checksum, manifest=manifest)
+        categories.extend(
+            c for c, found in spec_categories.items() if found)
+    return categories, manifest
+
+
+def _update_manifest(mirror_root, entries):
+    """Add entries to the manifest of a mirror, replacing the ones of the
+    same archives."""
+    path = os.path.join(mirror_root, manifest_name)
+    manifest = {}
+    if os.path.exists(path):
+        try:
+            with open(path) as f:
+                manifest = sjson.load(f)['mirror']['archives']
+        except (ValueError, KeyError, TypeError) as e:
+            tty.warn("Ignoring invalid mirror manifest %s" % path, str(e))
+
+    manifest.update(entries)
+    with open(path, 'w') as f:
+        sjson.dump({'mirror': {'archives': manifest}}, f)
+
+
+def _matches_checksum(archive_path, digest):
+    checker = crypto.Checker(digest)
+    if checker.check(archive_path):
+        return True
+    tty.msg("{0} does not match its checksum: fetching it again".format(
+        archive_path))
+    return False
+
+
+def _url_patches(spec):
+    """Patches of the package of spec that are fetched from a URL, whatever
+    the conditions they are applied under."""
+    patches = []
+    for patch_list in spec.package.patches.values():
+        patches.extend(
+            p for p in patch_list if isinstance(p, UrlPatch))
+    return patches
+
+
+def _add_archive(fetcher, archive_path, name, no_checksum):
+    """Fetch an archive into the mirror, unless it is there already.
+
+    Returns:
+        bool: True if the archive was already in the mirror
+    """
+    mkdirp(os.path.dirname(archive_path))
+
+    digest = getattr(fetcher, 'digest', None)
+    if os.path.exists(archive_path) and (
+            no_checksum or not digest or
+            _matches_checksum(archive_path, digest)):
+        tty.msg("{name} : already added".format(name=name))
+        return True
+
+    with _host_slot(fetcher):
+        fetcher.fetch()
+    if not no_checksum:
+        fetcher.check()
+        tty.msg("{name} : checksum passed".format(name=name))
+
+    # Fetchers have to know how to archive their files.  Use
+    # that to move/copy/create an archive in the mirror.
+    fetcher.archive(archive_path)
+    tty.msg("{name} : added".format(name=name))
+    return False
+
+
 def add_single_spec(spec, mirror_root, categories, **kwargs):
     tty.msg("Adding package {pkg} to mirror".format(pkg=spec.format("$_$@")))
+    no_checksum = kwargs.get('no_checksum', False)
+    manifest = kwargs.get('manifest', {})
     spec_exists_in_mirror = True
+
+    def add_to_manifest(archive_path, fetcher, resource=None, patch=False):
+        manifest[os.path.relpath(archive_path, mirror_root)] = {
+            'spec': spec.format('$_$@'),
+            'resource': resource,
+            'patch': patch,
+            'url': getattr(fetcher, 'url', None),
+            'digest': getattr(fetcher, 'digest', None),
+            'size': os.path.getsize(archive_path),
+        }
+
     try:
         with spec.package.stage:
             # fetcher = stage.fetcher
@@ -232,22 +434,28 @@ def add_single_spec(spec, mirror_root, categories, **kwargs):
                         mirror_archive_path(spec, fetcher, resource.name)))
                     name = "{resource} ({pkg}).".format(
                         resource=resource.name, pkg=spec.cformat("$_$@"))
-                subdir = os.path.dirname(archive_path)
-                mkdirp(subdir)
 
-                if os.path.exists(archive_path):
-                    tty.msg("{name} : already added".format(name=name))
-                else:
+                if not _add_archive(fetcher, archive_path, name, no_checksum):
+                    spec_exists_in_mirror = False
+                add_to_manifest(archive_path, fetcher,
+                                resource=stage.resource.name if ii else None)
+
+        # URL patches are looked for in the mirror next to the archive of
+        # the package, as done by UrlPatch.apply()
+        for patch in _url_patches(spec):
+            basename = os.path.basename(patch.url)
+            fetcher = fs.URLFetchStrategy(
+                patch.url, digest=patch.archive_sha256 or patch.sha256)
+            archive_path = os.path.abspath(
+                join_path(mirror_root, spec.name, basename))
+            name = "{patch} ({pkg})".format(
+                patch=basename, pkg=spec.cformat("$_$@"))
+
+            with spack.stage.Stage(fetcher):
+                if not _add_archive(
+                        fetcher, archive_path, name, no_checksum):
                     spec_exists_in_mirror = False
-                    fetcher.fetch()
-                    if not kwargs.get('no_checksum', False):
-                        fetcher.check()
-                        tty.msg("{name} : checksum passed".format(name=name))
-
-                    # Fetchers have to know how to archive their files.  Use
-                    # that to move/copy/create an archive in the mirror.
-                    fetcher.archive(archive_path)
-                    tty.msg("{name} : added".format(name=name))
+            add_to_manifest(archive_path, fetcher, patch=True)
 
         if spec_exists_in_mirror:
             categories['present'].append(spec)
@@ -26,8 +26,6 @@ import re
 
 import llnl.util.tty as tty
 
-import spack.spec
-import spack.compilers
 from spack.architecture import OperatingSystem
 from spack.util.multiproc import parmap
 from spack.util.module_cmd import get_module_cmd
@@ -50,6 +48,9 @@ class Cnl(OperatingSystem):
         return self.name
 
     def find_compilers(self, *paths):
+        # Imported here: this module is loaded while detecting the
+        # platform, when spack.config is not set up yet.
+        import spack.compilers
         types = spack.compilers.all_compiler_types()
         compiler_lists = parmap(
             lambda cmp_cls: self.find_compiler(cmp_cls, *paths), types)
@@ -60,6 +61,7 @@ class Cnl(OperatingSystem):
         return clist
 
     def find_compiler(self, cmp_cls, *paths):
+        import spack.spec
         compilers = []
         if cmp_cls.PrgEnv:
             if not cmp_cls.PrgEnv_compiler:
@@ -55,6 +55,7 @@ import spack.directives
 import spack.error
 import spack.fetch_strategy as fs
 import spack.hooks
+import spack.installer
 import spack.mirror
 import spack.repository
 import spack.url
@@ -1263,11 +1264,9 @@ class PackageBase(with_metaclass(PackageMeta, object)):
 
     def _update_explicit_entry_in_db(self, rec, explicit):
         if explicit and not rec.explicit:
-            with spack.store.db.write_transaction():
-                rec = spack.store.db.get_record(self.spec)
-                rec.explicit = True
-                message = '{s.name}@{s.version} : marking the package explicit'
-                tty.msg(message.format(s=self))
+            spack.store.db.update_explicit(self.spec, True)
+            message = '{s.name}@{s.version} : marking the package explicit'
+            tty.msg(message.format(s=self))
 
     def try_install_from_binary_cache(self, explicit):
         tty.msg('Searching for binary cache of %s' % self.name)
@@ -1283,6 +1282,28 @@ class PackageBase(with_metaclass(PackageMeta, object)):
         spack.store.db.add(self.spec, spack.store.layout, explicit=explicit)
         return True
 
+    def _prefetch_binaries(self):
+        """Download the binary caches of all the nodes of the DAG that
+        are not installed yet, concurrently.
+
+        This also reads the specs available in the binary caches before
+        the installs of the dependencies are forked, so that they do not
+        each read them again.
+        """
+        specs = binary_distribution.get_specs()
+        needed = []
+        for node in self.spec.traverse(order='post'):
+            if node.external or node.package.installed:
+                continue
+            binary_spec = spack.spec.Spec.from_dict(node.to_dict())
+            binary_spec._mark_concrete()
+            if binary_spec in specs:
+                needed.append(binary_spec)
+
+        if needed:
+            tty.msg('Fetching %d binary caches' % len(needed))
+            binary_distribution.download_tarballs(needed)
+
     def do_install(self,
                    keep_prefix=False,
                    keep_stage=False,
@@ -1320,6 +1341,9 @@ class PackageBase(with_metaclass(PackageMeta, object)):
                 if package was implicitly installed (as a dependency).
             dirty (bool): Don't clean the build environment before installing.
             force (bool): Install again, even if already installed.
+            install_jobs (int): Number of dependencies that may be installed
+                at the same time. The ``make_jobs`` budget is split among
+                them. Default is the ``install_jobs`` setting in config.yaml
         """
         if not self.spec.concrete:
             raise ValueError("Can only install concrete packages: %s."
@@ -1352,23 +1376,35 @@ class PackageBase(with_metaclass(PackageMeta, object)):
                 return self._update_explicit_entry_in_db(rec, explicit)
 
         self._do_install_pop_kwargs(kwargs)
+        install_jobs = kwargs.pop('install_jobs', None) or spack.install_jobs
+
+        # Download all the binaries we are going to need at once, instead
+        # of one at a time between the installs
+        if install_deps and kwargs.get('use_cache', False):
+            self._prefetch_binaries()
 
         # First, install dependencies recursively.
         if install_deps:
             tty.debug('Installing {0} dependencies'.format(self.name))
-            for dep in self.spec.traverse(order='post', root=False):
-                dep.package.do_install(
-                    install_deps=False,
-                    explicit=False,
-                    keep_prefix=keep_prefix,
-                    keep_stage=keep_stage,
-                    install_source=install_source,
-                    fake=fake,
-                    skip_patch=skip_patch,
-                    verbose=verbose,
-                    make_jobs=make_jobs,
-                    dirty=dirty,
-                    **kwargs)
+            dep_kwargs = dict(
+                explicit=False,
+                keep_prefix=keep_prefix,
+                keep_stage=keep_stage,
+                install_source=install_source,
+                fake=fake,
+                skip_patch=skip_patch,
+                verbose=verbose,
+                dirty=dirty,
+                **kwargs)
+            if install_jobs > 1:
+                spack.installer.install_dag(
+                    self.spec, install_jobs, make_jobs=make_jobs,
+                    **dep_kwargs)
+            else:
+                for dep in self.spec.traverse(order='post', root=False):
+                    dep.package.do_install(
+                        install_deps=False, make_jobs=make_jobs,
+                        **dep_kwargs)
 
         tty.msg(colorize('@*{Installing} @*g{%s}' % self.name))
 
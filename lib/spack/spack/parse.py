@@ -30,10 +30,17 @@ from six import string_types
 
 import spack.error
 
+#: Characters that shlex.split() treats specially: strings without them
+#: are just split on its whitespace characters, which is much faster.
+_shlex_special = re.compile(r'[\'"\\]')
+_shlex_whitespace = re.compile(r'[ \t\r\n]+')
 
-class Token:
+
+class Token(object):
     """Represents tokens; generated from input by lexer and fed to parse()."""
 
+    __slots__ = ('type', 'value', 'start', 'end')
+
     def __init__(self, type, value='', start=0, end=0):
         self.type = type
         self.value = value
@@ -54,52 +61,57 @@ class Token:
 
 
 class Lexer(object):
-    """Base class for Lexers that keep track of line numbers."""
+    """Base class for Lexers that switch between two modes.
+
+    Each lexicon is a list of ``(regex, token_type)`` pairs, tried in
+    order.  Matches whose type is None (e.g. whitespace) are skipped.
+    The lexer starts in mode 0 and moves to the other mode after each
+    token whose type is in the mode switches of the current mode.
+
+    The regular expressions of a lexicon are compiled into a single one,
+    so each word is tokenized in one pass, without backtracking over
+    what was already read when the mode changes.
+    """
 
     def __init__(self, lexicon0, mode_switches_01=[],
                  lexicon1=[], mode_switches_10=[]):
-        self.scanner0 = re.Scanner(lexicon0)
-        self.mode_switches_01 = mode_switches_01
-        self.scanner1 = re.Scanner(lexicon1)
-        self.mode_switches_10 = mode_switches_10
+        self.modes = (
+            self._compile(lexicon0) + (frozenset(mode_switches_01),),
+            self._compile(lexicon1) + (frozenset(mode_switches_10),))
         self.mode = 0
 
-    def token(self, type, value=''):
-        if self.mode == 0:
-            return Token(type, value,
-                         self.scanner0.match.start(0),
-                         self.scanner0.match.end(0))
-        else:
-            return Token(type, value,
-                         self.scanner1.match.start(0),
-                         self.scanner1.match.end(0))
+    @staticmethod
+    def _compile(lexicon):
+        """One regex matching any of the entries of the lexicon, and the
+        token type for the index of the group of each entry."""
+        patterns, types = [], {}
+        group = 1
+        for regex, type in lexicon:
+            patterns.append('(%s)' % regex)
+            types[group] = type
+            group += 1 + re.compile(regex).groups
+        return re.compile('|'.join(patterns)), types
 
     def lex_word(self, word):
-        scanner = self.scanner0
-        mode_switches = self.mode_switches_01
-        if self.mode == 1:
-            scanner = self.scanner1
-            mode_switches = self.mode_switches_10
-
-        tokens, remainder = scanner.scan(word)
-        remainder_used = 0
-
-        for i, t in enumerate(tokens):
-            if t.type in mode_switches:
-                # Combine post-switch tokens with remainder and
-                # scan in other mode
-                self.mode = 1 - self.mode  # swap 0/1
-                remainder_used = 1
-                tokens = tokens[:i + 1] + self.lex_word(
-                    word[word.index(t.value) + len(t.value):])
-                break
-
-        if remainder and not remainder_used:
-            raise LexError("Invalid character", word, word.index(remainder))
+        tokens = []
+        pos, end = 0, len(word)
+        while pos < end:
+            regex, types, mode_switches = self.modes[self.mode]
+            match = regex.match(word, pos)
+            if not match or match.end() == pos:
+                raise LexError("Invalid character", word, pos)
+
+            type = types[match.lastindex]
+            if type is not None:
+                tokens.append(Token(type, match.group(), pos, match.end()))
+                if type in mode_switches:
+                    self.mode = 1 - self.mode
+            pos = match.end()
 
         return tokens
 
     def lex(self, text):
+        self.mode = 0
         lexed = []
         for word in text:
             tokens = self.lex_word(word)
@@ -162,7 +174,10 @@ class Parser(object):
 
     def setup(self, text):
         if isinstance(text, string_types):
-            text = shlex.split(text)
+            if isinstance(text, str) and not _shlex_special.search(text):
+                text = [w for w in _shlex_whitespace.split(text) if w]
+            else:
+                text = shlex.split(text)
         self.text = text
         self.push_tokens(self.lexer.lex(text))
 
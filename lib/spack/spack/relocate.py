@@ -26,12 +26,33 @@
 import os
 import platform
 import re
+import struct
 import spack
 import spack.cmd
+from spack.util.elf import ElfFile, ElfParsingError, ELF_MAGIC
 from spack.util.executable import Executable, ProcessError
 from llnl.util.filesystem import filter_file
 import llnl.util.tty as tty
 
+#: Magic numbers of Mach-O files (32 and 64 bit, both byte orders)
+_macho_magics = (b'\xfe\xed\xfa\xce', b'\xce\xfa\xed\xfe',
+                 b'\xfe\xed\xfa\xcf', b'\xcf\xfa\xed\xfe')
+
+#: Magic number of fat (universal) Mach-O files, and of Java class files
+_fat_magic = b'\xca\xfe\xba\xbe'
+
+#: Fat files with at least this many architectures are taken for Java
+#: class files, whose version follows the magic number (as file(1) does)
+_max_fat_archs = 20
+
+#: Size of the blocks read when scanning files for the install root
+_scan_block_size = 1024 * 1024
+
+#: Path of the patchelf executable, for each install tree it was
+#: installed in.  Concretizing patchelf is expensive, and it may be
+#: needed once per binary.
+_patchelf_executables = {}
+
 
 def get_patchelf():
     """
@@ -42,20 +63,31 @@ def get_patchelf():
     # as we may need patchelf, find out where it is
     if platform.system() == 'Darwin':
         return None
+    root = spack.store.layout.root
+    patchelf_executable = _patchelf_executables.get(root)
+    if patchelf_executable and os.path.exists(patchelf_executable):
+        return patchelf_executable
     patchelf_spec = spack.cmd.parse_specs("patchelf", concretize=True)[0]
     patchelf = spack.repo.get(patchelf_spec)
     if not patchelf.installed:
         patchelf.do_install()
     patchelf_executable = os.path.join(patchelf.prefix.bin, "patchelf")
+    _patchelf_executables[root] = patchelf_executable
     return patchelf_executable
 
 
 def get_existing_elf_rpaths(path_name):
     """
-    Return the RPATHS returned by patchelf --print-rpath path_name
-    as a list of strings.
+    Return the RPATHS of the elf object path_name as a list of strings.
+    The file is parsed directly; patchelf --print-rpath is only used
+    for files that can't be parsed.
     """
     if platform.system() == 'Linux':
+        try:
+            return ElfFile(path_name).rpaths
+        except ElfParsingError as e:
+            tty.debug(str(e))
+
         patchelf = Executable(get_patchelf())
         try:
             output = patchelf('--print-rpath', '%s' %
@@ -193,30 +225,82 @@ def modify_macho_object(cur_path, rpaths, deps, idpath,
 
 def get_filetype(path_name):
     """
-    Return the output of file path_name as a string to identify file type.
+    Return a string identifying the type of path_name, in the style of
+    file -b -h: only the parts the needs_*_relocation functions look at
+    are reproduced, without running file on each path.
     """
-    file = Executable('file')
-    file.add_default_env('LC_ALL', 'C')
-    output = file('-b', '-h', '%s' % path_name,
-                  output=str, error=str)
-    return output.strip()
+    if os.path.islink(path_name):
+        return 'symbolic link to %s' % os.readlink(path_name)
 
+    with open(path_name, 'rb') as f:
+        head = f.read(_scan_block_size)
 
-def strings_contains_installroot(path_name):
+    if head.startswith(ELF_MAGIC):
+        try:
+            return ElfFile(path_name).type_description
+        except ElfParsingError:
+            return 'ELF'
+    if head[:4] in _macho_magics or _is_fat_macho(head):
+        return 'Mach-O binary'
+    if not head:
+        return 'empty'
+    if b'\0' in head:
+        return 'data'
+
+    # Only files without any NUL byte are text: keep reading the rest
+    with open(path_name, 'rb') as f:
+        f.seek(len(head))
+        while True:
+            block = f.read(_scan_block_size)
+            if not block:
+                return 'text'
+            if b'\0' in block:
+                return 'data'
+
+
+def _is_fat_macho(head):
+    """Whether a file starting with head is a fat Mach-O file, and not a
+    Java class file, which has the same magic number."""
+    if len(head) < 8 or head[:4] != _fat_magic:
+        return False
+    nfat_arch = struct.unpack('>I', head[4:8])[0]
+    return 0 < nfat_arch < _max_fat_archs
+
+
+def strings_contains_installroot(path_name, root=None):
     """
     Check if the file contain the install root string.
     """
-    strings = Executable('strings')
-    output = strings('%s' % path_name,
-                     output=str, err=str)
-    return (spack.store.layout.root in output)
+    root = (root or spack.store.layout.root).encode('utf-8')
+    # Overlap consecutive blocks, so that a match split between two of
+    # them is still found.
+    overlap = len(root) - 1
+    tail = b''
+    with open(path_name, 'rb') as f:
+        while True:
+            block = f.read(_scan_block_size)
+            if not block:
+                return False
+            if root in tail + block:
+                return True
+            tail = (tail + block)[-overlap:] if overlap else b''
 
 
 def modify_elf_object(path_name, new_rpaths):
     """
-    Replace orig_rpath with new_rpath in RPATH of elf object path_name
+    Replace orig_rpath with new_rpath in RPATH of elf object path_name.
+    The RPATH is rewritten in place when the new one fits in the space
+    used by the old one, otherwise patchelf is used.
     """
     if platform.system() == 'Linux':
+        try:
+            elf = ElfFile(path_name)
+            if elf.can_set_rpaths(new_rpaths):
+                elf.set_rpaths(new_rpaths)
+                return
+        except ElfParsingError as e:
+            tty.debug(str(e))
+
         new_joined = ':'.join(new_rpaths)
         patchelf = Executable(get_patchelf())
         try:
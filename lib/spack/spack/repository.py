@@ -23,7 +23,10 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
 import collections
+import contextlib
+import hashlib
 import os
+import random
 import stat
 import shutil
 import errno
@@ -31,6 +34,7 @@ import sys
 import inspect
 import imp
 import re
+import time
 import traceback
 import json
 
@@ -102,6 +106,11 @@ class SpackNamespace(ModuleType):
         return getattr(self, name)
 
 
+#: Stat information kept by FastPackageChecker for each package.py
+PackageStat = collections.namedtuple(
+    'PackageStat', ['st_mode', 'st_size', 'st_mtime'])
+
+
 class FastPackageChecker(Mapping):
     """Cache that maps package names to the stats obtained on the
     'package.py' files associated with them.
@@ -109,10 +118,24 @@ class FastPackageChecker(Mapping):
     For each repository a cache is maintained at class level, and shared among
     all instances referring to it. Update of the global cache is done lazily
     during instance initialization.
+
+    The cache is also saved in ``spack.misc_cache``, so that other Spack
+    processes don't have to stat every package again.  A saved snapshot
+    is used as long as the mtime of the packages directory (which changes
+    when packages are added or removed) is the same, and a few of its
+    packages, including the most recently modified ones, are unchanged.
+    Edits to other packages are noticed by later spot checks, or right
+    away when made with ``spack edit``, which calls ``invalidate()``.
     """
     #: Global cache, reused by every instance
     _paths_cache = {}
 
+    #: Number of the most recently modified packages checked before
+    #: using a saved snapshot, and number of other packages picked at
+    #: random to be checked too.
+    _recent_checks = 8
+    _random_checks = 8
+
     def __init__(self, packages_path):
 
         #: The path of the repository managed by this instance
@@ -125,7 +148,107 @@ class FastPackageChecker(Mapping):
         #: Reference to the appropriate entry in the global cache
         self._packages_to_stats = self._paths_cache[packages_path]
 
+    @staticmethod
+    def _snapshot_key(packages_path):
+        path_hash = hashlib.sha1(packages_path.encode('utf-8')).hexdigest()
+        return 'packages/{0}-stats.json'.format(path_hash)
+
+    @classmethod
+    def invalidate(cls, packages_path):
+        """Forget what is known about the packages in packages_path, so
+        that they are all checked again by the next instance."""
+        cls._paths_cache.pop(packages_path, None)
+        key = cls._snapshot_key(packages_path)
+        if spack.misc_cache.init_entry(key):
+            spack.misc_cache.remove(key)
+
     def _create_new_cache(self):
+        """Return the saved snapshot of the repo if it is still valid,
+        otherwise scan the repo and save a new snapshot."""
+        dir_mtime = os.stat(self.packages_path).st_mtime
+
+        cache = self._read_snapshot(dir_mtime)
+        if cache is None:
+            cache = self._scan_packages()
+            self._write_snapshot(dir_mtime, cache)
+        return cache
+
+    def _read_snapshot(self, dir_mtime):
+        key = self._snapshot_key(self.packages_path)
+        try:
+            if not spack.misc_cache.init_entry(key):
+                return None
+            with spack.misc_cache.read_transaction(key) as f:
+                snapshot = json.load(f)
+        except (IOError, OSError, ValueError, spack.error.SpackError) as e:
+            tty.debug('Cannot read package snapshot: {0}'.format(e))
+            return None
+
+        if (snapshot.get('packages_path') != self.packages_path or
+                snapshot.get('mtime') != dir_mtime):
+            return None
+
+        cache = dict((name, PackageStat(*sinfo))
+                     for name, sinfo in snapshot['packages'].items())
+
+        # Spot check the packages most likely to have been edited
+        names = sorted(cache, key=lambda n: cache[n].st_mtime)
+        recent = names[-self._recent_checks:]
+        others = names[:-self._recent_checks]
+        sample = random.sample(others, min(len(others), self._random_checks))
+        for name in recent + sample:
+            if self._stat_package(name) != cache[name]:
+                return None
+
+        return cache
+
+    def _write_snapshot(self, dir_mtime, cache):
+        # If the directory changed within the resolution of its mtime,
+        # a later change might not change its mtime: don't save.
+        if time.time() - dir_mtime < 2:
+            return
+
+        key = self._snapshot_key(self.packages_path)
+        snapshot = {
+            'packages_path': self.packages_path,
+            'mtime': dir_mtime,
+            'packages': dict((name, list(sinfo))
+                             for name, sinfo in cache.items())
+        }
+        try:
+            spack.misc_cache.init_entry(key)
+            with spack.misc_cache.write_transaction(key) as (old, new):
+                json.dump(snapshot, new)
+        except (IOError, OSError, spack.error.SpackError) as e:
+            tty.debug('Cannot save package snapshot: {0}'.format(e))
+
+    def _stat_package(self, pkg_name):
+        """PackageStat of the package.py of pkg_name, or None if it is not
+        a readable file."""
+        # Construct the file name from the directory
+        pkg_file = os.path.join(
+            self.packages_path, pkg_name, package_file_name
+        )
+
+        # Use stat here to avoid lots of calls to the filesystem.
+        try:
+            sinfo = os.stat(pkg_file)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                # No package.py file here.
+                return None
+            elif e.errno == errno.EACCES:
+                tty.warn("Can't read package file %s." % pkg_file)
+                return None
+            raise e
+
+        # If it's not a file, skip it.
+        if stat.S_ISDIR(sinfo.st_mode):
+            return None
+
+        return PackageStat(sinfo.st_mode, sinfo.st_size, sinfo.st_mtime)
+
+    def _scan_packages(self):
         """Create a new cache for packages in a repo.
 
         The implementation here should try to minimize filesystem
@@ -147,30 +270,11 @@ class FastPackageChecker(Mapping):
                 tty.warn(msg.format(pkg_dir, pkg_name))
                 continue
 
-            # Construct the file name from the directory
-            pkg_file = os.path.join(
-                self.packages_path, pkg_name, package_file_name
-            )
-
-            # Use stat here to avoid lots of calls to the filesystem.
-            try:
-                sinfo = os.stat(pkg_file)
-            except OSError as e:
-                if e.errno == errno.ENOENT:
-                    # No package.py file here.
-                    continue
-                elif e.errno == errno.EACCES:
-                    tty.warn("Can't read package file %s." % pkg_file)
-                    continue
-                raise e
-
-            # If it's not a file, skip it.
-            if stat.S_ISDIR(sinfo.st_mode):
-                continue
-
             # If it is a file, then save the stats under the
             # appropriate key
-            cache[pkg_name] = sinfo
+            sinfo = self._stat_package(pkg_name)
+            if sinfo is not None:
+                cache[pkg_name] = sinfo
 
         return cache
 
@@ -233,6 +337,85 @@ class TagIndex(Mapping):
             self._tag_dict[tag].append(package.name)
 
 
+class PackageMetadataIndex(Mapping):
+    """Maps package names to the metadata their directives declare.
+
+    This lets commands that only need to know what a package provides
+    (description, versions, variants, dependencies, virtuals) answer
+    without importing its ``package.py``, which is slow.  Each entry is
+    a plain dictionary with the following keys:
+
+    - ``description``: docstring of the package class, or None
+    - ``homepage``: homepage of the package, or None
+    - ``versions``: list of version strings, newest first
+    - ``variants``: dict mapping variant names to a dict with their
+      ``default`` value and ``description``
+    - ``dependencies``: dict mapping each dependency type to the sorted
+      names of the packages that may be a dependency of that type
+    - ``provides``: sorted names of the virtual packages provided
+    """
+
+    def __init__(self):
+        self._metadata = {}
+
+    def to_json(self, stream):
+        json.dump({'packages': self._metadata}, stream)
+
+    @staticmethod
+    def from_json(stream):
+        d = json.load(stream)
+
+        r = PackageMetadataIndex()
+        r._metadata.update(d['packages'])
+
+        return r
+
+    def __getitem__(self, item):
+        return self._metadata[item]
+
+    def __iter__(self):
+        return iter(self._metadata)
+
+    def __len__(self):
+        return len(self._metadata)
+
+    def remove_package(self, pkg_name):
+        """Removes a package from the index, if it is there."""
+        self._metadata.pop(pkg_name, None)
+
+    def update_package(self, pkg_name, repo=None):
+        """Updates a package in the metadata index.
+
+        Args:
+            pkg_name (str): name of the package to be updated, possibly
+                with a namespace
+            repo (Repo): repository to load the package from. Default is
+                ``spack.repo``.
+
+        """
+        pkg = (repo or spack.repo).get(pkg_name)
+
+        variants = {}
+        for name, variant in pkg.variants.items():
+            variants[name] = {
+                'default': str(variant.default),
+                'description': variant.description
+            }
+
+        dependencies = {}
+        for deptype in spack.all_deptypes:
+            dependencies[deptype] = sorted(pkg.dependencies_of_type(deptype))
+
+        self._metadata[pkg.name] = {
+            'description': pkg.__doc__,
+            'homepage': getattr(pkg, 'homepage', None),
+            'versions': [str(v) for v in sorted(pkg.versions, reverse=True)],
+            'variants': variants,
+            'dependencies': dependencies,
+            'provides': sorted(set(v.name for v in pkg.provided)),
+        }
+
+
 @llnl.util.lang.memoized
 def make_provider_index_cache(packages_path, namespace):
     """Lazily updates the provider index cache associated with a repository,
@@ -338,6 +521,82 @@ def make_tag_index_cache(packages_path, namespace):
     return index
 
 
+@contextlib.contextmanager
+def _packages_found_in(repo):
+    """Make ``spack.repo`` find the packages of ``repo`` while they are
+    loaded: their directives look up other packages there, e.g. to know
+    whether a dependency is virtual."""
+    current = spack.repo.get_repo(repo.namespace, None)
+    if current is not None and current.root == repo.root:
+        yield
+        return
+
+    repo_path = RepoPath(repo.root)
+    spack.repo.swap(repo_path)
+    try:
+        yield
+    finally:
+        spack.repo.swap(repo_path)
+
+
+def make_metadata_index_cache(repo):
+    """Lazily updates the package metadata index cache associated with a
+    repository, if need be, then returns it.
+
+    Args:
+        repo: the repository
+
+    Returns:
+        instance of PackageMetadataIndex
+    """
+    packages_path, namespace = repo.packages_path, repo.namespace
+
+    # Map that goes from package names to stat info
+    fast_package_checker = FastPackageChecker(packages_path)
+
+    # Filename of the metadata index cache
+    cache_filename = 'metadata/{0}-index.json'.format(namespace)
+
+    # Compute which packages needs to be updated in the cache
+    index_mtime = spack.misc_cache.mtime(cache_filename)
+
+    needs_update = [
+        x for x, sinfo in fast_package_checker.items()
+        if sinfo.st_mtime > index_mtime
+    ]
+
+    # Read the old index, or make a new one.
+    index_existed = spack.misc_cache.init_entry(cache_filename)
+
+    if index_existed and not needs_update:
+
+        # If the metadata index exists and doesn't need an update
+        # just read from it
+        with spack.misc_cache.read_transaction(cache_filename) as f:
+            index = PackageMetadataIndex.from_json(f)
+
+    else:
+
+        # Otherwise we need a write transaction to update it
+        with spack.misc_cache.write_transaction(cache_filename) as (old, new):
+
+            index = PackageMetadataIndex.from_json(old) if old \
+                else PackageMetadataIndex()
+
+            with _packages_found_in(repo):
+                for pkg_name in needs_update:
+                    namespaced_name = '{0}.{1}'.format(namespace, pkg_name)
+                    index.update_package(namespaced_name, repo)
+
+            index.to_json(new)
+
+    # Packages deleted since the index was written
+    for pkg_name in [x for x in index if x not in fast_package_checker]:
+        index.remove_package(pkg_name)
+
+    return index
+
+
 class RepoPath(object):
     """A RepoPath is a list of repos that function as one.
 
@@ -475,6 +734,11 @@ class RepoPath(object):
         for name in self.all_package_names():
             yield self.get(name)
 
+    def package_metadata(self, pkg_name):
+        """Metadata of a package, read from the first repository that has
+        it without importing the package. See ``PackageMetadataIndex``."""
+        return self.repo_for_pkg(pkg_name).package_metadata(pkg_name)
+
     @property
     def provider_index(self):
         """Merged ProviderIndex from all Repos in the RepoPath."""
@@ -691,6 +955,9 @@ class Repo(object):
         # Index of tags, computed lazily
         self._tag_index = None
 
+        # Index of package metadata, computed lazily
+        self._metadata_index = None
+
         # make sure the namespace for packages in this repo exists.
         self._create_namespace()
 
@@ -896,6 +1163,24 @@ class Repo(object):
 
         return self._tag_index
 
+    @property
+    def metadata_index(self):
+        """An index of the metadata of the packages in this repo."""
+
+        if self._metadata_index is None:
+            self._metadata_index = make_metadata_index_cache(self)
+
+        return self._metadata_index
+
+    @_autospec
+    def package_metadata(self, spec):
+        """Metadata of a package, without importing it.
+        See ``PackageMetadataIndex``."""
+        self._check_namespace(spec)
+        if not self.exists(spec.name):
+            raise UnknownPackageError(spec.name, self)
+        return self.metadata_index[spec.name]
+
     @_autospec
     def providers_for(self, vpkg_spec):
         providers = self.provider_index.providers_for(vpkg_spec)
@@ -64,9 +64,18 @@ schema = {
                 'source_cache': {'type': 'string'},
                 'misc_cache': {'type': 'string'},
                 'verify_ssl': {'type': 'boolean'},
+                'url_fetch_method': {
+                    'type': 'string',
+                    'enum': ['curl', 'urllib']
+                },
                 'checksum': {'type': 'boolean'},
                 'dirty': {'type': 'boolean'},
                 'build_jobs': {'type': 'integer', 'minimum': 1},
+                'install_jobs': {'type': 'integer', 'minimum': 1},
+                'concretization_cache_size': {
+                    'type': 'integer',
+                    'minimum': 0
+                },
             }
         },
     },
@@ -105,6 +105,7 @@ import os
 import re
 
 from operator import attrgetter
+from ordereddict_backport import OrderedDict
 from six import StringIO
 from six import string_types
 from six import iteritems
@@ -117,9 +118,11 @@ from llnl.util.tty.color import cwrite, colorize, cescape, get_color_when
 import spack
 import spack.architecture
 import spack.compilers as compilers
+import spack.concretization_cache
 import spack.error
 import spack.parse
-import spack.store
+# spack.store is imported by the functions that use it: it sets up the
+# database, which imports this module.
 import spack.util.spack_json as sjson
 import spack.util.spack_yaml as syaml
 
@@ -1046,12 +1049,13 @@ class Spec(object):
         if not isinstance(spec_like, string_types):
             raise TypeError("Can't make spec out of %s" % type(spec_like))
 
-        # parse string types *into* this spec
-        spec_list = SpecParser(self).parse(spec_like)
+        # copy the spec parsed from the string into this spec
+        spec_list, shared = _parsed_specs(spec_like)
         if len(spec_list) > 1:
             raise ValueError("More than one spec in string: " + spec_like)
         if len(spec_list) < 1:
             raise ValueError("String contains no specs: " + spec_like)
+        self._dup(spec_list[0])
 
         # Specs are by default not assumed to be normal, but in some
         # cases we've read them from a file want to assume normal.
@@ -1376,6 +1380,7 @@ class Spec(object):
     def prefix(self):
         if hasattr(self, 'test_prefix'):
             return Prefix(self.test_prefix)
+        import spack.store
         return Prefix(spack.store.layout.path_for_spec(self))
 
     def _set_test_prefix(self, val):
@@ -1383,26 +1388,51 @@ class Spec(object):
 
     def dag_hash(self, length=None):
         """Return a hash of the entire spec DAG, including connectivity."""
+        return self._dag_hash({})[:length]
+
+    def _dag_hash(self, memo):
+        """Hash of the DAG, reusing the hashes of the nodes in ``memo``.
+
+        ``memo`` maps ``id(spec)`` to the hash of each node already seen
+        in the current traversal, so that shared dependencies of specs
+        that aren't concrete (and don't cache their hash) are only
+        hashed once.
+        """
         if self._hash:
-            return self._hash[:length]
-        else:
-            yaml_text = syaml.dump(
-                self.to_node_dict(), default_flow_style=True, width=maxint)
-            sha = hashlib.sha1(yaml_text.encode('utf-8'))
+            return self._hash
 
-            b32_hash = base64.b32encode(sha.digest()).lower()
-            if sys.version_info[0] >= 3:
-                b32_hash = b32_hash.decode('utf-8')
+        key = id(self)
+        if key in memo:
+            return memo[key]
 
-            if self.concrete:
-                self._hash = b32_hash
-            return b32_hash[:length]
+        node = self.to_node_dict(hash_function=lambda s: s._dag_hash(memo))
+        yaml_text = syaml.flow_dump(node)
+        sha = hashlib.sha1(yaml_text.encode('utf-8'))
+
+        b32_hash = base64.b32encode(sha.digest()).lower()
+        if sys.version_info[0] >= 3:
+            b32_hash = b32_hash.decode('utf-8')
+
+        if self.concrete:
+            self._hash = b32_hash
+        memo[key] = b32_hash
+        return b32_hash
 
     def dag_hash_bit_prefix(self, bits):
         """Get the first <bits> bits of the DAG hash as an integer type."""
         return base32_prefix_bits(self.dag_hash(), bits)
 
-    def to_node_dict(self):
+    def to_node_dict(self, hash_function=None):
+        """Dictionary with the YAML representation of this node.
+
+        Args:
+            hash_function (callable): called with each link and run
+                dependency to get the hash recorded for it. Default is
+                ``Spec.dag_hash``.
+        """
+        if hash_function is None:
+            hash_function = Spec.dag_hash
+
         d = syaml_dict()
 
         if self.versions:
@@ -1439,7 +1469,7 @@ class Spec(object):
             d['dependencies'] = syaml_dict([
                 (name,
                  syaml_dict([
-                     ('hash', dspec.spec.dag_hash()),
+                     ('hash', hash_function(dspec.spec)),
                      ('type', sorted(str(s) for s in dspec.deptypes))])
                  ) for name, dspec in sorted(deps.items())
             ])
@@ -1448,9 +1478,11 @@ class Spec(object):
 
     def to_dict(self):
         node_list = []
+        memo = {}
+        hash_function = lambda s: s._dag_hash(memo)
         for s in self.traverse(order='pre', deptype=('link', 'run')):
-            node = s.to_node_dict()
-            node[s.name]['hash'] = s.dag_hash()
+            node = s.to_node_dict(hash_function=hash_function)
+            node[s.name]['hash'] = hash_function(s)
             node_list.append(node)
 
         return syaml_dict([('spec', node_list)])
@@ -1787,6 +1819,10 @@ class Spec(object):
         if self._concrete:
             return
 
+        cache_key = spack.concretization_cache.cache_key(self)
+        if spack.concretization_cache.restore(self, cache_key):
+            return
+
         changed = True
         force = False
 
@@ -1850,7 +1886,8 @@ class Spec(object):
                 mvar.value = mvar.value + tuple(patches)
                 # FIXME: Monkey patches mvar to store patches order
                 p = getattr(mvar, '_patches_in_order_of_appearance', [])
-                mvar._patches_in_order_of_appearance = dedupe(p + patches)
+                mvar._patches_in_order_of_appearance = list(
+                    dedupe(p + patches))
 
         for s in self.traverse():
             if s.external_module:
@@ -1881,6 +1918,8 @@ class Spec(object):
         for x in self.traverse():
             x.package.spec = x
 
+        spack.concretization_cache.put(cache_key, self)
+
     def _mark_concrete(self, value=True):
         """Mark this spec and its dependencies as concrete.
 
@@ -2652,6 +2691,9 @@ class Spec(object):
         return changed
 
     def _dup_deps(self, other, deptypes, caches):
+        if not other._dependencies:
+            return
+
         new_specs = {self.name: self}
         for dspec in other.traverse_edges(cover='edges',
                                           root=False):
@@ -3047,6 +3089,7 @@ class Spec(object):
                 elif named_str == 'SPACK_ROOT':
                     out.write(fmt % token_transform(spack.prefix))
                 elif named_str == 'SPACK_INSTALL':
+                    import spack.store
                     out.write(fmt % token_transform(spack.store.root))
                 elif named_str == 'PREFIX':
                     out.write(fmt % token_transform(self.prefix))
@@ -3088,6 +3131,7 @@ class Spec(object):
         """Helper for tree to print DB install status."""
         if not self.concrete:
             return None
+        import spack.store
         try:
             record = spack.store.db.get_record(self)
             return record.installed
@@ -3098,6 +3142,7 @@ class Spec(object):
         """Helper for tree to print DB install status."""
         if not self.concrete:
             return None
+        import spack.store
         try:
             record = spack.store.db.get_record(self)
             return record.explicit
@@ -3188,23 +3233,23 @@ class SpecLexer(spack.parse.Lexer):
 
     def __init__(self):
         super(SpecLexer, self).__init__([
-            (r'/', lambda scanner, val: self.token(HASH,  val)),
-            (r'\^', lambda scanner, val: self.token(DEP,   val)),
-            (r'\@', lambda scanner, val: self.token(AT,    val)),
-            (r'\:', lambda scanner, val: self.token(COLON, val)),
-            (r'\,', lambda scanner, val: self.token(COMMA, val)),
-            (r'\+', lambda scanner, val: self.token(ON,    val)),
-            (r'\-', lambda scanner, val: self.token(OFF,   val)),
-            (r'\~', lambda scanner, val: self.token(OFF,   val)),
-            (r'\%', lambda scanner, val: self.token(PCT,   val)),
-            (r'\=', lambda scanner, val: self.token(EQ,    val)),
+            (r'/', HASH),
+            (r'\^', DEP),
+            (r'\@', AT),
+            (r'\:', COLON),
+            (r'\,', COMMA),
+            (r'\+', ON),
+            (r'\-', OFF),
+            (r'\~', OFF),
+            (r'\%', PCT),
+            (r'\=', EQ),
             # This is more liberal than identifier_re (see above).
             # Checked by check_identifier() for better error messages.
-            (r'\w[\w.-]*', lambda scanner, val: self.token(ID,    val)),
-            (r'\s+', lambda scanner, val: None)],
+            (r'\w[\w.-]*', ID),
+            (r'\s+', None)],
             [EQ],
-            [(r'[\S].*', lambda scanner, val: self.token(VAL,    val)),
-             (r'\s+', lambda scanner, val: None)],
+            [(r'[\S].*', VAL),
+             (r'\s+', None)],
             [VAL])
 
 
@@ -3214,17 +3259,13 @@ _lexer = SpecLexer()
 
 class SpecParser(spack.parse.Parser):
 
-    def __init__(self, initial_spec=None):
-        """Construct a new SpecParser.
-
-        Args:
-            initial_spec (Spec, optional): provide a Spec that we'll parse
-                directly into. This is used to avoid construction of a
-                superfluous Spec object in the Spec constructor.
-        """
+    def __init__(self):
         super(SpecParser, self).__init__(_lexer)
         self.previous = None
-        self._initial = initial_spec
+
+        # Whether specs were looked up by hash in the database: these
+        # can't be cached by _parsed_specs().
+        self.found_by_hash = False
 
     def do_parse(self):
         specs = []
@@ -3321,7 +3362,9 @@ class SpecParser(spack.parse.Parser):
 
     def spec_by_hash(self):
         self.expect(ID)
+        self.found_by_hash = True
 
+        import spack.store
         specs = spack.store.db.query()
         matches = [spec for spec in specs if
                    spec.dag_hash()[:len(self.token.value)] == self.token.value]
@@ -3337,8 +3380,7 @@ class SpecParser(spack.parse.Parser):
         return matches[0]
 
     def spec(self, name):
-        """Parse a spec out of the input. If a spec is supplied, initialize
-           and return it instead of creating a new one."""
+        """Parse a spec out of the input."""
         if name:
             spec_namespace, dot, spec_name = name.rpartition('.')
             if not spec_namespace:
@@ -3348,13 +3390,8 @@ class SpecParser(spack.parse.Parser):
             spec_namespace = None
             spec_name = None
 
-        if self._initial is None:
-            # This will init the spec without calling Spec.__init__
-            spec = Spec.__new__(Spec)
-        else:
-            # this is used by Spec.__init__
-            spec = self._initial
-            self._initial = None
+        # This will init the spec without calling Spec.__init__
+        spec = Spec.__new__(Spec)
 
         spec.name = spec_name
         spec.versions = VersionList()
@@ -3495,11 +3532,47 @@ class SpecParser(spack.parse.Parser):
                 "{0}: Identifier cannot contain '.'".format(id))
 
 
+#: Number of spec strings whose parsed specs are kept by _parsed_specs()
+_parse_cache_size = 8192
+
+#: Specs parsed from each string, least recently used first
+_parse_cache = OrderedDict()
+
+
+def _parsed_specs(string):
+    """Parse a spec string, or reuse the specs parsed from the same string
+    before, on the same platform.
+
+    Returns:
+        (list, bool): the specs, and whether they are shared with the
+            cache.  Shared specs must be copied before they are used.
+    """
+    key = (string, spack.architecture.platform().name)
+    specs = _parse_cache.pop(key, None)
+    if specs is None:
+        parser = SpecParser()
+        specs = parser.parse(string)
+        if parser.found_by_hash:
+            # These come from the database, which can change
+            return specs, False
+
+        if len(_parse_cache) >= _parse_cache_size:
+            _parse_cache.popitem(last=False)
+    _parse_cache[key] = specs
+    return specs, True
+
+
 def parse(string):
     """Returns a list of specs from an input string.
        For creating one spec, see Spec() constructor.
     """
-    return SpecParser().parse(string)
+    if not isinstance(string, string_types):
+        return SpecParser().parse(string)
+
+    specs, shared = _parsed_specs(string)
+    if shared:
+        specs = [s.copy() for s in specs]
+    return specs
 
 
 def parse_anonymous_spec(spec_like, pkg_name):
@@ -3516,13 +3589,10 @@ def parse_anonymous_spec(spec_like, pkg_name):
     if isinstance(spec_like, str):
         try:
             anon_spec = Spec(spec_like)
-            if anon_spec.name != pkg_name:
-                raise SpecParseError(spack.parse.ParseError(
-                    "",
-                    "",
-                    "Expected anonymous spec for package %s but found spec for"
-                    "package %s" % (pkg_name, anon_spec.name)))
         except SpecParseError:
+            anon_spec = None
+
+        if anon_spec is None or anon_spec.name != pkg_name:
             anon_spec = Spec(pkg_name + ' ' + spec_like)
             if anon_spec.name != pkg_name:
                 raise ValueError(
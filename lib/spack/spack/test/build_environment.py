@@ -26,8 +26,9 @@ import os
 import pytest
 
 import spack
-from llnl.util.filesystem import join_path
+from llnl.util.filesystem import join_path, mkdirp
 from spack.build_environment import dso_suffix, _static_to_shared_library
+from spack.build_environment import get_dependency_dirs
 from spack.util.executable import Executable
 
 
@@ -57,8 +58,10 @@ def build_environment():
     os.environ['SPACK_F77_RPATH_ARG'] = "-Wl,-rpath,"
     os.environ['SPACK_FC_RPATH_ARG']  = "-Wl,-rpath,"
 
-    if 'SPACK_DEPENDENCIES' in os.environ:
-        del os.environ['SPACK_DEPENDENCIES']
+    for name in ('SPACK_DEPENDENCIES', 'SPACK_INCLUDE_DIRS',
+                 'SPACK_LINK_DIRS', 'SPACK_RPATH_DIRS'):
+        if name in os.environ:
+            del os.environ[name]
 
     yield {'cc': cc, 'cxx': cxx, 'fc': fc}
 
@@ -97,3 +100,18 @@ def test_static_to_shared_library(build_environment):
 
             assert output == expected[arch].format(
                 static_lib, shared_lib, os.path.basename(shared_lib))
+
+
+def test_get_dependency_dirs(tmpdir):
+    a, b, c = (str(tmpdir.join(name)) for name in 'abc')
+    for path in ('a/include', 'a/lib', 'b/lib', 'b/lib64', 'c/include'):
+        mkdirp(str(tmpdir.join(path)))
+
+    include_dirs, link_dirs, rpath_dirs = get_dependency_dirs(
+        [a, b, c], link_prefixes=[a, b], rpath_prefixes=[b])
+
+    # later prefixes first, lib64 before lib
+    assert include_dirs == [join_path(c, 'include'), join_path(a, 'include')]
+    assert link_dirs == [
+        join_path(b, 'lib64'), join_path(b, 'lib'), join_path(a, 'lib')]
+    assert rpath_dirs == [join_path(b, 'lib64'), join_path(b, 'lib')]
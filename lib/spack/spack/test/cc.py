@@ -33,6 +33,7 @@ import shutil
 
 import spack
 from llnl.util.filesystem import mkdirp, join_path
+from spack.build_environment import get_dependency_dirs
 from spack.util.executable import Executable
 
 # Complicated compiler test command
@@ -97,11 +98,25 @@ class CompilerWrapperTest(unittest.TestCase):
 
         mkdirp(join_path(self.dep4, 'include'))
 
-        if 'SPACK_DEPENDENCIES' in os.environ:
-            del os.environ['SPACK_DEPENDENCIES']
+        self.unset_deps()
 
     def tearDown(self):
         shutil.rmtree(self.tmp_deps, True)
+        self.unset_deps()
+
+    def unset_deps(self):
+        for name in ('SPACK_INCLUDE_DIRS', 'SPACK_LINK_DIRS',
+                     'SPACK_RPATH_DIRS'):
+            if name in os.environ:
+                del os.environ[name]
+
+    def set_deps(self, deps, link=True, rpath=True):
+        """Pass deps to the wrapper like spack.build_environment does."""
+        include_dirs, link_dirs, rpath_dirs = get_dependency_dirs(
+            deps, deps if link else [], deps if rpath else [])
+        os.environ['SPACK_INCLUDE_DIRS'] = ':'.join(include_dirs)
+        os.environ['SPACK_LINK_DIRS'] = ':'.join(link_dirs)
+        os.environ['SPACK_RPATH_DIRS'] = ':'.join(rpath_dirs)
 
     def check_cc(self, command, args, expected):
         os.environ['SPACK_TEST_COMMAND'] = command
@@ -228,9 +243,7 @@ class CompilerWrapperTest(unittest.TestCase):
 
     def test_dep_include(self):
         """Ensure a single dependency include directory is added."""
-        os.environ['SPACK_DEPENDENCIES'] = self.dep4
-        os.environ['SPACK_RPATH_DEPS'] = os.environ['SPACK_DEPENDENCIES']
-        os.environ['SPACK_LINK_DEPS'] = os.environ['SPACK_DEPENDENCIES']
+        self.set_deps([self.dep4])
         self.check_cc('dump-args', test_command,
                       self.realcc + ' ' +
                       '-Wl,-rpath,' + self.prefix + '/lib ' +
@@ -240,9 +253,7 @@ class CompilerWrapperTest(unittest.TestCase):
 
     def test_dep_lib(self):
         """Ensure a single dependency RPATH is added."""
-        os.environ['SPACK_DEPENDENCIES'] = self.dep2
-        os.environ['SPACK_RPATH_DEPS'] = os.environ['SPACK_DEPENDENCIES']
-        os.environ['SPACK_LINK_DEPS'] = os.environ['SPACK_DEPENDENCIES']
+        self.set_deps([self.dep2])
         self.check_cc('dump-args', test_command,
                       self.realcc + ' ' +
                       '-Wl,-rpath,' + self.prefix + '/lib ' +
@@ -253,8 +264,7 @@ class CompilerWrapperTest(unittest.TestCase):
 
     def test_dep_lib_no_rpath(self):
         """Ensure a single dependency link flag is added with no dep RPATH."""
-        os.environ['SPACK_DEPENDENCIES'] = self.dep2
-        os.environ['SPACK_LINK_DEPS'] = os.environ['SPACK_DEPENDENCIES']
+        self.set_deps([self.dep2], rpath=False)
         self.check_cc('dump-args', test_command,
                       self.realcc + ' ' +
                       '-Wl,-rpath,' + self.prefix + '/lib ' +
@@ -264,8 +274,7 @@ class CompilerWrapperTest(unittest.TestCase):
 
     def test_dep_lib_no_lib(self):
         """Ensure a single dependency RPATH is added with no -L."""
-        os.environ['SPACK_DEPENDENCIES'] = self.dep2
-        os.environ['SPACK_RPATH_DEPS'] = os.environ['SPACK_DEPENDENCIES']
+        self.set_deps([self.dep2], link=False)
         self.check_cc('dump-args', test_command,
                       self.realcc + ' ' +
                       '-Wl,-rpath,' + self.prefix + '/lib ' +
@@ -275,10 +284,7 @@ class CompilerWrapperTest(unittest.TestCase):
 
     def test_all_deps(self):
         """Ensure includes and RPATHs for all deps are added. """
-        os.environ['SPACK_DEPENDENCIES'] = ':'.join([
-            self.dep1, self.dep2, self.dep3, self.dep4])
-        os.environ['SPACK_RPATH_DEPS'] = os.environ['SPACK_DEPENDENCIES']
-        os.environ['SPACK_LINK_DEPS'] = os.environ['SPACK_DEPENDENCIES']
+        self.set_deps([self.dep1, self.dep2, self.dep3, self.dep4])
 
         # This is probably more constrained than it needs to be; it
         # checks order within prepended args and doesn't strictly have
@@ -288,27 +294,23 @@ class CompilerWrapperTest(unittest.TestCase):
                       '-Wl,-rpath,' + self.prefix + '/lib ' +
                       '-Wl,-rpath,' + self.prefix + '/lib64 ' +
 
-                      '-I' + self.dep4 + '/include ' +
-
                       '-L' + self.dep3 + '/lib64 ' +
-                      '-Wl,-rpath,' + self.dep3 + '/lib64 ' +
-                      '-I' + self.dep3 + '/include ' +
-
                       '-L' + self.dep2 + '/lib64 ' +
-                      '-Wl,-rpath,' + self.dep2 + '/lib64 ' +
-
                       '-L' + self.dep1 + '/lib ' +
+
+                      '-Wl,-rpath,' + self.dep3 + '/lib64 ' +
+                      '-Wl,-rpath,' + self.dep2 + '/lib64 ' +
                       '-Wl,-rpath,' + self.dep1 + '/lib ' +
+
+                      '-I' + self.dep4 + '/include ' +
+                      '-I' + self.dep3 + '/include ' +
                       '-I' + self.dep1 + '/include ' +
 
                       ' '.join(test_command))
 
     def test_ld_deps(self):
         """Ensure no (extra) -I args or -Wl, are passed in ld mode."""
-        os.environ['SPACK_DEPENDENCIES'] = ':'.join([
-            self.dep1, self.dep2, self.dep3, self.dep4])
-        os.environ['SPACK_RPATH_DEPS'] = os.environ['SPACK_DEPENDENCIES']
-        os.environ['SPACK_LINK_DEPS'] = os.environ['SPACK_DEPENDENCIES']
+        self.set_deps([self.dep1, self.dep2, self.dep3, self.dep4])
 
         self.check_ld('dump-args', test_command,
                       'ld ' +
@@ -316,21 +318,19 @@ class CompilerWrapperTest(unittest.TestCase):
                       '-rpath ' + self.prefix + '/lib64 ' +
 
                       '-L' + self.dep3 + '/lib64 ' +
-                      '-rpath ' + self.dep3 + '/lib64 ' +
-
                       '-L' + self.dep2 + '/lib64 ' +
-                      '-rpath ' + self.dep2 + '/lib64 ' +
-
                       '-L' + self.dep1 + '/lib ' +
+
+                      '-rpath ' + self.dep3 + '/lib64 ' +
+                      '-rpath ' + self.dep2 + '/lib64 ' +
                       '-rpath ' + self.dep1 + '/lib ' +
 
                       ' '.join(test_command))
 
     def test_ld_deps_no_rpath(self):
         """Ensure SPACK_RPATH_DEPS controls RPATHs for ld."""
-        os.environ['SPACK_DEPENDENCIES'] = ':'.join([
-            self.dep1, self.dep2, self.dep3, self.dep4])
-        os.environ['SPACK_LINK_DEPS'] = os.environ['SPACK_DEPENDENCIES']
+        self.set_deps([self.dep1, self.dep2, self.dep3, self.dep4],
+                      rpath=False)
 
         self.check_ld('dump-args', test_command,
                       'ld ' +
@@ -345,9 +345,8 @@ class CompilerWrapperTest(unittest.TestCase):
 
     def test_ld_deps_no_link(self):
         """Ensure SPACK_LINK_DEPS controls -L for ld."""
-        os.environ['SPACK_DEPENDENCIES'] = ':'.join([
-            self.dep1, self.dep2, self.dep3, self.dep4])
-        os.environ['SPACK_RPATH_DEPS'] = os.environ['SPACK_DEPENDENCIES']
+        self.set_deps([self.dep1, self.dep2, self.dep3, self.dep4],
+                      link=False)
 
         self.check_ld('dump-args', test_command,
                       'ld ' +
@@ -360,12 +359,30 @@ class CompilerWrapperTest(unittest.TestCase):
 
                       ' '.join(test_command))
 
+    def test_many_deps(self):
+        """Ensure the flags of many deps are all added, in order."""
+        deps = [join_path(self.tmp_deps, 'many', str(i)) for i in range(150)]
+        for dep in deps:
+            mkdirp(join_path(dep, 'include'))
+            mkdirp(join_path(dep, 'lib'))
+        self.set_deps(deps)
+        os.environ['SPACK_TEST_COMMAND'] = 'dump-args'
+
+        args = self.cc('foo.o', '-o', 'foo', output=str).split()
+
+        rdeps = list(reversed(deps))
+        self.assertEqual([a for a in args if a.startswith('-I')],
+                         ['-I' + join_path(d, 'include') for d in rdeps])
+        self.assertEqual([a for a in args if a.startswith('-L')],
+                         ['-L' + join_path(d, 'lib') for d in rdeps])
+        self.assertEqual(
+            [a for a in args if a.startswith('-Wl,-rpath,' + self.tmp_deps)],
+            ['-Wl,-rpath,' + join_path(d, 'lib') for d in rdeps])
+
     def test_ld_deps_reentrant(self):
         """Make sure ld -r is handled correctly on OS's where it doesn't
            support rpaths."""
-        os.environ['SPACK_DEPENDENCIES'] = ':'.join([self.dep1])
-        os.environ['SPACK_RPATH_DEPS'] = os.environ['SPACK_DEPENDENCIES']
-        os.environ['SPACK_LINK_DEPS'] = os.environ['SPACK_DEPENDENCIES']
+        self.set_deps([self.dep1])
 
         os.environ['SPACK_SHORT_SPEC'] = "foo@1.2=linux-x86_64"
         reentrant_test_command = ['-r'] + test_command
@@ -0,0 +1,68 @@
+##############################################################################
+# Copyright (c) 2013-2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/spack/spack
+# Please also see the NOTICE and LICENSE files for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+from spack.main import SpackCommand
+
+debug = SpackCommand('debug')
+
+
+def test_import_times():
+    out = debug('import-times', '--runs', '1', 'spack.version')
+    lines = out.strip().split('\n')
+    assert any(line.startswith('spack.version ') for line in lines)
+    assert lines[-1].startswith('total ')
+
+
+def test_import_spack_is_lazy():
+    """Importing spack must not import its subsystems, which are set up
+    the first time they are used."""
+    out = debug('import-times', '--runs', '1', '--by-module', 'spack')
+    modules = [line.split()[0] for line in out.strip().split('\n')]
+    for heavy in ('spack.config', 'spack.repository', 'spack.spec',
+                  'spack.package', 'spack.build_systems.autotools'):
+        assert heavy not in modules
+
+
+def test_parse_times(refresh_builtin_mock):
+    out = debug('parse-times', '--runs', '1', '--namespace', 'builtin.mock')
+    lines = out.strip().split('\n')
+    assert 'spec strings' in lines[0]
+    assert [line.split()[0] for line in lines[1:]] == [
+        'parser', 'cache,', 'cache,']
+
+
+def test_log_throughput():
+    out = debug('log-throughput', '--runs', '1', '--size', '1')
+    lines = out.strip().split('\n')
+    assert lines[0].startswith('1.0 MB in ')
+    assert [line.split()[0] for line in lines[1:]] == [
+        'throughput', 'elapsed', 'daemon']
+
+
+def test_cc_times():
+    out = debug('cc-times', '--invocations', '1', '--dependencies', '3')
+    lines = out.strip().split('\n')
+    assert lines[0] == '3 dependencies, mean of 1 invocations'
+    assert [line.split()[0] for line in lines[1:]] == [
+        'startup', 'compile', 'link']
@@ -22,28 +22,15 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
-import pytest
-
+import spack.cmd
+import spack.main
 from spack.main import SpackCommand
 
 
-@pytest.mark.xfail
 def test_reuse_after_help():
     """Test `spack help` can be called twice with the same SpackCommand."""
     help_cmd = SpackCommand('help')
     help_cmd()
-
-    # This second invocation will somehow fail because the parser no
-    # longer works after add_all_commands() is called in
-    # SpackArgumentParser.format_help_sections().
-    #
-    # TODO: figure out why this doesn't work properly and change this
-    # test to use a single SpackCommand.
-    #
-    # It seems that parse_known_args() finds "too few arguments" the
-    # second time through b/c add_all_commands() ends up leaving extra
-    # positionals in the parser. But this used to work before we loaded
-    # commands lazily.
     help_cmd()
 
 
@@ -73,3 +60,26 @@ def test_help_subcommand():
     help_cmd = SpackCommand('help')
     out = help_cmd('help')
     assert 'get help on spack and its commands' in out
+
+
+def test_command_properties():
+    """Help reads the properties of commands from their source: check
+    they are the ones of the modules."""
+    for name in spack.cmd.commands:
+        module = spack.cmd.get_module(name)
+        properties = spack.cmd.get_command_properties(name)
+        for p in spack.cmd.command_properties:
+            assert properties[p] == getattr(module, p)
+
+
+def test_help_sections_leave_parser_unchanged():
+    """Formatting help must not add arguments to the parser."""
+    parser = spack.main.make_argument_parser()
+    actions = list(parser._actions)
+    optionals = list(parser._optionals._group_actions)
+
+    for level in spack.main.levels:
+        assert 'spack help --all' in parser.format_help_sections(level)
+    assert parser._actions == actions
+    assert parser._optionals._group_actions == optionals
+    assert parser.parse_args(['-d']).debug
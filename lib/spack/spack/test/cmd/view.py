@@ -22,7 +22,12 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
+from llnl.util.filesystem import mkdirp, touchp
+from llnl.util.link_tree import LinkTree
+from spack.filesystem_view import YamlFilesystemView
 from spack.main import SpackCommand
+from spack.spec import Spec
+import spack.util.spack_json as sjson
 import os.path
 import pytest
 
@@ -32,7 +37,8 @@ install = SpackCommand('install')
 view = SpackCommand('view')
 
 
-@pytest.mark.parametrize('cmd', ['hardlink', 'symlink', 'hard', 'add'])
+@pytest.mark.parametrize('cmd', ['hardlink', 'symlink', 'hard', 'add',
+                                 'copy', 'clone'])
 def test_view_link_type(
         tmpdir, builtin_mock, mock_archive, mock_fetch, config,
         install_mockery, cmd):
@@ -41,7 +47,118 @@ def test_view_link_type(
     view(cmd, viewpath, 'libdwarf')
     package_prefix = os.path.join(viewpath, 'libdwarf')
     assert os.path.exists(package_prefix)
-    assert os.path.islink(package_prefix) == (not cmd.startswith('hard'))
+    assert os.path.islink(package_prefix) == (cmd in ['symlink', 'add'])
+
+
+@pytest.mark.parametrize('cmd', ['hardlink', 'copy'])
+def test_view_remove_non_symlinks(
+        tmpdir, builtin_mock, mock_archive, mock_fetch, config,
+        install_mockery, cmd):
+    install('libdwarf')
+    viewpath = str(tmpdir.mkdir('view_{0}'.format(cmd)))
+    view(cmd, '-j', '4', viewpath, 'libdwarf')
+    assert os.path.exists(os.path.join(viewpath, 'libelf'))
+
+    view('remove', viewpath, 'libdwarf')
+    assert not os.path.exists(os.path.join(viewpath, 'libdwarf'))
+    assert not os.path.exists(os.path.join(viewpath, 'libelf'))
+
+
+def test_view_conflict_links_nothing(
+        tmpdir, builtin_mock, mock_archive, mock_fetch, config,
+        install_mockery):
+    install('libdwarf')
+    viewpath = str(tmpdir.mkdir('view'))
+    tmpdir.join('view', 'libdwarf').write('not from spack')
+
+    output = view('symlink', viewpath, 'libdwarf')
+    assert 'Cannot link package libdwarf, file already exists' in output
+    # conflicts are found before anything is linked
+    assert not os.path.exists(os.path.join(viewpath, 'libelf'))
+
+    output = view('symlink', '-i', viewpath, 'libdwarf')
+    assert 'Could not link' in output
+    assert os.path.islink(os.path.join(viewpath, 'libelf'))
+    assert not os.path.islink(os.path.join(viewpath, 'libdwarf'))
+
+
+def test_view_manifest(
+        tmpdir, builtin_mock, mock_archive, mock_fetch, config,
+        install_mockery, monkeypatch):
+    install('libdwarf')
+    viewpath = str(tmpdir.mkdir('view'))
+    view('symlink', viewpath, 'libdwarf')
+
+    manifest_path = os.path.join(viewpath, '.spack', 'manifest.json')
+    with open(manifest_path) as f:
+        entries = sjson.load(f)['view']['specs']
+    assert sorted(entries) == ['libdwarf', 'libelf']
+    for entry in entries.values():
+        assert entry['files']
+        for path in entry['files']:
+            assert os.path.islink(os.path.join(viewpath, path))
+
+    # Neither the spec files in the view nor the prefixes are looked at
+    def fail(*args, **kwargs):
+        raise AssertionError('the manifest should have been used')
+    monkeypatch.setattr(YamlFilesystemView, 'get_spec', fail)
+    monkeypatch.setattr(LinkTree, 'get_file_map', fail)
+    monkeypatch.setattr(LinkTree, 'unmerge', fail)
+
+    output = view('status', viewpath)
+    assert 'libdwarf' in output
+    assert 'libelf' in output
+
+    view('--dependencies', 'false', 'remove', viewpath, 'libdwarf')
+    for path in entries['libdwarf']['files']:
+        assert not os.path.lexists(os.path.join(viewpath, path))
+    for path in entries['libelf']['files']:
+        assert os.path.islink(os.path.join(viewpath, path))
+    with open(manifest_path) as f:
+        assert list(sjson.load(f)['view']['specs']) == ['libelf']
+
+
+def test_view_walks_only_new_packages(
+        tmpdir, builtin_mock, mock_archive, mock_fetch, config,
+        install_mockery, monkeypatch):
+    install('libdwarf')
+    viewpath = str(tmpdir.mkdir('view'))
+    view('symlink', viewpath, 'libelf')
+
+    walked = []
+    get_file_map = LinkTree.get_file_map
+
+    def record_walk(self, *args, **kwargs):
+        walked.append(self._root)
+        return get_file_map(self, *args, **kwargs)
+    monkeypatch.setattr(LinkTree, 'get_file_map', record_walk)
+
+    # The files of libelf in the view are known from the manifest
+    view('symlink', viewpath, 'libdwarf')
+    assert walked == [Spec('libdwarf').concretized().prefix]
+    assert os.path.islink(os.path.join(viewpath, 'libdwarf'))
+
+
+def test_view_remove_shared_directories(
+        tmpdir, builtin_mock, mock_archive, mock_fetch, config,
+        install_mockery):
+    install('libdwarf')
+    libdwarf = Spec('libdwarf').concretized()
+    for spec in libdwarf.traverse():
+        touchp(os.path.join(spec.prefix, 'share', 'common', spec.name))
+        mkdirp(os.path.join(spec.prefix, 'share', 'empty'))
+
+    viewpath = str(tmpdir.mkdir('view'))
+    view('symlink', viewpath, 'libdwarf')
+    share = os.path.join(viewpath, 'share')
+
+    # libdwarf created the directories libelf also has: they are kept
+    view('--dependencies', 'false', 'remove', viewpath, 'libdwarf')
+    assert os.listdir(os.path.join(share, 'common')) == ['libelf']
+    assert os.path.isdir(os.path.join(share, 'empty'))
+
+    view('remove', viewpath, 'libelf')
+    assert not os.path.exists(share)
 
 
 def test_view_external(
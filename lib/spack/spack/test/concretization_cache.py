@@ -0,0 +1,150 @@
+##############################################################################
+# Copyright (c) 2013-2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/spack/spack
+# Please also see the NOTICE and LICENSE files for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+import os
+
+import pytest
+
+import spack
+import spack.concretization_cache as cc
+import spack.file_cache
+from spack.spec import Spec
+
+
+@pytest.fixture()
+def concretization_cache(tmpdir, monkeypatch):
+    """Enables the concretization cache, in a temporary directory, and
+    counts the specs concretized from scratch."""
+    monkeypatch.setattr(spack, 'concretization_cache_size', 1)
+    monkeypatch.setattr(spack, 'misc_cache', spack.file_cache.FileCache(
+        str(tmpdir.join('cache'))))
+
+    concretized = []
+    concretize_helper = Spec._concretize_helper
+
+    def counting_helper(self, *args, **kwargs):
+        if not self._dependents:
+            concretized.append(self.name)
+        return concretize_helper(self, *args, **kwargs)
+
+    monkeypatch.setattr(Spec, '_concretize_helper', counting_helper)
+    return concretized
+
+
+def entries():
+    root = spack.misc_cache.cache_path(cc._cache_dir)
+    return sorted(f for f in os.listdir(root) if not f.startswith('.'))
+
+
+@pytest.mark.parametrize('abstract', [
+    'mpileaks', 'mpileaks ^mpich', 'dttop', 'multivalue_variant',
+    'patch-several-dependencies', 'externaltool'
+])
+def test_cached_concretization(
+        abstract, concretization_cache, builtin_mock, config):
+    first = Spec(abstract).concretized()
+    assert concretization_cache
+    assert len(entries()) == 1
+
+    del concretization_cache[:]
+    second = Spec(abstract).concretized()
+    assert concretization_cache == []
+
+    assert second.concrete
+    assert second == first
+    assert second.dag_hash() == first.dag_hash()
+    for x, y in zip(first.traverse(), second.traverse()):
+        assert y.package.spec is y
+        assert [p.sha256 for p in x.patches] == [p.sha256 for p in y.patches]
+
+
+def test_cache_follows_packages_and_config(
+        concretization_cache, builtin_mock, config, monkeypatch):
+    spec = Spec('mpileaks').concretized()
+
+    # A provider of mpi changed
+    package_hash = cc._package_hash
+    monkeypatch.setattr(cc, '_package_hash', lambda name: (
+        'changed' if name == 'zmpi' else package_hash(name)))
+    del concretization_cache[:]
+    assert Spec('mpileaks').concretized() == spec
+    assert 'mpileaks' in concretization_cache
+
+    # The providers of mpi changed
+    monkeypatch.setattr(cc, '_providers', lambda v: ['mpich'])
+    del concretization_cache[:]
+    assert Spec('mpileaks').concretized() == spec
+    assert 'mpileaks' in concretization_cache
+
+    # Specs that differ, or a different configuration, use other entries
+    assert cc.cache_key(Spec('mpileaks')) != cc.cache_key(Spec('mpileaks@2'))
+    key = cc.cache_key(Spec('mpileaks'))
+    get_config = spack.config.get_config
+    monkeypatch.setattr(spack.config, 'get_config', lambda section: (
+        {'all': {'compiler': ['clang']}} if section == 'packages'
+        else get_config(section)))
+    assert cc.cache_key(Spec('mpileaks')) != key
+
+
+def test_cache_follows_package_testing(
+        concretization_cache, builtin_mock, config):
+    # Test dependencies are part of the specs of packages being tested
+    key = cc.cache_key(Spec('mpileaks'))
+    try:
+        spack.package_testing.test('mpileaks')
+        tested = cc.cache_key(Spec('mpileaks'))
+        assert tested != key
+
+        spack.package_testing.test_all()
+        assert cc.cache_key(Spec('mpileaks')) not in (key, tested)
+    finally:
+        spack.package_testing.clear()
+
+    assert cc.cache_key(Spec('mpileaks')) == key
+
+
+def test_cache_follows_spack_sources(
+        concretization_cache, builtin_mock, config, monkeypatch):
+    key = cc.cache_key(Spec('mpileaks'))
+    monkeypatch.setattr(cc, '_spack_sources_hash', lambda: 'changed')
+    assert cc.cache_key(Spec('mpileaks')) != key
+
+
+def test_cache_evicts_least_recently_used(
+        concretization_cache, builtin_mock, config):
+    paths = {}
+    for i, abstract in enumerate(['mpileaks', 'dttop', 'libelf']):
+        Spec(abstract).concretized()
+        paths[abstract] = spack.misc_cache.cache_path(
+            cc.cache_key(Spec(abstract)))
+        os.utime(paths[abstract], (i, i))
+
+    # Using an entry makes it the most recently used
+    Spec('mpileaks').concretized()
+
+    sizes = dict((a, os.path.getsize(p)) for a, p in paths.items())
+    cc._evict(sizes['mpileaks'] + sizes['libelf'])
+    assert os.path.exists(paths['mpileaks'])
+    assert os.path.exists(paths['libelf'])
+    assert not os.path.exists(paths['dttop'])
@@ -24,6 +24,7 @@
 ##############################################################################
 import collections
 import getpass
+import json
 import os
 import tempfile
 
@@ -31,6 +32,8 @@ import ordereddict_backport
 import pytest
 import spack
 import spack.config
+import spack.file_cache
+import spack.util.spack_yaml as syaml
 import yaml
 from spack.util.path import canonicalize_path
 
@@ -194,8 +197,10 @@ def check_compiler_config(comps, *compiler_names):
 
 
 @pytest.fixture()
-def config(tmpdir):
+def config(tmpdir, monkeypatch):
     """Mocks the configuration scope."""
+    monkeypatch.setattr(spack, 'misc_cache', spack.file_cache.FileCache(
+        str(tmpdir.join('cache'))))
     spack.config.clear_config_caches()
     real_scope = spack.config.config_scopes
     spack.config.config_scopes = ordereddict_backport.OrderedDict()
@@ -370,6 +375,170 @@ class TestConfig(object):
             'build_stage': ['patha', 'pathb']
         }
 
+    def test_merged_config_is_cached(self, write_config_file, monkeypatch):
+        write_config_file('config', config_low, 'low')
+        write_config_file('config', config_merge_list, 'high')
+
+        calls = collections.defaultdict(int)
+
+        def counting(name):
+            function = getattr(spack.config, name)
+
+            def _counting(*args, **kwargs):
+                calls[name] += 1
+                return function(*args, **kwargs)
+            return _counting
+
+        for name in ('_merge_sections', 'validate_section'):
+            monkeypatch.setattr(spack.config, name, counting(name))
+
+        for i in range(3):
+            assert spack.config.get_config('config') == {
+                'install_tree': 'install_tree_path',
+                'build_stage': ['patha', 'pathb', 'path1', 'path2', 'path3']
+            }
+        # One merge, and each file is validated once
+        assert calls['_merge_sections'] == 1
+        assert calls['validate_section'] == 2
+
+        # Callers can modify what they get without changing the cache
+        spack.config.get_config('config')['install_tree'] = 'modified'
+        assert spack.config.get_config('config')['install_tree'] == (
+            'install_tree_path')
+        assert calls['_merge_sections'] == 1
+
+    def test_merged_config_follows_file_changes(self, write_config_file,
+                                                tmpdir):
+        write_config_file('config', config_low, 'low')
+        assert spack.config.get_config('config') == config_low['config']
+
+        # Make sure the modification time changes, even on file systems
+        # with a coarse resolution.
+        write_config_file('config', config_override_all, 'low')
+        path = str(tmpdir.join('low', 'config.yaml'))
+        st = os.stat(path)
+        os.utime(path, (st.st_atime, st.st_mtime + 10))
+        assert spack.config.get_config('config') == {
+            'install_tree': 'override_all'
+        }
+
+    def test_merged_config_follows_update_config(self):
+        spack.config.update_config('repos', repos_low['repos'], scope='low')
+        assert spack.config.get_config('repos') == repos_low['repos']
+
+        spack.config.update_config('repos', repos_high['repos'], scope='low')
+        assert spack.config.get_config('repos') == repos_high['repos']
+
+    def count_reads(self, monkeypatch):
+        calls = collections.defaultdict(int)
+
+        def counting(name):
+            function = getattr(spack.config, name)
+
+            def _counting(*args, **kwargs):
+                calls[name] += 1
+                return function(*args, **kwargs)
+            return _counting
+
+        for name in ('_read_config_file', 'validate_section'):
+            monkeypatch.setattr(spack.config, name, counting(name))
+        return calls
+
+    def test_config_file_cache(self, write_config_file, monkeypatch):
+        write_config_file('config', config_low, 'low')
+        write_config_file('config', config_override_key, 'high')
+        expected = {
+            'install_tree': 'override_key',
+            'build_stage': ['path1', 'path2', 'path3']
+        }
+        assert spack.config.get_config('config') == expected
+
+        # A new process would find both files in the misc cache
+        spack.config.clear_config_caches()
+        calls = self.count_reads(monkeypatch)
+        assert spack.config.get_config('config') == expected
+        assert calls['_read_config_file'] == 0
+        assert calls['validate_section'] == 0
+
+        # Overrides and line information are kept
+        data = spack.config.config_scopes['high'].get_section('config')
+        key = next(iter(data['config']))
+        assert spack.config.override(key)
+        mark = data['config'][key]._start_mark
+        assert mark.name.endswith(os.path.join('high', 'config.yaml'))
+        assert mark.line == 0
+
+    def test_config_file_cache_is_plain_data(self, write_config_file):
+        write_config_file('config', config_low, 'low')
+        write_config_file('config', config_override_key, 'high')
+        spack.config.get_config('config')
+
+        def cached(scope):
+            # Cached files hold JSON, which can't run code when it is read
+            scope = spack.config.config_scopes[scope]
+            key = spack.config._cache_key(
+                scope.get_section_filename('config'))
+            with open(spack.misc_cache.cache_path(key)) as f:
+                data = spack.config._decode(json.load(f)['data'])
+            assert data == scope.get_section('config')
+            return data['config']
+
+        # The types of the data read from YAML are restored
+        low, high = cached('low'), cached('high')
+        assert type(low) is syaml.syaml_dict
+        assert type(low['build_stage']) is list
+        assert type(low['build_stage'][0]) is syaml.syaml_str
+        key = next(iter(high))
+        assert type(key) is syaml.syaml_str
+        assert spack.config.override(key)
+        assert high[key]._start_mark.line == 0
+
+        with pytest.raises(TypeError):
+            spack.config._encode({'not yaml': object()})
+
+    def test_config_file_cache_of_other_users(self, write_config_file,
+                                              monkeypatch):
+        write_config_file('config', config_low, 'low')
+        spack.config.get_config('config')
+
+        # The misc cache may be shared: entries of other users are ignored
+        spack.config.clear_config_caches()
+        uid = os.getuid()
+        monkeypatch.setattr(os, 'getuid', lambda: uid + 1)
+        calls = self.count_reads(monkeypatch)
+        assert spack.config.get_config('config') == config_low['config']
+        assert calls['_read_config_file'] == 1
+
+    def test_config_file_cache_follows_file_changes(self, write_config_file,
+                                                    monkeypatch, tmpdir):
+        write_config_file('config', config_low, 'low')
+        assert spack.config.get_config('config') == config_low['config']
+
+        write_config_file('config', config_override_all, 'low')
+        path = str(tmpdir.join('low', 'config.yaml'))
+        st = os.stat(path)
+        os.utime(path, (st.st_atime, st.st_mtime + 10))
+
+        spack.config.clear_config_caches()
+        calls = self.count_reads(monkeypatch)
+        assert spack.config.get_config('config') == {
+            'install_tree': 'override_all'
+        }
+        assert calls['_read_config_file'] == 1
+
+    def test_config_file_cache_follows_schema_changes(self, write_config_file,
+                                                      monkeypatch):
+        write_config_file('config', config_low, 'low')
+        assert spack.config.get_config('config') == config_low['config']
+
+        spack.config.clear_config_caches()
+        monkeypatch.setattr(
+            spack.config, '_schema_hash', lambda section: 'changed')
+        calls = self.count_reads(monkeypatch)
+        assert spack.config.get_config('config') == config_low['config']
+        assert calls['_read_config_file'] == 1
+        assert calls['validate_section'] == 1
+
 
 def test_keys_are_ordered():
 
@@ -25,13 +25,20 @@
 import collections
 import copy
 import os
+import posixpath
 import shutil
 import re
+import threading
+import time
 
 import ordereddict_backport
 
 import py
 import pytest
+from six.moves.BaseHTTPServer import HTTPServer
+from six.moves.SimpleHTTPServer import SimpleHTTPRequestHandler
+from six.moves.socketserver import ThreadingMixIn
+from six.moves.urllib.parse import unquote, urlparse
 
 from llnl.util.filesystem import remove_linked_tree
 
@@ -51,6 +58,12 @@ from spack.fetch_strategy import FetchError
 from spack.spec import Spec
 from spack.version import Version
 
+# The spack module sets up its global state (spack.repo, the caches, the
+# config.yaml options...) the first time it is used: do it now, from the
+# real configuration, before tests replace it with mock ones.
+for _name in list(spack._lazy_attributes):
+    getattr(spack, _name)
+
 
 #
 # These fixtures are applied to all tests
@@ -84,6 +97,16 @@ def mock_stage(tmpdir_factory):
     spack.stage_path = stage_path
 
 
+@pytest.fixture(scope='session', autouse=True)
+def no_concretization_cache():
+    """Concretizes specs from scratch: tests change packages in memory,
+    which the concretization cache can't detect."""
+    size = spack.concretization_cache_size
+    spack.concretization_cache_size = 0
+    yield
+    spack.concretization_cache_size = size
+
+
 @pytest.fixture(scope='session')
 def _ignore_stage_files():
     """Session-scoped helper for check_for_leftover_stage_files.
@@ -634,6 +657,121 @@ def mock_svn_repository(tmpdir_factory):
     yield t
 
 
+##########
+# Local web server
+##########
+
+
+class MockHTTPRequestHandler(SimpleHTTPRequestHandler):
+    """Serves the files under the root of a MockHTTPServer, with
+    keep-alive connections and ``Range: bytes=<start>-`` requests, and
+    records what it gets."""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        SimpleHTTPRequestHandler.setup(self)
+        self.server.connections.append(self.client_address)
+
+    def translate_path(self, path):
+        path = posixpath.normpath(unquote(urlparse(path).path))
+        parts = [p for p in path.split('/') if p not in ('', '.', '..')]
+        return os.path.join(self.server.root, *parts)
+
+    def send_head(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.command, self.path))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight,
+                                       server.in_flight)
+        try:
+            time.sleep(server.delay)
+            match = re.match(r'bytes=(\d+)-$', self.headers.get('Range', ''))
+            path = self.translate_path(self.path)
+            if match and os.path.isfile(path):
+                server.ranges.append((self.path, int(match.group(1))))
+                return self.send_range(path, int(match.group(1)))
+            return SimpleHTTPRequestHandler.send_head(self)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def send_range(self, path, start):
+        f = open(path, 'rb')
+        size = os.fstat(f.fileno()).st_size
+        if start >= size:
+            f.close()
+            self.send_error(416)
+            return None
+        f.seek(start)
+        self.send_response(206)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Range', 'bytes {0}-{1}/{2}'.format(
+            start, size - 1, size))
+        self.send_header('Content-Length', str(size - start))
+        self.end_headers()
+        return f
+
+    def copyfile(self, source, outputfile):
+        drop_after, self.server.drop_after = self.server.drop_after, None
+        if drop_after is None:
+            return SimpleHTTPRequestHandler.copyfile(self, source, outputfile)
+
+        # Send part of the data only, and hang up
+        outputfile.write(source.read(drop_after))
+        outputfile.flush()
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+class MockHTTPServer(ThreadingMixIn, HTTPServer):
+    """HTTP server on localhost, running in a thread of the tests."""
+    daemon_threads = True
+
+    def __init__(self, root):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), MockHTTPRequestHandler)
+        self.root = root
+        self.url = 'http://127.0.0.1:{0}'.format(self.server_address[1])
+        self.delay = 0
+        self.drop_after = None
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget the requests and connections recorded so far."""
+        self.requests = []
+        self.ranges = []
+        self.connections = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+
+@pytest.fixture()
+def http_server(tmpdir):
+    """Serves the files in ``http_server.root`` at ``http_server.url``.
+
+    ``requests`` and ``connections`` record the (method, path) of each
+    request and the client address of each connection the server got,
+    ``ranges`` the (path, start) of the requests for part of a file,
+    ``max_in_flight`` the largest number of requests served at the same
+    time, and ``delay`` makes every request take that many seconds.
+    ``drop_after`` makes the next response break the connection after
+    sending that many bytes of the file.
+    """
+    server = MockHTTPServer(str(tmpdir.ensure('http-root', dir=True)))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
 ##########
 # Mock packages
 ##########
@@ -202,6 +202,70 @@ def test_025_reindex(database):
     _check_db_sanity(install_db)
 
 
+def test_026_reindex_in_parallel(database):
+    install_db = database.mock.db
+    spack.store.db.reindex(spack.store.layout, jobs=4)
+    _check_db_sanity(install_db)
+
+
+def _count_spec_reads(monkeypatch):
+    """Record the paths of the spec files read by the layout."""
+    reads = []
+    layout = spack.store.layout
+    read_spec = layout.read_spec
+
+    def counting_read_spec(path):
+        reads.append(path)
+        return read_spec(path)
+
+    monkeypatch.setattr(layout, 'read_spec', counting_read_spec)
+    return reads
+
+
+def test_027_reindex_reads_each_spec_file_once(database, monkeypatch):
+    install_db = database.mock.db
+    reads = _count_spec_reads(monkeypatch)
+
+    spack.store.db.reindex(spack.store.layout, jobs=1)
+    assert reads
+    assert sorted(reads) == sorted(spack.store.layout.all_spec_files())
+    _check_db_sanity(install_db)
+
+
+def test_028_incremental_reindex(database, monkeypatch):
+    install_db = database.mock.db
+    layout = spack.store.layout
+    spack.store.db.reindex(layout, jobs=1)
+
+    reads = _count_spec_reads(monkeypatch)
+    spack.store.db.reindex(layout, jobs=1, incremental=True)
+    assert reads == []
+    _check_db_sanity(install_db)
+
+    # Only the spec file that changed is read again
+    changed = layout.all_spec_files()[0]
+    st = os.stat(changed)
+    os.utime(changed, (st.st_atime, st.st_mtime + 10))
+    del reads[:]
+    spack.store.db.reindex(layout, jobs=1, incremental=True)
+    assert reads == [changed]
+    _check_db_sanity(install_db)
+
+
+def test_029_reindex_writes_spec_files_under_lock(database, monkeypatch):
+    db = spack.store.db
+    write_spec_files = db._write_spec_files
+    locked = []
+
+    def checking_write_spec_files(*args):
+        locked.append(db.lock._writes > 0)
+        write_spec_files(*args)
+    monkeypatch.setattr(db, '_write_spec_files', checking_write_spec_files)
+
+    db.reindex(spack.store.layout, jobs=1)
+    assert locked == [True]
+
+
 def test_030_db_sanity_from_another_process(database, refresh_db_on_exit):
     install_db = database.mock.db
 
@@ -422,3 +486,140 @@ def test_external_entries_in_db(database):
     assert rec.spec.external_path == '/path/to/external_tool'
     assert rec.spec.external_module is None
     assert rec.explicit is True
+
+
+@pytest.mark.parametrize('query', [
+    'mpileaks', 'mpi', 'mpileaks@2.3', 'mpileaks@:1.0', 'libelf%gcc',
+    '%gcc@4.5.0', 'callpath arch=test-debian6-x86_64', 'os=debian6',
+    'mpileaks ^mpich2', 'nonexisting-package'
+])
+def test_indexed_query_matches_full_scan(database, query):
+    install_db = database.mock.db
+    query_spec = spack.spec.Spec(query)
+
+    for installed in (True, False, any):
+        for explicit in (True, False, any):
+            expected = sorted(
+                rec.spec for rec in install_db._data.values()
+                if (installed is any or rec.installed == installed) and
+                (explicit is any or rec.explicit == explicit) and
+                rec.spec.satisfies(query_spec))
+            assert install_db.query(
+                query_spec, installed=installed, explicit=explicit
+            ) == expected
+
+
+def test_query_index_tracks_updates(database):
+    install_db = database.mock.db
+    assert not install_db.query('mpileaks ^zmpi', explicit=True)
+
+    install_db.update_explicit('mpileaks ^zmpi', True)
+    assert len(install_db.query('mpileaks ^zmpi', explicit=True)) == 1
+
+    # A removed dependency is still tracked, but not installed
+    spec = install_db.query_one('zmpi')
+    install_db.remove(spec)
+    assert not install_db.query('zmpi')
+    assert install_db.query('zmpi', installed=False) == [spec]
+
+    install_db.add(spec, spack.store.layout)
+    assert install_db.query('zmpi') == [spec]
+    install_db.update_explicit('mpileaks ^zmpi', False)
+
+
+def test_writes_append_to_journal(database, refresh_db_on_exit):
+    install_db = database.mock.db
+    db_dir = database.mock.path.join('.spack-db')
+    snapshot = db_dir.join('index.json').read()
+    journal_size = db_dir.join('index.journal').size()
+
+    install_db.update_explicit('mpileaks ^zmpi', True)
+    _mock_remove('mpileaks ^zmpi')
+
+    assert db_dir.join('index.json').read() == snapshot
+    assert db_dir.join('index.journal').size() > journal_size
+
+
+def test_readers_replay_only_new_journal_entries(
+        database, refresh_db_on_exit, monkeypatch):
+    install_db = database.mock.db
+    other_db = spack.database.Database(str(database.mock.path))
+    assert other_db.query() == install_db.query()
+
+    # From now on the other DB must catch up from the journal alone
+    def fail(*args, **kwargs):
+        raise AssertionError('snapshot was read again')
+    monkeypatch.setattr(other_db, '_read_from_file', fail)
+
+    install_db.update_explicit('mpileaks ^zmpi', True)
+    _mock_remove('mpileaks ^mpich2')
+    _mock_install('mpileaks ^mpich2')
+
+    assert other_db.query() == install_db.query()
+    assert other_db.query(explicit=True) == install_db.query(explicit=True)
+    other_db._check_ref_counts()
+
+
+def test_journal_compaction(database, refresh_db_on_exit, monkeypatch):
+    install_db = database.mock.db
+    db_dir = database.mock.path.join('.spack-db')
+    other_db = spack.database.Database(str(database.mock.path))
+    other_db.query()
+
+    # Once the journal is larger than the snapshot, the next write
+    # compacts it into a new snapshot.
+    monkeypatch.setattr(spack.database, '_journal_min_compaction_size', 0)
+    journal_id = install_db._journal_id
+    for i in range(100):
+        _mock_remove('mpileaks ^zmpi')
+        _mock_install('mpileaks ^zmpi')
+        if install_db._journal_id != journal_id:
+            break
+
+    assert install_db._journal_id != journal_id
+    assert install_db._journal_id in db_dir.join('index.json').read()
+
+    assert other_db.query() == install_db.query()
+    other_db._check_ref_counts()
+
+
+def test_incomplete_journal_entry_is_ignored(database, refresh_db_on_exit):
+    install_db = database.mock.db
+    journal = database.mock.path.join('.spack-db', 'index.journal')
+    journal.write('{"op": "remove", "ha', mode='a')
+
+    other_db = spack.database.Database(str(database.mock.path))
+    assert other_db.query() == install_db.query()
+
+    # The next write replaces the incomplete entry
+    _mock_remove('mpileaks ^zmpi')
+    other_db = spack.database.Database(str(database.mock.path))
+    assert other_db.query() == install_db.query()
+    assert '"ha\n' not in journal.read()
+
+
+def test_unchanged_database_is_not_read_again(
+        database, refresh_db_on_exit, monkeypatch):
+    install_db = database.mock.db
+    other_db = spack.database.Database(str(database.mock.path))
+    other_db.query()
+
+    def fail(*args, **kwargs):
+        raise AssertionError('database was read again')
+
+    # Nothing was written, so there is nothing to read
+    monkeypatch.setattr(other_db, '_read_journal', fail)
+    monkeypatch.setattr(other_db, '_read_from_file', fail)
+    assert other_db.query() == install_db.query()
+    with other_db.write_transaction():
+        pass
+
+    # Our own writes don't need to be read back either
+    monkeypatch.setattr(install_db, '_read_journal', fail)
+    monkeypatch.setattr(install_db, '_read_from_file', fail)
+    _mock_remove('mpileaks ^zmpi')
+    assert not install_db.query('mpileaks ^zmpi')
+
+    # But other writers' are
+    monkeypatch.undo()
+    assert not other_db.query('mpileaks ^zmpi')
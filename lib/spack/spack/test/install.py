@@ -26,6 +26,7 @@ import os
 import pytest
 
 import spack
+import spack.installer
 import spack.store
 from spack.spec import Spec
 
@@ -205,5 +206,43 @@ def test_failing_build(install_mockery, mock_fetch):
         pkg.do_install()
 
 
+def test_concurrent_install_of_diamond(install_mockery, mock_fetch):
+    spec = Spec('dt-diamond').concretized()
+    spec.package.do_install(install_jobs=4, fake=True, explicit=True)
+
+    for s in spec.traverse():
+        assert s.package.installed
+        record = spack.store.db.get_record(s)
+        assert record.explicit == (s is spec)
+
+
+@pytest.mark.disable_clean_stage_check
+def test_concurrent_install_stops_at_failure(
+        install_mockery, mock_fetch, monkeypatch):
+    spec = Spec('dependent-install').concretized()
+    dependency = spec['dependency-install']
+    monkeypatch.setattr(
+        type(dependency.package), 'install', _failing_install)
+
+    with pytest.raises(spack.build_environment.InstallError):
+        spec.package.do_install(install_jobs=2)
+    assert not dependency.package.installed
+    assert not spec.package.installed
+
+
+def _failing_install(self, spec, prefix):
+    raise MockInstallError('Intentional error', 'Mock install fails')
+
+
+@pytest.mark.parametrize('total,concurrent,expected', [
+    (16, 4, 4),
+    (16, 3, 5),
+    (2, 4, 1),
+    (8, 0, 8),
+])
+def test_jobs_per_build(total, concurrent, expected):
+    assert spack.installer.jobs_per_build(total, concurrent) == expected
+
+
 class MockInstallError(spack.error.SpackError):
     pass
@@ -26,7 +26,7 @@ import os
 
 import pytest
 from llnl.util.filesystem import working_dir, mkdirp, touchp
-from llnl.util.link_tree import LinkTree
+from llnl.util.link_tree import LinkTree, link_files
 from spack.stage import Stage
 
 
@@ -150,3 +150,48 @@ def test_ignore(stage, link_tree):
 
         assert os.path.isfile('source/.spec')
         assert os.path.isfile('dest/.spec')
+
+
+def test_unmerge_hard_links(stage, link_tree):
+    with working_dir(stage.path):
+        link_tree.merge('dest', link=os.link)
+
+        # Only trees of symbolic links are expected by default
+        with pytest.raises(ValueError):
+            link_tree.unmerge('dest')
+        assert os.path.isfile('dest/c/d/e/7')
+
+        link_tree.unmerge('dest', links_only=False)
+        assert not os.path.exists('dest')
+
+
+def test_get_file_map(stage, link_tree):
+    with working_dir(stage.path):
+        touchp('source/.spec')
+        os.symlink(os.path.abspath('source/a'), 'source/c/link')
+
+        dirs, files = link_tree.get_file_map(ignore=lambda x: x == '.spec')
+
+        # Parents come before their subdirectories
+        assert dirs.index('a') < dirs.index('a/b')
+        assert dirs.index('c') < dirs.index('c/d') < dirs.index('c/d/e')
+        assert sorted(dirs) == ['a', 'a/b', 'c', 'c/d', 'c/d/e']
+
+        # Links to directories are not followed
+        assert sorted(files) == ['1', 'a/b/2', 'a/b/3', 'c/4', 'c/d/5',
+                                 'c/d/6', 'c/d/e/7', 'c/link']
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_link_files(stage, link_tree, jobs):
+    with working_dir(stage.path):
+        dirs, files = link_tree.get_file_map()
+        for d in dirs:
+            mkdirp(os.path.join('dest', d))
+
+        link_files(((os.path.abspath(os.path.join('source', f)),
+                     os.path.join('dest', f)) for f in files),
+                   link=os.symlink, jobs=jobs)
+
+        for f in files:
+            check_file_link(os.path.join('dest', f))
@@ -23,7 +23,12 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
 from __future__ import print_function
+import os
+import sys
+import time
+
 import pytest
+from six import StringIO
 
 from llnl.util.tty.log import log_output
 from spack.util.executable import which
@@ -98,3 +103,63 @@ def test_log_subproc_and_echo_output(capfd, tmpdir):
 
         with open('foo.txt') as f:
             assert f.read() == 'logged\n'
+
+
+def test_log_daemon_does_not_spin(capfd, tmpdir):
+    resource = pytest.importorskip('resource')
+
+    def children_cpu_time():
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+
+    with tmpdir.as_cwd():
+        before = children_cpu_time()
+        with log_output('foo.txt'):
+            time.sleep(1)
+        # the daemon is joined on exit, so its time is accounted for
+        assert children_cpu_time() - before < 0.5
+
+
+def test_log_throughput(capfd, tmpdir):
+    # Lots of colored output, written in blocks that end in the middle of
+    # lines and of escape sequences, with an echoed region in between.
+    lines = ''.join('\x1b[1;32m==>\x1b[0m line {0} of output\n'.format(i)
+                    for i in range(100000))
+    expected = ''.join('==> line {0} of output\n'.format(i)
+                       for i in range(100000))
+    block = 4099
+
+    with tmpdir.as_cwd():
+        start = time.time()
+        with log_output('foo.txt') as logger:
+            for i in range(0, len(lines), block):
+                sys.stdout.write(lines[i:i + block])
+            with logger.force_echo():
+                print('echo')
+            sys.stdout.write(lines)
+        elapsed = time.time() - start
+
+        assert capfd.readouterr() == ('echo\n', '')
+
+        with open('foo.txt') as f:
+            assert f.read() == expected + 'echo\n' + expected
+
+        # ~7MB of output, handled in well under a second: only catch
+        # pathological slowdowns here.
+        assert elapsed < 30
+
+
+def test_log_split_multibyte_character():
+    # A read of the daemon can end in the middle of a character: that
+    # must not be taken for the end of the output.
+    log = StringIO()
+    with log_output(log):
+        sys.stdout.flush()
+        os.write(sys.stdout.fileno(), b'\xc3')
+        time.sleep(0.5)
+        os.write(sys.stdout.fileno(), b'\xa9 after\n')
+
+    expected = b'\xc3\xa9 after\n'
+    if not isinstance(log.getvalue(), bytes):
+        expected = expected.decode('utf-8')
+    assert log.getvalue() == expected
@@ -23,7 +23,10 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
 import filecmp
+import hashlib
+import json
 import os
+import shutil
 import pytest
 
 from llnl.util.filesystem import join_path
@@ -31,6 +34,7 @@ from llnl.util.filesystem import join_path
 import spack
 import spack.mirror
 import spack.util.executable
+from spack.patch import UrlPatch
 from spack.spec import Spec
 from spack.stage import Stage
 from spack.util.executable import which
@@ -157,3 +161,92 @@ class TestMirror(object):
         set_up_package('trivial-install-test-package', mock_archive, 'url')
         check_mirror()
         repos.clear()
+
+
+@pytest.mark.usefixtures('config', 'refresh_builtin_mock')
+def test_concurrent_mirror_with_manifest(
+        http_server, mock_archive, monkeypatch, tmpdir):
+    with open(mock_archive.archive_file, 'rb') as f:
+        digest = hashlib.md5(f.read()).hexdigest()
+
+    names = ['b', 'c', 'e']
+    for name in names:
+        archive = '{0}-1.0.tar.gz'.format(name)
+        shutil.copy(mock_archive.archive_file,
+                    os.path.join(http_server.root, archive))
+        pkg = spack.repo.get(Spec(name).concretized())
+        v = next(iter(pkg.versions))
+        monkeypatch.setitem(pkg.versions, v, {
+            'md5': digest, 'url': http_server.url + '/' + archive})
+
+    mirror_root = str(tmpdir.join('mirror'))
+    http_server.delay = 0.1
+    present, mirrored, error = spack.mirror.create(
+        mirror_root, names, jobs=3, jobs_per_host=2)
+    assert sorted(s.name for s in mirrored) == names
+    assert not present and not error
+    assert len(http_server.requests) == 3
+    assert 1 < http_server.max_in_flight <= 2
+
+    with open(os.path.join(mirror_root, spack.mirror.manifest_name)) as f:
+        archives = json.load(f)['mirror']['archives']
+    assert sorted(archives) == [
+        os.path.join(n, n + '-1.0.tar.gz') for n in names]
+    assert archives[os.path.join('b', 'b-1.0.tar.gz')] == {
+        'spec': 'b@1.0', 'resource': None, 'patch': False,
+        'digest': digest, 'url': http_server.url + '/b-1.0.tar.gz',
+        'size': os.path.getsize(mock_archive.archive_file)}
+
+    # Archives that match their checksum are not fetched again
+    http_server.reset()
+    with open(os.path.join(mirror_root, 'c', 'c-1.0.tar.gz'), 'ab') as f:
+        f.write(b'corrupted')
+    present, mirrored, error = spack.mirror.create(
+        mirror_root, names, jobs=3)
+    assert sorted(s.name for s in present) == ['b', 'e']
+    assert [s.name for s in mirrored] == ['c']
+    assert http_server.requests == [('GET', '/c-1.0.tar.gz')]
+
+
+@pytest.mark.usefixtures('config', 'refresh_builtin_mock')
+def test_mirror_url_patches(http_server, mock_archive, monkeypatch, tmpdir):
+    with open(mock_archive.archive_file, 'rb') as f:
+        digest = hashlib.md5(f.read()).hexdigest()
+    shutil.copy(mock_archive.archive_file,
+                os.path.join(http_server.root, 'b-1.0.tar.gz'))
+
+    patch_data = b'--- a/foo\n+++ b/foo\n'
+    with open(os.path.join(http_server.root, 'fix.patch'), 'wb') as f:
+        f.write(patch_data)
+    patch_sha256 = hashlib.sha256(patch_data).hexdigest()
+
+    pkg = spack.repo.get(Spec('b').concretized())
+    v = next(iter(pkg.versions))
+    monkeypatch.setitem(pkg.versions, v, {
+        'md5': digest, 'url': http_server.url + '/b-1.0.tar.gz'})
+    patch = UrlPatch(
+        http_server.url + '/fix.patch', 1, '.', sha256=patch_sha256)
+    monkeypatch.setattr(type(pkg), 'patches', {Spec('b@2.0'): [patch]})
+
+    mirror_root = str(tmpdir.join('mirror'))
+    present, mirrored, error = spack.mirror.create(mirror_root, ['b'])
+    assert [s.name for s in mirrored] == ['b'] and not error
+
+    # The patch is where UrlPatch.apply() looks for it in mirrors
+    patch_path = os.path.join(mirror_root, 'b', 'fix.patch')
+    with open(patch_path, 'rb') as f:
+        assert f.read() == patch_data
+
+    with open(os.path.join(mirror_root, spack.mirror.manifest_name)) as f:
+        archives = json.load(f)['mirror']['archives']
+    assert archives[os.path.join('b', 'fix.patch')] == {
+        'spec': 'b@1.0', 'resource': None, 'patch': True,
+        'url': http_server.url + '/fix.patch', 'digest': patch_sha256,
+        'size': len(patch_data)}
+    assert not archives[os.path.join('b', 'b-1.0.tar.gz')]['patch']
+
+    # Patches that match their checksum are not fetched again
+    http_server.reset()
+    present, mirrored, error = spack.mirror.create(mirror_root, ['b'])
+    assert [s.name for s in present] == ['b']
+    assert not http_server.requests
@@ -25,16 +25,22 @@
 """
 This test checks the binary packaging infrastructure
 """
+import json
+import multiprocessing
 import os
 import stat
 import sys
+import time
 import shutil
 import pytest
 import argparse
+import yaml
 
 from llnl.util.filesystem import mkdirp
 
 import spack
+import spack.file_cache
+import spack.relocate
 import spack.store
 import spack.binary_distribution as bindist
 import spack.cmd.buildcache as buildcache
@@ -47,6 +53,9 @@ from spack.relocate import get_patchelf, relocate_text
 from spack.relocate import substitute_rpath, get_relative_rpaths
 from spack.relocate import macho_replace_paths, macho_make_paths_relative
 from spack.relocate import modify_macho_object, macho_get_paths
+from spack.relocate import get_existing_elf_rpaths, modify_elf_object
+from spack.relocate import get_filetype
+from spack.util.elf import ElfFile
 
 
 @pytest.fixture(scope='function')
@@ -188,6 +197,15 @@ echo $PATH"""
         args = parser.parse_args(['install', '-f', '-y', str(pkghash)])
         buildcache.buildcache(parser, args)
 
+    # The build cache can be listed without spidering it
+    assert os.path.exists(
+        os.path.join(mirror_path, 'build_cache', 'index.json'))
+
+    # Prefetch the binary cache
+    tarballs = bindist.download_tarballs([spec, spec], jobs=2)
+    assert list(tarballs) == [spec.dag_hash()]
+    assert os.path.exists(tarballs[spec.dag_hash()])
+
     # Validate the relocation information
     buildinfo = bindist.read_buildinfo_file(spec.prefix)
     assert(buildinfo['relocate_textfiles'] == ['dummy.txt'])
@@ -218,6 +236,142 @@ echo $PATH"""
     stage.destroy()
 
 
+@pytest.mark.usefixtures('config', 'builtin_mock')
+def test_build_cache_index(tmpdir, monkeypatch):
+    cache = spack.file_cache.FileCache(str(tmpdir.join('cache')))
+    monkeypatch.setattr(spack, 'misc_cache', cache)
+    outdir = tmpdir.ensure('mirror', dir=True)
+    cache_dir = outdir.ensure('build_cache', dir=True)
+
+    specs = [Spec('mpileaks'), Spec('libelf')]
+    spec_dicts = []
+    for spec in specs:
+        spec.concretize()
+        spec_dict = spec.to_dict()
+        spec_dict['binary_cache_checksum'] = {
+            'hash_algorithm': 'sha256', 'hash': spec.dag_hash()}
+        spec_dicts.append(spec_dict)
+
+    # Index the spec.yaml files of a build cache without index
+    specfile_names = [bindist.tarball_name(s, '.spec.yaml') for s in specs]
+    cache_dir.join(specfile_names[0]).write(yaml.dump(spec_dicts[0]))
+    bindist.update_index_json(str(outdir))
+
+    # Then add a spec to it
+    cache_dir.join(specfile_names[1]).write(yaml.dump(spec_dicts[1]))
+    bindist.update_index_json(str(outdir), specfile_names[1], spec_dicts[1])
+
+    mirror_url = 'file://' + str(outdir)
+    index = bindist.read_index_json(mirror_url)
+    assert sorted(index) == sorted(s.dag_hash() for s in specs)
+    for spec in specs:
+        from_index = bindist._spec_from_index_entry(index[spec.dag_hash()])
+        assert from_index.dag_hash() == spec.dag_hash()
+        assert from_index == spec
+
+    # An unchanged index is read from the cache
+    def not_modified(url, etag, last_modified):
+        assert last_modified
+        return None, etag, last_modified
+    monkeypatch.setattr(bindist, 'read_if_modified', not_modified)
+    cache_dir.join('index.json').remove()
+    assert bindist.read_index_json(mirror_url) == index
+
+
+@pytest.mark.usefixtures('config', 'builtin_mock')
+def test_concurrent_build_cache_index_updates(tmpdir, monkeypatch):
+    outdir = tmpdir.ensure('mirror', dir=True)
+    cache_dir = outdir.ensure('build_cache', dir=True)
+    bindist.update_index_json(str(outdir))
+
+    updates = []
+    for name in ['mpileaks', 'libelf', 'libdwarf', 'callpath', 'dyninst']:
+        spec = Spec(name).concretized()
+        spec_dict = spec.to_dict()
+        spec_dict['binary_cache_checksum'] = {
+            'hash_algorithm': 'sha256', 'hash': spec.dag_hash()}
+        specfile_name = bindist.tarball_name(spec, '.spec.yaml')
+        cache_dir.join(specfile_name).write(yaml.dump(spec_dict))
+        updates.append((spec.dag_hash(), specfile_name, spec_dict))
+
+    # Widen the window between reading the index and writing it back
+    index_entry = bindist._index_entry
+
+    def slow_index_entry(*args):
+        time.sleep(0.1)
+        return index_entry(*args)
+    monkeypatch.setattr(bindist, '_index_entry', slow_index_entry)
+
+    processes = [
+        multiprocessing.Process(target=bindist.update_index_json,
+                                args=(str(outdir), name, spec_dict))
+        for _, name, spec_dict in updates]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    assert all(p.exitcode == 0 for p in processes)
+
+    with open(str(cache_dir.join('index.json'))) as f:
+        index = json.load(f)['buildcache']['specs']
+    assert sorted(index) == sorted(h for h, _, _ in updates)
+    assert not [n for n in os.listdir(str(cache_dir)) if 'temp' in n]
+
+
+@pytest.mark.usefixtures('config', 'builtin_mock')
+def test_failed_tarball_is_not_indexed(tmpdir, monkeypatch):
+    spec = Spec('libelf')
+    spec.concretize()
+    prefix = tmpdir.join('prefix')
+    prefix.ensure('.spack', 'spec.yaml').write(spec.to_yaml())
+    spec._set_test_prefix(str(prefix))
+    outdir = str(tmpdir.join('mirror'))
+
+    def failing_sign(*args):
+        raise bindist.NoGpgException()
+    monkeypatch.setattr(bindist, 'sign_tarball', failing_sign)
+
+    with pytest.raises(bindist.NoGpgException):
+        bindist.build_tarball(spec, outdir)
+
+    spackfile = os.path.join(
+        outdir, 'build_cache', bindist.tarball_path_name(spec, '.spack'))
+    assert not os.path.exists(spackfile)
+    index = os.path.join(outdir, 'build_cache', 'index.json')
+    assert not os.path.exists(index)
+
+    # Once the archive is complete, the spec is indexed
+    bindist.build_tarball(spec, outdir, force=True, yes_to_all=True)
+    assert os.path.exists(spackfile)
+    assert spec.dag_hash() in bindist.read_index_json('file://' + outdir)
+
+
+def _fake_download(tarball):
+    return os.path.basename(tarball) if 'patchelf' in tarball else None
+
+
+@pytest.mark.usefixtures('config', 'builtin_mock')
+@pytest.mark.disable_clean_stage_check
+def test_download_tarballs_concurrently(monkeypatch):
+    specs = [Spec('patchelf'), Spec('trivial-install-test-package')]
+    for spec in specs:
+        spec.concretize()
+
+    get_config = spack.config.get_config
+
+    def mirrors_config(section, *args, **kwargs):
+        if section == 'mirrors':
+            return {'test': 'file:///mirror'}
+        return get_config(section, *args, **kwargs)
+    monkeypatch.setattr(spack.config, 'get_config', mirrors_config)
+    monkeypatch.setattr(bindist, '_download_tarball_path', _fake_download)
+
+    tarballs = bindist.download_tarballs(specs, jobs=2)
+    assert tarballs == {
+        specs[0].dag_hash(): bindist.tarball_name(specs[0], '.spack'),
+        specs[1].dag_hash(): None}
+
+
 def test_relocate_text(tmpdir):
     # Validate the text path replacement
     old_dir = '/home/spack/opt/spack'
@@ -337,6 +491,84 @@ def test_elf_paths():
     assert out == ['/opt/lib', '/opt/lib64', '/opt/local/lib']
 
 
+def test_strings_contains_installroot(tmpdir, monkeypatch):
+    root = '/home/spack/opt/spack'
+    filename = str(tmpdir.join('data'))
+    with open(filename, 'wb') as f:
+        f.write(b'\0\1\2' + root.encode('utf-8') + b'\0\3')
+
+    assert strings_contains_installroot(filename, root)
+    assert not strings_contains_installroot(filename, '/other/root')
+
+    # The root must still be found when it spans two blocks
+    monkeypatch.setattr(spack.relocate, '_scan_block_size', 4)
+    assert strings_contains_installroot(filename, root)
+
+
+def test_get_filetype(tmpdir):
+    with tmpdir.as_cwd():
+        with open('script.sh', 'w') as f:
+            f.write('#!/bin/sh\necho hello\n')
+        with open('data', 'wb') as f:
+            f.write(b'\0\1\2\3')
+        os.symlink('script.sh', 'link')
+
+        assert needs_text_relocation(get_filetype('script.sh'))
+        assert not needs_text_relocation(get_filetype('data'))
+        assert not needs_text_relocation(get_filetype('link'))
+        assert not needs_binary_relocation(get_filetype('link'),
+                                           os_id='Linux')
+
+
+def test_get_filetype_java_class_is_not_macho(tmpdir):
+    with tmpdir.as_cwd():
+        # Java class files share the magic number of fat Mach-O files,
+        # followed by their version (here 52.0, Java 8)
+        with open('Hello.class', 'wb') as f:
+            f.write(b'\xca\xfe\xba\xbe\0\0\0\x34\0\x1d')
+        with open('fat', 'wb') as f:
+            f.write(b'\xca\xfe\xba\xbe\0\0\0\2' + b'\0' * 32)
+
+        assert not needs_binary_relocation(get_filetype('Hello.class'),
+                                           os_id='Darwin')
+        assert needs_binary_relocation(get_filetype('fat'), os_id='Darwin')
+
+
+def test_get_filetype_reads_whole_file(tmpdir, monkeypatch):
+    monkeypatch.setattr(spack.relocate, '_scan_block_size', 4)
+    with tmpdir.as_cwd():
+        with open('late-nul', 'wb') as f:
+            f.write(b'#!/bin/sh\n' + b'\0')
+        with open('text', 'wb') as f:
+            f.write(b'#!/bin/sh\necho hello\n')
+
+        assert not needs_text_relocation(get_filetype('late-nul'))
+        assert needs_text_relocation(get_filetype('text'))
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'),
+                    reason="only works with ELF objects")
+def test_relocate_elf_in_place(tmpdir):
+    exe = str(tmpdir.join('exe'))
+    shutil.copyfile(sys.executable, exe)
+    assert needs_binary_relocation(get_filetype(exe), os_id='Linux')
+
+    rpaths = get_existing_elf_rpaths(exe)
+    if not rpaths:
+        pytest.skip('{0} has no RPATH'.format(sys.executable))
+
+    # A shorter RPATH is written in place, without patchelf
+    new_rpaths = ['/' + 'x' * (len(rpaths[0]) - 1)]
+    modify_elf_object(exe, new_rpaths)
+    assert get_existing_elf_rpaths(exe) == new_rpaths
+    assert needs_binary_relocation(get_filetype(exe), os_id='Linux')
+
+    # A longer one doesn't fit
+    elf = ElfFile(exe)
+    assert elf.can_set_rpaths(new_rpaths)
+    assert not elf.can_set_rpaths(new_rpaths + ['/opt/lib'])
+
+
 @pytest.mark.skipif(sys.platform != 'darwin',
                     reason="only works with Mach-o objects")
 def test_relocate_macho(tmpdir):
@@ -22,7 +22,10 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
+import os
+
 import spack
+import spack.file_cache
 
 import pytest
 
@@ -74,3 +77,94 @@ def test_repo_pkg_with_unknown_namespace(repo_for_test):
 def test_repo_unknown_pkg(repo_for_test):
     with pytest.raises(spack.repository.UnknownPackageError):
         repo_for_test.get('builtin.mock.nonexistentpackage')
+
+
+@pytest.fixture()
+def empty_misc_cache(tmpdir, monkeypatch):
+    cache = spack.file_cache.FileCache(str(tmpdir.join('cache')))
+    monkeypatch.setattr(spack, 'misc_cache', cache)
+    return cache
+
+
+@pytest.mark.usefixtures('builtin_mock', 'empty_misc_cache')
+def test_package_metadata(repo_for_test):
+    metadata = repo_for_test.package_metadata('mpileaks')
+    pkg = repo_for_test.get('mpileaks')
+
+    assert metadata['description'] == pkg.__doc__
+    assert metadata['versions'] == [
+        str(v) for v in sorted(pkg.versions, reverse=True)]
+    assert sorted(metadata['variants']) == sorted(pkg.variants)
+    assert metadata['dependencies']['link'] == ['callpath', 'mpi']
+    assert metadata['provides'] == []
+
+    assert repo_for_test.package_metadata('mpich')['provides'] == ['mpi']
+
+    with pytest.raises(spack.repository.UnknownPackageError):
+        repo_for_test.package_metadata('builtin.mock.nonexistentpackage')
+
+
+@pytest.fixture()
+def builtin_repo():
+    """Uses the 'builtin' repository, whatever the module set up"""
+    builtin = spack.repository.RepoPath(spack.packages_path)
+    spack.repo.swap(builtin)
+    yield
+    spack.repo.swap(builtin)
+
+
+@pytest.mark.usefixtures('builtin_repo', 'empty_misc_cache')
+def test_package_metadata_of_repo_not_in_use(repo_for_test):
+    # Directives resolve dependencies against spack.repo: indexing a repo
+    # that isn't in use must not find the packages of another one instead
+    metadata = repo_for_test.package_metadata('patch-several-dependencies')
+    assert sorted(metadata['dependencies']['build']) == [
+        'fake', 'libdwarf', 'libelf']
+    assert spack.repo.get_repo('builtin.mock', None) is None
+
+
+def test_fast_package_checker_snapshot(tmpdir, monkeypatch):
+    cache = spack.file_cache.FileCache(str(tmpdir.join('cache')))
+    monkeypatch.setattr(spack, 'misc_cache', cache)
+    checker_cls = spack.repository.FastPackageChecker
+    monkeypatch.setattr(checker_cls, '_paths_cache', {})
+
+    packages = tmpdir.ensure('packages', dir=True)
+    for name in ('a', 'b'):
+        packages.ensure(name, 'package.py').setmtime(1000000000)
+    packages.setmtime(1000000000)
+    packages_path = str(packages)
+
+    checker = checker_cls(packages_path)
+    assert sorted(checker) == ['a', 'b']
+
+    # Other processes read the snapshot instead of scanning the repo
+    scanned = []
+    scan = checker_cls._scan_packages
+
+    def record_scan(self):
+        scanned.append(self.packages_path)
+        return scan(self)
+    monkeypatch.setattr(checker_cls, '_scan_packages', record_scan)
+
+    checker_cls._paths_cache.clear()
+    assert dict(checker_cls(packages_path)) == dict(checker)
+    assert not scanned
+
+    # Edits to packages are noticed
+    packages.join('b', 'package.py').setmtime(1000000001)
+    checker_cls._paths_cache.clear()
+    assert checker_cls(packages_path)['b'].st_mtime == 1000000001
+    assert scanned == [packages_path]
+
+    # And so are new packages
+    packages.ensure('c', 'package.py')
+    packages.setmtime(1000000002)
+    checker_cls._paths_cache.clear()
+    assert sorted(checker_cls(packages_path)) == ['a', 'b', 'c']
+    assert scanned == [packages_path] * 2
+
+    checker_cls.invalidate(packages_path)
+    assert packages_path not in checker_cls._paths_cache
+    assert not os.path.exists(
+        cache.cache_path(checker_cls._snapshot_key(packages_path)))
@@ -394,6 +394,12 @@ class TestSpecSyntax(object):
 
         self._check_raises(RedundantSpecError, redundant_specs)
 
+    def test_spec_by_hash_is_not_cached(self, database):
+        mpileaks_zmpi = database.mock.db.query_one('mpileaks ^zmpi')
+        string = '/' + mpileaks_zmpi.dag_hash()
+        assert sp.parse(string) == [mpileaks_zmpi]
+        assert not any(key[0] == string for key in sp._parse_cache)
+
     def test_duplicate_variant(self):
         duplicates = [
             'x@1.2+debug+debug',
@@ -539,6 +545,19 @@ class TestSpecSyntax(object):
             "^ _openmpi @1.2 : 1.4 , 1.6 % intel @ 12.1 : 12.6 + debug - qt_4 "
             "^ stackwalker @ 8.1_1e")
 
+    def test_lex_positions(self):
+        tokens = sp.SpecLexer().lex(['foo@1.2', 'cflags=-O2 -g', '+bar'])
+        assert [(t.type, t.value, t.start, t.end) for t in tokens] == [
+            (sp.ID, 'foo', 0, 3), (sp.AT, '@', 3, 4), (sp.ID, '1.2', 4, 7),
+            (sp.ID, 'cflags', 0, 6), (sp.EQ, '=', 6, 7),
+            (sp.VAL, '-O2 -g', 7, 13),
+            (sp.ON, '+', 0, 1), (sp.ID, 'bar', 1, 4)]
+
+    def test_lex_starts_in_first_mode(self):
+        lexer = sp.SpecLexer()
+        lexer.lex(['foo='])
+        assert [t.type for t in lexer.lex(['bar'])] == [sp.ID]
+
 
 @pytest.mark.parametrize('spec,anon_spec,spec_name', [
     ('openmpi languages=go', 'languages=go', 'openmpi'),
@@ -553,3 +572,16 @@ def test_parse_anonymous_specs(spec, anon_spec, spec_name):
 
     assert len(expected) == 1
     assert spec in expected
+
+
+def test_parse_cache_returns_copies():
+    string = 'mpileaks@1.2 cflags=-O2 ^callpath'
+    first = parse(string)
+    first[0].constrain('+debug')
+    first[0]['callpath'].constrain('@2.0')
+
+    second = parse(string)
+    assert second[0] is not first[0]
+    assert str(second[0]) == str(Spec(string))
+    assert 'debug' not in second[0].variants
+    assert second[0]['callpath'].versions == sp.VersionList(':')
@@ -27,8 +27,13 @@
 YAML format preserves DAG information in the spec.
 
 """
+import base64
+import hashlib
+import sys
 from collections import Iterable, Mapping
 
+import pytest
+
 import spack.util.spack_json as sjson
 import spack.util.spack_yaml as syaml
 from spack.spec import Spec
@@ -207,3 +212,91 @@ def reverse_all_dicts(data):
         return type(data)(reverse_all_dicts(elt) for elt in data)
     else:
         return data
+
+
+def yaml_dag_hash(spec):
+    """DAG hash of spec computed the original way, through the emitter."""
+    node = spec.to_node_dict(hash_function=yaml_dag_hash)
+    yaml_text = syaml.dump(
+        node, default_flow_style=True, width=syaml.max_width)
+    b32_hash = base64.b32encode(
+        hashlib.sha1(yaml_text.encode('utf-8')).digest()).lower()
+    if sys.version_info[0] >= 3:
+        b32_hash = b32_hash.decode('utf-8')
+    return b32_hash
+
+
+@pytest.mark.parametrize('spec_str,concretize', [
+    ('mpileaks', True),
+    ('mpileaks ^zmpi', True),
+    ('mpileaks+debug~opt', False),
+    ('dttop', True),
+    ('dtuse', True),
+    ('externaltest', True),
+    ('multivalue_variant foo=bar,baz', True),
+    ('multivalue_variant foo=bar,baz', False),
+    ('libelf cflags="-O3 -g" ldflags="-Wl,-rpath=/x -L/y"', True),
+    ('libelf@0.8.10:0.8.13,1.0 %gcc@4.5:', False),
+    ('libdwarf', False),
+])
+def test_dag_hash_matches_yaml_hash(config, builtin_mock, spec_str,
+                                    concretize):
+    spec = Spec(spec_str)
+    if concretize:
+        spec.concretize()
+    else:
+        spec.normalize()
+
+    for s in spec.traverse():
+        assert s.dag_hash() == yaml_dag_hash(s)
+
+
+def test_dag_hash_of_unusual_nodes(config, builtin_mock):
+    spec = Spec('externaltool')
+    spec.concretize()
+    spec._hash = None
+    spec._concrete = False
+
+    for path in ('/path with spaces/and: colon', 'true', '1.0', "it's",
+                 '#comment', u'/caf\xe9', '- dash', '[a, b]', 'x' * 300):
+        spec.external_path = path
+        assert spec.dag_hash() == yaml_dag_hash(spec)
+
+
+@pytest.mark.parametrize('data', [
+    {},
+    syaml_dict([('b', 1), ('a', [])]),
+    {'b': 1, 'a': {'d': None, 'c': True}},
+    syaml_dict([('x', ['1.0', '2', 'null', 'yes', '', ' a', 'a,b'])]),
+    syaml_dict([('k', [1, 2.5, False, None, {'q': [[], {}]}])]),
+    syaml_dict([('key: colon', 'value: colon'), ('?', '*star')]),
+    syaml_dict([('k' * 200, 'long key')]),
+    syaml_dict([('t', (1, 2))]),
+    syaml_dict([(u'unicode', u'caf\xe9')]),
+])
+def test_flow_dump_matches_emitter(data):
+    expected = syaml.dump(
+        data, default_flow_style=True, width=syaml.max_width)
+    # Twice, to go through the cache of rendered scalars
+    assert syaml.flow_dump(data) == expected
+    assert syaml.flow_dump(data) == expected
+
+
+def test_dag_hash_hashes_each_node_once(builtin_mock, monkeypatch):
+    spec = Spec('mpileaks')
+    spec.normalize()
+    assert not spec.concrete
+
+    calls = []
+    to_node_dict = Spec.to_node_dict
+
+    def counting_to_node_dict(self, *args, **kwargs):
+        calls.append(self.name)
+        return to_node_dict(self, *args, **kwargs)
+
+    monkeypatch.setattr(Spec, 'to_node_dict', counting_to_node_dict)
+
+    # mpich is a dependency of both mpileaks and callpath
+    spec.dag_hash()
+    assert sorted(calls) == sorted(s.name for s in spec.traverse(
+        deptype=('link', 'run')))
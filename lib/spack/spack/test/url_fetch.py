@@ -22,13 +22,16 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
+import hashlib
 import os
 import pytest
 
 from llnl.util.filesystem import working_dir, is_exe
 
 import spack
+import spack.stage
 from spack.fetch_strategy import from_list_url, URLFetchStrategy
+from spack.fetch_strategy import ChecksumError, FailedDownloadError
 from spack.spec import Spec
 from spack.version import ver
 import spack.util.crypto as crypto
@@ -39,15 +42,19 @@ def checksum_type(request):
     return request.param
 
 
+@pytest.mark.parametrize('fetch_method', ['curl', 'urllib'])
 @pytest.mark.parametrize('secure', [True, False])
 def test_fetch(
         mock_archive,
         secure,
         checksum_type,
+        fetch_method,
         config,
-        refresh_builtin_mock
+        refresh_builtin_mock,
+        monkeypatch
 ):
     """Fetch an archive and make sure we can checksum it."""
+    monkeypatch.setattr(spack, 'url_fetch_method', fetch_method)
     mock_archive.url
     mock_archive.path
 
@@ -107,3 +114,79 @@ def test_hash_detection(checksum_type):
 def test_unknown_hash(checksum_type):
     with pytest.raises(ValueError):
         crypto.Checker('a')
+
+
+def test_urllib_fetch_resumes_and_hashes(http_server, config, monkeypatch):
+    data = b''.join(str(i).encode('utf-8') for i in range(100000))
+    with open(os.path.join(http_server.root, 'foo-1.0.tar.gz'), 'wb') as f:
+        f.write(data)
+    digest = hashlib.sha256(data).hexdigest()
+
+    checksummed = []
+    checksum = crypto.checksum
+
+    def counting_checksum(hashlib_algo, filename, **kwargs):
+        checksummed.append(filename)
+        return checksum(hashlib_algo, filename, **kwargs)
+
+    monkeypatch.setattr(crypto, 'checksum', counting_checksum)
+    monkeypatch.setattr(spack, 'url_fetch_method', 'urllib')
+
+    fetcher = URLFetchStrategy(http_server.url + '/foo-1.0.tar.gz', digest)
+    with spack.stage.Stage(fetcher) as stage:
+        # An interrupted download left the first part of the archive
+        with open(stage.save_filename + '.part', 'wb') as f:
+            f.write(data[:1000])
+
+        stage.fetch()
+        assert http_server.ranges == [('/foo-1.0.tar.gz', 1000)]
+        assert not os.path.exists(stage.save_filename + '.part')
+        with open(stage.archive_file, 'rb') as f:
+            assert f.read() == data
+
+        # The archive was hashed while it was downloaded
+        stage.check()
+        assert checksummed == []
+
+        # ... but it is read again if it changed since
+        with open(stage.archive_file, 'ab') as f:
+            f.write(b'tampered')
+        with pytest.raises(ChecksumError):
+            stage.check()
+        assert checksummed == [stage.archive_file]
+
+
+def test_urllib_fetch_resumes_dropped_connection(
+        http_server, config, monkeypatch):
+    data = b''.join(str(i).encode('utf-8') for i in range(100000))
+    with open(os.path.join(http_server.root, 'foo-1.0.tar.gz'), 'wb') as f:
+        f.write(data)
+    digest = hashlib.sha256(data).hexdigest()
+    monkeypatch.setattr(spack, 'url_fetch_method', 'urllib')
+
+    fetcher = URLFetchStrategy(http_server.url + '/foo-1.0.tar.gz', digest)
+    with spack.stage.Stage(fetcher) as stage:
+        # The connection breaks in the middle of the transfer
+        http_server.drop_after = 1000
+        with pytest.raises(FailedDownloadError):
+            fetcher.fetch()
+        assert not os.path.exists(stage.save_filename)
+        with open(stage.save_filename + '.part', 'rb') as f:
+            assert f.read() == data[:1000]
+
+        # ... and the next fetch asks for the rest of the data only
+        fetcher.fetch()
+        assert http_server.ranges == [('/foo-1.0.tar.gz', 1000)]
+        assert not os.path.exists(stage.save_filename + '.part')
+        with open(stage.archive_file, 'rb') as f:
+            assert f.read() == data
+        stage.check()
+
+
+def test_urllib_fetch_missing_archive(http_server, config, monkeypatch):
+    monkeypatch.setattr(spack, 'url_fetch_method', 'urllib')
+    fetcher = URLFetchStrategy(http_server.url + '/foo-1.0.tar.gz')
+    with spack.stage.Stage(fetcher) as stage:
+        with pytest.raises(FailedDownloadError):
+            fetcher.fetch()
+        assert not os.listdir(stage.path)
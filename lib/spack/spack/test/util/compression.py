@@ -0,0 +1,78 @@
+##############################################################################
+# Copyright (c) 2013-2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/spack/spack
+# Please also see the NOTICE and LICENSE files for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""Tests for :py:class:`spack.util.compression.ParallelGzipWriter`"""
+import gzip
+import hashlib
+import os
+import tarfile
+
+import pytest
+
+from spack.util.compression import ParallelGzipWriter
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+@pytest.mark.parametrize('size', [0, 10, 1000])
+def test_parallel_gzip_roundtrip(tmpdir, jobs, size):
+    """Data written in many blocks is read back as a single stream."""
+    data = os.urandom(size) * 3
+    filename = str(tmpdir.join('data.gz'))
+    hasher = hashlib.sha256()
+    with open(filename, 'wb') as f:
+        with ParallelGzipWriter(f, jobs=jobs, block_size=64,
+                                hasher=hasher) as gzfile:
+            for i in range(0, len(data), 50):
+                gzfile.write(data[i:i + 50])
+
+    with open(filename, 'rb') as f:
+        assert hasher.hexdigest() == hashlib.sha256(f.read()).hexdigest()
+
+    f = gzip.open(filename, 'rb')
+    try:
+        assert f.read() == data
+    finally:
+        f.close()
+
+
+def test_parallel_gzip_tarball(tmpdir):
+    """tarfile reads tarballs compressed in several members."""
+    tmpdir.ensure('prefix', 'bin', 'exe').write('x' * 1000)
+    tmpdir.ensure('prefix', 'lib', 'lib.so').write('y' * 1000)
+
+    filename = str(tmpdir.join('prefix.tar.gz'))
+    with open(filename, 'wb') as f:
+        with ParallelGzipWriter(f, jobs=2, block_size=512) as gzfile:
+            tar = tarfile.open(fileobj=gzfile, mode='w|')
+            tar.add(str(tmpdir.join('prefix')), arcname='prefix')
+            tar.close()
+
+    tar = tarfile.open(filename, 'r')
+    try:
+        assert sorted(tar.getnames()) == [
+            'prefix', 'prefix/bin', 'prefix/bin/exe',
+            'prefix/lib', 'prefix/lib/lib.so']
+        assert tar.extractfile('prefix/lib/lib.so').read() == b'y' * 1000
+    finally:
+        tar.close()
@@ -23,10 +23,19 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
 """Tests for web.py."""
+import hashlib
 import os
+import shutil
+
+import pytest
 
 import spack
+import spack.file_cache
+import spack.stage
+import spack.util.web
+import llnl.util.tty as tty
 from spack.util.web import spider, find_versions_of_archive
+from spack.util.web import get_checksums_for_versions
 from spack.version import ver
 
 
@@ -160,3 +169,164 @@ def test_find_exotic_versions_of_archive_3():
     assert ver('2.0.0b2') in versions
     assert ver('3.0a1') in versions
     assert ver('4.5-rc5') in versions
+
+
+@pytest.fixture()
+def web_server(http_server, tmpdir, monkeypatch):
+    """Serves the test pages over HTTP, with an empty response cache."""
+    for name in os.listdir(web_data_path):
+        shutil.copy(os.path.join(web_data_path, name), http_server.root)
+    monkeypatch.setattr(spack, 'misc_cache', spack.file_cache.FileCache(
+        str(tmpdir.join('cache'))))
+    return http_server
+
+
+def test_spider_over_http(web_server):
+    url = web_server.url + '/'
+    pages, links = spider(url + 'index.html', depth=3)
+
+    assert sorted(pages) == sorted(
+        url + p for p in ('index.html', '1.html', '2.html', '3.html',
+                          '4.html'))
+    assert "This is page 4." in pages[url + '4.html']
+    assert url + 'foo-4.5.tar.gz' in links
+
+    # Pages are fetched once, with a single GET, and the links of each
+    # page are all followed over the same connection.
+    assert len(web_server.requests) == 5
+    assert all(method == 'GET' for method, _ in web_server.requests)
+    assert len(web_server.connections) < len(web_server.requests)
+
+
+def test_spider_bounds_concurrency(web_server):
+    root = os.path.join(web_server.root, 'many')
+    os.mkdir(root)
+    with open(os.path.join(root, 'index.html'), 'w') as f:
+        f.write('<html><body>\n')
+        for i in range(12):
+            f.write('<a href="page-{0}.html">{0}</a>\n'.format(i))
+            with open(os.path.join(root, 'page-{0}.html'.format(i)),
+                      'w') as p:
+                p.write('<html><body>Page {0}</body></html>'.format(i))
+        f.write('<a href="notes.txt">notes</a>\n')
+        f.write('</body></html>\n')
+    with open(os.path.join(root, 'notes.txt'), 'w') as f:
+        f.write('Not a web page')
+
+    web_server.delay = 0.05
+    url = web_server.url + '/many/'
+    pages, links = spider(url + 'index.html', depth=1, concurrency=3)
+
+    assert len(pages) == 13
+    assert url + 'notes.txt' in links
+    assert url + 'notes.txt' not in pages
+    assert 1 < web_server.max_in_flight <= 3
+    assert len(web_server.connections) <= 1 + 3
+
+
+def test_spider_response_cache(web_server):
+    url = web_server.url + '/index.html'
+    pages, links = spider(url, depth=3, cache_ttl=60)
+    assert len(web_server.requests) == 5
+
+    # Everything comes from the cache
+    web_server.reset()
+    assert spider(url, depth=3, cache_ttl=60) == (pages, links)
+    assert web_server.requests == []
+
+    # Without a cache, or when it expired, pages are fetched again
+    assert spider(url, depth=3) == (pages, links)
+    assert len(web_server.requests) == 5
+
+    web_server.reset()
+    assert spider(url, depth=3, cache_ttl=-1) == (pages, links)
+    assert len(web_server.requests) == 5
+
+
+def test_spider_missing_page_over_http(web_server):
+    pages, links = spider(web_server.url + '/missing.html', depth=1)
+    assert pages == {}
+    assert links == set()
+
+
+def test_checksums_for_versions_over_http(web_server, monkeypatch):
+    url = web_server.url + '/foo-{0}.tar.gz'
+    url_dict = {}
+    expected = {}
+    for v in ('1.0', '1.1', '1.2', '2.0'):
+        url_dict[ver(v)] = url.format(v)
+        if v == '2.0':
+            continue  # The newest version can't be downloaded
+        data = ('Archive of foo-{0}'.format(v) * 1000).encode('utf-8')
+        with open(os.path.join(web_server.root, 'foo-' + v + '.tar.gz'),
+                  'wb') as f:
+            f.write(data)
+        expected[v] = hashlib.md5(data).hexdigest()
+
+    first_stages = []
+
+    def first_stage_function(stage, url):
+        with open(stage.archive_file, 'rb') as f:
+            first_stages.append((url, f.read()))
+
+    monkeypatch.setattr(tty, 'get_number', lambda *args, **kwargs: 4)
+    web_server.delay = 0.05
+    version_lines = get_checksums_for_versions(
+        url_dict, 'foo', first_stage_function=first_stage_function, jobs=2)
+
+    assert version_lines.splitlines() == [
+        "    version('{0}', '{1}')".format(v, expected[v])
+        for v in ('1.2', '1.1', '1.0')]
+    assert 1 < web_server.max_in_flight <= 2
+
+    # The first archive that could be downloaded is inspected, once
+    assert len(first_stages) == 1
+    assert first_stages[0][0] == url.format('1.2')
+    assert hashlib.md5(first_stages[0][1]).hexdigest() == expected['1.2']
+
+
+def test_checksums_for_versions_destroys_stages(web_server, monkeypatch):
+    url = web_server.url + '/foo-{0}.tar.gz'
+    url_dict = {}
+    for v in ('1.0', '1.1', '1.2'):
+        url_dict[ver(v)] = url.format(v)
+        with open(os.path.join(web_server.root, 'foo-' + v + '.tar.gz'),
+                  'wb') as f:
+            f.write(('Archive of foo-{0}'.format(v)).encode('utf-8'))
+
+    live_stages = set()
+    stages_at_download = []
+    create, destroy = spack.stage.Stage.create, spack.stage.Stage.destroy
+    download = spack.util.web.download
+
+    def recording_create(stage):
+        live_stages.add(stage.path)
+        create(stage)
+
+    def recording_destroy(stage):
+        live_stages.discard(stage.path)
+        destroy(stage)
+
+    def recording_download(*args, **kwargs):
+        stages_at_download.append(len(live_stages))
+        return download(*args, **kwargs)
+
+    monkeypatch.setattr(spack.stage.Stage, 'create', recording_create)
+    monkeypatch.setattr(spack.stage.Stage, 'destroy', recording_destroy)
+    monkeypatch.setattr(spack.util.web, 'download', recording_download)
+    monkeypatch.setattr(tty, 'get_number', lambda *args, **kwargs: 3)
+
+    # Each archive is deleted as soon as it is checksummed
+    get_checksums_for_versions(url_dict, 'foo', jobs=1)
+    assert stages_at_download == [1, 1, 1]
+    assert not live_stages
+
+    # ... except the one inspected by first_stage_function, until then
+    inspected = []
+
+    def first_stage_function(stage, url):
+        inspected.append(os.path.exists(stage.archive_file))
+    get_checksums_for_versions(
+        url_dict, 'foo', first_stage_function=first_stage_function, jobs=1)
+    assert inspected == [True]
+    assert not live_stages
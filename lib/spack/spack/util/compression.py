@@ -24,7 +24,11 @@
 ##############################################################################
 import re
 import os
+import struct
+import zlib
+from collections import deque
 from itertools import product
+from multiprocessing.pool import ThreadPool
 from spack.util.executable import which
 
 # Supported archive extensions.
@@ -79,3 +83,93 @@ def extension(path):
         if re.search(suffix, path):
             return t
     return None
+
+
+def _gzip_member(data, level):
+    """Compress data into a complete gzip member (header, deflate stream
+       and trailer)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = compressor.compress(data) + compressor.flush()
+    # magic, deflate, no flags, no mtime, no extra flags, unknown OS
+    header = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+    trailer = struct.pack('<II', zlib.crc32(data) & 0xffffffff,
+                          len(data) & 0xffffffff)
+    return header + body + trailer
+
+
+class ParallelGzipWriter(object):
+    """Write-only file object that gzips its input with several threads.
+
+    The input is cut into blocks that are compressed independently, each
+    into its own gzip member.  A sequence of members is a valid gzip file:
+    ``gunzip``, ``tar`` and python's ``gzip`` and ``tarfile`` modules
+    read it as a single stream.  zlib releases the GIL while it
+    compresses, so threads are enough to use several cores.
+
+    Compressed data is written to ``fileobj`` in order.  If ``hasher``
+    is given (e.g. a ``hashlib`` object), it is updated with it as well,
+    so the checksum of the result is known without reading it back.
+    """
+
+    def __init__(self, fileobj, jobs=1, block_size=1024 * 1024, level=6,
+                 hasher=None):
+        self.fileobj = fileobj
+        self.jobs = max(1, jobs)
+        self.block_size = block_size
+        self.level = level
+        self.hasher = hasher
+
+        self._buffer = []
+        self._buffered = 0
+        self._written = False
+        self._pending = deque()
+        self._pool = ThreadPool(self.jobs) if self.jobs > 1 else None
+        self.closed = False
+
+    def write(self, data):
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.block_size:
+            self._submit()
+
+    def _submit(self):
+        data = b''.join(self._buffer)
+        self._buffer, self._buffered = [], 0
+        self._written = True
+
+        if self._pool is None:
+            self._output(_gzip_member(data, self.level))
+            return
+
+        # Bound the number of blocks in flight, to bound memory use
+        self._pending.append(
+            self._pool.apply_async(_gzip_member, (data, self.level)))
+        while len(self._pending) > 2 * self.jobs:
+            self._output(self._pending.popleft().get())
+
+    def _output(self, member):
+        self.fileobj.write(member)
+        if self.hasher is not None:
+            self.hasher.update(member)
+
+    def close(self):
+        """Flush all the data to ``fileobj``, which is not closed."""
+        if self.closed:
+            return
+        try:
+            # An empty input still has to produce a valid gzip file
+            if self._buffered or not self._written:
+                self._submit()
+            while self._pending:
+                self._output(self._pending.popleft().get())
+        finally:
+            self.closed = True
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
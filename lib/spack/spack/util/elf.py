@@ -0,0 +1,245 @@
+##############################################################################
+# Copyright (c) 2013-2017, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/spack/spack
+# Please also see the NOTICE and LICENSE files for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""Minimal ELF reader and writer for the RPATH of binaries.
+
+This knows just enough of the ELF format to find the dynamic section of
+a binary and the ``DT_RPATH`` / ``DT_RUNPATH`` strings it points to, so
+that binaries can be relocated without running ``patchelf`` on each of
+them.  Strings are rewritten in place, so the new RPATH can't be longer
+than the old one: callers have to fall back to ``patchelf`` when it is.
+"""
+import struct
+
+import spack.error
+
+__all__ = ['ElfFile', 'ElfParsingError', 'is_elf']
+
+ELF_MAGIC = b'\x7fELF'
+
+# Values of the fields we need from the ELF specification
+ELFCLASS32, ELFCLASS64 = 1, 2
+ELFDATA2LSB, ELFDATA2MSB = 1, 2
+ET_REL, ET_EXEC, ET_DYN, ET_CORE = 1, 2, 3, 4
+PT_LOAD, PT_DYNAMIC = 1, 2
+DT_NULL, DT_STRTAB, DT_RPATH, DT_RUNPATH = 0, 5, 15, 29
+
+_elf_types = {
+    ET_REL: 'relocatable',
+    ET_EXEC: 'executable',
+    ET_DYN: 'shared object',
+    ET_CORE: 'core file',
+}
+
+# struct formats of the header fields, program headers and dynamic
+# entries, for 32 and 64 bit files.
+_formats = {
+    ELFCLASS32: {
+        'header': '16sHHIIIIIHHHHHH',
+        'phdr': 'IIIIIIII',
+        'dyn': 'iI',
+    },
+    ELFCLASS64: {
+        'header': '16sHHIQQQIHHHHHH',
+        'phdr': 'IIQQQQQQ',
+        'dyn': 'qQ',
+    },
+}
+
+
+def is_elf(path):
+    """Whether the file at ``path`` starts with the ELF magic number."""
+    with open(path, 'rb') as f:
+        return f.read(len(ELF_MAGIC)) == ELF_MAGIC
+
+
+class ElfFile(object):
+    """The parts of an ELF file needed to read and rewrite its RPATH.
+
+    Attributes:
+        path (str): path of the file
+        elf_class (int): ``ELFCLASS32`` or ``ELFCLASS64``
+        elf_type (int): ``e_type`` field of the header (``ET_EXEC``, ...)
+        rpath_tag (int): ``DT_RPATH`` or ``DT_RUNPATH`` if the file has
+            one, else None.  If both are present, ``DT_RUNPATH`` wins,
+            as it does for the dynamic loader.
+        rpath_offset (int): file offset of the RPATH string
+        rpath (bytes): the RPATH string, without its terminating NUL
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rpath_tag = None
+        self.rpath_offset = None
+        self.rpath = None
+
+        with open(path, 'rb') as f:
+            self._parse(f)
+
+    def _parse(self, f):
+        ident = f.read(16)
+        if len(ident) < 16 or not ident.startswith(ELF_MAGIC):
+            raise ElfParsingError(self.path, 'not an ELF file')
+
+        self.elf_class = _byte(ident, 4)
+        data = _byte(ident, 5)
+        if self.elf_class not in _formats or data not in (ELFDATA2LSB,
+                                                          ELFDATA2MSB):
+            raise ElfParsingError(self.path, 'unsupported ELF class')
+        self._byte_order = '<' if data == ELFDATA2LSB else '>'
+        formats = _formats[self.elf_class]
+
+        f.seek(0)
+        header = self._unpack(f, formats['header'])
+        self.elf_type = header[1]
+        phoff, phentsize, phnum = header[5], header[9], header[10]
+
+        # Loadable segments map virtual addresses to file offsets; the
+        # dynamic segment holds the tags we are looking for.
+        loads, dynamic = [], None
+        for i in range(phnum):
+            f.seek(phoff + i * phentsize)
+            phdr = self._unpack(f, formats['phdr'])
+            if self.elf_class == ELFCLASS32:
+                p_type, p_offset, p_vaddr, p_filesz = (
+                    phdr[0], phdr[1], phdr[2], phdr[4])
+            else:
+                p_type, p_offset, p_vaddr, p_filesz = (
+                    phdr[0], phdr[2], phdr[3], phdr[5])
+
+            if p_type == PT_LOAD:
+                loads.append((p_vaddr, p_offset, p_filesz))
+            elif p_type == PT_DYNAMIC:
+                dynamic = (p_offset, p_filesz)
+
+        if dynamic is None:
+            # Statically linked or relocatable object: no RPATH
+            return
+
+        tags = {}
+        entry_size = struct.calcsize(self._byte_order + formats['dyn'])
+        offset, size = dynamic
+        for entry in range(size // entry_size):
+            f.seek(offset + entry * entry_size)
+            tag, value = self._unpack(f, formats['dyn'])
+            if tag == DT_NULL:
+                break
+            tags.setdefault(tag, value)
+
+        for tag in (DT_RUNPATH, DT_RPATH):
+            if tag in tags:
+                self.rpath_tag = tag
+                break
+        else:
+            return
+
+        if DT_STRTAB not in tags:
+            raise ElfParsingError(self.path, 'no string table')
+        strtab = self._vaddr_to_offset(tags[DT_STRTAB], loads)
+        self.rpath_offset = strtab + tags[self.rpath_tag]
+        f.seek(self.rpath_offset)
+        self.rpath = _read_cstring(f)
+
+    def _unpack(self, f, fmt):
+        fmt = self._byte_order + fmt
+        data = f.read(struct.calcsize(fmt))
+        try:
+            return struct.unpack(fmt, data)
+        except struct.error:
+            raise ElfParsingError(self.path, 'file is truncated')
+
+    def _vaddr_to_offset(self, vaddr, loads):
+        for p_vaddr, p_offset, p_filesz in loads:
+            if p_vaddr <= vaddr < p_vaddr + p_filesz:
+                return vaddr - p_vaddr + p_offset
+        raise ElfParsingError(
+            self.path, 'address %#x is not in a loaded segment' % vaddr)
+
+    @property
+    def type_description(self):
+        """Description of the file in the style of ``file -b``."""
+        bits = 32 if self.elf_class == ELFCLASS32 else 64
+        endianness = 'LSB' if self._byte_order == '<' else 'MSB'
+        return 'ELF %d-bit %s %s' % (
+            bits, endianness, _elf_types.get(self.elf_type, 'file'))
+
+    @property
+    def rpaths(self):
+        """The RPATH (or RUNPATH) of the file, as a list of paths."""
+        if not self.rpath:
+            return []
+        return self.rpath.decode('utf-8').split(':')
+
+    def can_set_rpaths(self, rpaths):
+        """Whether ``set_rpaths()`` can write ``rpaths`` in place."""
+        return (self.rpath is not None and
+                len(':'.join(rpaths).encode('utf-8')) <= len(self.rpath))
+
+    def set_rpaths(self, rpaths):
+        """Overwrite the RPATH string of the file with ``rpaths``.
+
+        The new string is padded with NULs to the length of the old one.
+
+        Raises:
+            ElfParsingError: if the file has no RPATH, or if the new one
+                is longer than the old one
+        """
+        if not self.can_set_rpaths(rpaths):
+            raise ElfParsingError(
+                self.path, 'no room to write the new RPATH in place')
+
+        new_rpath = ':'.join(rpaths).encode('utf-8')
+        padding = b'\0' * (len(self.rpath) - len(new_rpath))
+        with open(self.path, 'rb+') as f:
+            f.seek(self.rpath_offset)
+            f.write(new_rpath + padding)
+        self.rpath = new_rpath
+
+
+def _byte(data, index):
+    """Integer value of a byte in a bytes object, on python 2 and 3."""
+    return struct.unpack('B', data[index:index + 1])[0]
+
+
+def _read_cstring(f, chunk_size=1024):
+    """Read a NUL-terminated string from the current position of f."""
+    chunks = []
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        end = chunk.find(b'\0')
+        if end >= 0:
+            chunks.append(chunk[:end])
+            break
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+class ElfParsingError(spack.error.SpackError):
+    """Raised when an ELF file can't be read or rewritten."""
+
+    def __init__(self, path, message):
+        super(ElfParsingError, self).__init__(
+            'Cannot process ELF file %s: %s' % (path, message))
@@ -30,7 +30,12 @@
 - ``Our load methods use ``OrderedDict`` class instead of YAML's
   default unorderd dict.
 
+- ``flow_dump()`` writes the same text as ``dump()`` in flow style, for
+  the small documents Spack hashes, without going through the emitter.
+
 """
+import ctypes
+
 import yaml
 from yaml import Loader, Dumper
 from yaml.nodes import MappingNode, SequenceNode, ScalarNode
@@ -40,7 +45,13 @@ from ordereddict_backport import OrderedDict
 import spack.error
 
 # Only export load and dump
-__all__ = ['load', 'dump', 'SpackYAMLError']
+__all__ = ['load', 'dump', 'flow_dump', 'SpackYAMLError']
+
+#: Line width that keeps the emitter from ever wrapping a line.
+max_width = 2 ** (ctypes.sizeof(ctypes.c_int) * 8 - 1) - 1
+
+#: Maximum number of rendered scalars kept by ``flow_dump()``.
+_max_cached_scalars = 16384
 
 # Make new classes so we can add custom attributes.
 # Also, use OrderedDict instead of just dict.
@@ -218,6 +229,94 @@ def dump(*args, **kwargs):
     return yaml.dump(*args, **kwargs)
 
 
+# Rendered scalars, keyed by (is_key, type, value).  YAML quoting rules
+# are subtle, so the emitter itself renders each distinct scalar once.
+_scalar_cache = {}
+
+
+class _NotFlowDumpable(Exception):
+    """Raised when ``flow_dump()`` can't guarantee the emitter's output."""
+
+
+def _render_scalar(data, is_key):
+    cache_key = (is_key, type(data), data)
+    try:
+        return _scalar_cache[cache_key]
+    except KeyError:
+        pass
+    except TypeError:
+        # Unhashable value that isn't a list or a dict
+        raise _NotFlowDumpable()
+
+    # Render the scalar in the same context it will appear in: as the
+    # key of a flow mapping, or as an item of a flow sequence.
+    if is_key:
+        prefix, suffix, wrapped = '{', ': 0}\n', syaml_dict([(data, 0)])
+    else:
+        prefix, suffix, wrapped = '[', ']\n', [data]
+    text = dump(wrapped, default_flow_style=True, width=max_width)
+    if not (text.startswith(prefix) and text.endswith(suffix)):
+        raise _NotFlowDumpable()
+    text = text[len(prefix):-len(suffix)]
+    if not text or '\n' in text or (is_key and text.startswith('?')):
+        raise _NotFlowDumpable()
+
+    if len(_scalar_cache) >= _max_cached_scalars:
+        _scalar_cache.clear()
+    _scalar_cache[cache_key] = text
+    return text
+
+
+def _flow_parts(data, parts):
+    if type(data) in (dict, syaml_dict):
+        items = list(data.items())
+        if not isinstance(data, syaml_dict):
+            items.sort()
+        parts.append('{')
+        for i, (key, value) in enumerate(items):
+            if i:
+                parts.append(', ')
+            if isinstance(key, (dict, list, tuple)):
+                raise _NotFlowDumpable()
+            parts.append(_render_scalar(key, True))
+            parts.append(': ')
+            _flow_parts(value, parts)
+        parts.append('}')
+    elif type(data) in (list, syaml_list):
+        parts.append('[')
+        for i, item in enumerate(data):
+            if i:
+                parts.append(', ')
+            _flow_parts(item, parts)
+        parts.append(']')
+    elif isinstance(data, (dict, list, tuple)):
+        # Other containers get python tags from the emitter
+        raise _NotFlowDumpable()
+    else:
+        parts.append(_render_scalar(data, False))
+
+
+def flow_dump(data):
+    """Same as ``dump(data, default_flow_style=True, width=max_width)``.
+
+    Only mappings, lists and scalars are written directly: each distinct
+    scalar is still rendered by the YAML emitter, once, and anything
+    else goes through ``dump()``.  This is what ``Spec.dag_hash()`` uses
+    to serialize nodes, so the output has to stay byte-for-byte
+    identical to the emitter's.
+    """
+    if type(data) not in (dict, syaml_dict):
+        return dump(data, default_flow_style=True, width=max_width)
+
+    parts = []
+    try:
+        _flow_parts(data, parts)
+    except _NotFlowDumpable:
+        return dump(data, default_flow_style=True, width=max_width)
+    parts.append('\n')
+    return ''.join(parts)
+
+
 class SpackYAMLError(spack.error.SpackError):
     """Raised when there are issues with YAML parsing."""
     def __init__(self, msg, yaml_error):
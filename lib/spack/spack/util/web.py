@@ -26,14 +26,19 @@ from __future__ import print_function
 
 import re
 import os
+import socket
 import ssl
 import sys
+import threading
+import time
 import traceback
 import hashlib
 
+from six.moves import http_client
 from six.moves.urllib.request import urlopen, Request
-from six.moves.urllib.error import URLError
-from six.moves.urllib.parse import urljoin
+from six.moves.urllib.request import getproxies, proxy_bypass
+from six.moves.urllib.error import URLError, HTTPError
+from six.moves.urllib.parse import urljoin, urlparse
 import multiprocessing.pool
 
 try:
@@ -51,12 +56,32 @@ import llnl.util.tty as tty
 
 import spack
 import spack.error
+import spack.util.spack_json as sjson
 from spack.util.compression import ALLOWED_ARCHIVE_TYPES
 
 
 # Timeout in seconds for web requests
 _timeout = 10
 
+#: Maximum number of pages fetched at the same time by spider()
+_max_concurrency = 16
+
+#: Seconds during which pages scraped for new versions are cached
+_list_cache_ttl = 10 * 60
+
+#: Redirects followed by spider(), and how many of them in a row
+_redirect_codes = (301, 302, 303, 307, 308)
+_max_redirects = 10
+
+#: Errors raised by ssl when a certificate can't be verified
+_ssl_errors = (ssl.SSLError, getattr(ssl, 'CertificateError', ssl.SSLError))
+
+#: Bytes read at a time by download()
+_chunk_size = 64 * 1024
+
+#: User agent of the requests made by spider() and download()
+_user_agent = 'Spack/{0}'.format(spack.spack_version)
+
 
 class LinkParser(HTMLParser):
     """This parser just takes an HTML page and strips out the hrefs on the
@@ -73,125 +98,196 @@ class LinkParser(HTMLParser):
                     self.links.append(val)
 
 
-class NonDaemonProcess(multiprocessing.Process):
-    """Process tha allows sub-processes, so pools can have sub-pools."""
-    def _get_daemon(self):
-        return False
+class _ConnectionPool(object):
+    """Keep-alive HTTP(S) connections, shared by the threads of a spider.
 
-    def _set_daemon(self, value):
-        pass
+    Connections are kept per scheme and host, and each one is used by a
+    single thread at a time: ``get()`` takes an idle connection out of
+    the pool (or makes a new one), and ``put()`` gives it back once its
+    response has been read completely.
+    """
 
-    daemon = property(_get_daemon, _set_daemon)
+    def __init__(self, context=None):
+        self.context = context
+        self._idle = {}
+        self._lock = threading.Lock()
 
+    def get(self, scheme, netloc):
+        """Return a (connection, reused) tuple for a host."""
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop(), True
 
-class NonDaemonPool(multiprocessing.pool.Pool):
-    """Pool that uses non-daemon processes"""
-    Process = NonDaemonProcess
+        if scheme == 'https':
+            kwargs = {'timeout': _timeout}
+            if self.context is not None:
+                kwargs['context'] = self.context
+            return http_client.HTTPSConnection(netloc, **kwargs), False
+        return http_client.HTTPConnection(netloc, timeout=_timeout), False
 
+    def put(self, scheme, netloc, connection):
+        with self._lock:
+            self._idle.setdefault((scheme, netloc), []).append(connection)
 
-def _spider(url, visited, root, depth, max_depth, raise_on_error):
-    """Fetches URL and any pages it links to up to max_depth.
+    def close(self):
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle = {}
 
-       depth should initially be zero, and max_depth is the max depth of
-       links to follow from the root.
 
-       Prints out a warning only if the root can't be fetched; it ignores
-       errors with pages that the root links to.
+def _uses_proxy(parsed_url):
+    """Whether urllib would go through a proxy for this URL."""
+    proxies = getproxies()
+    return (parsed_url.scheme in proxies and
+            not proxy_bypass(parsed_url.hostname or ''))
 
-       Returns a tuple of:
-       - pages: dict of pages visited (URL) mapped to their full text.
-       - links: set of links encountered while visiting the pages.
+
+def _http_get(url, connections):
+    """GET a URL over a keep-alive connection, following redirects.
+
+    The body is only read for HTML pages: the connection is dropped
+    instead of downloading anything else.
+
+    Returns:
+        tuple: (response_url, content_type, page), where page is None if
+        the content is not HTML.
+
+    Raises:
+        URLError: if the page can't be fetched
     """
-    pages = {}     # dict from page URL -> text content.
-    links = set()  # set of all links seen on visited pages.
+    for redirect in range(_max_redirects + 1):
+        parsed = urlparse(url)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+        headers = {'User-Agent': _user_agent}
+
+        connection, reused = connections.get(parsed.scheme, parsed.netloc)
+        try:
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+            except (http_client.HTTPException, socket.error):
+                # The server may have closed an idle connection: try
+                # once more on a new one.
+                if not reused:
+                    raise
+                connection.close()
+                connection = connections.get(parsed.scheme, parsed.netloc)[0]
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+
+            content_type = response.getheader('Content-Type')
+            location = response.getheader('Location')
+            is_html = content_type and content_type.startswith('text/html')
+            if response.status in _redirect_codes or response.status >= 400 \
+                    or is_html:
+                body = response.read()
+            else:
+                # Don't download tarballs and gigantic files
+                connection.close()
+                return url, content_type, None
+
+        except (http_client.HTTPException, socket.error) + _ssl_errors as e:
+            connection.close()
+            raise URLError(e)
+
+        if response.will_close:
+            connection.close()
+        else:
+            connections.put(parsed.scheme, parsed.netloc, connection)
 
-    # root may end with index.html -- chop that off.
-    if root.endswith('/index.html'):
-        root = re.sub('/index.html$', '', root)
+        if response.status in _redirect_codes and location:
+            url = urljoin(url, location)
+            continue
+        if response.status >= 400:
+            raise HTTPError(url, response.status, response.reason,
+                            response.msg, None)
+        return url, content_type, body.decode('utf-8')
 
+    raise URLError('Too many redirects')
+
+
+def _urllib_get(url, context):
+    """GET a URL with urllib, for the schemes (and proxies) that
+    ``_http_get()`` doesn't handle.  Returns the same as ``_http_get()``.
+    """
+    response = _urlopen(Request(url), timeout=_timeout, context=context)
     try:
-        context = None
-        if sys.version_info < (2, 7, 9) or \
-                ((3,) < sys.version_info < (3, 4, 3)):
-            if not spack.insecure:
-                tty.warn("Spack will not check SSL certificates. You need to "
-                         "update your Python to enable certificate "
-                         "verification.")
-        else:
-            # We explicitly create default context to avoid error described in
-            # https://blog.sucuri.net/2016/03/beware-unverified-tls-certificates-php-python.html
-            context = ssl._create_unverified_context() \
-                if spack.insecure \
-                else ssl.create_default_context()
-
-        # Make a HEAD request first to check the content type.  This lets
-        # us ignore tarballs and gigantic files.
-        # It would be nice to do this with the HTTP Accept header to avoid
-        # one round-trip.  However, most servers seem to ignore the header
-        # if you ask for a tarball with Accept: text/html.
-        req = Request(url)
-        req.get_method = lambda: "HEAD"
-        resp = _urlopen(req, timeout=_timeout, context=context)
-
-        if "Content-type" not in resp.headers:
-            tty.debug("ignoring page " + url)
-            return pages, links
-
-        if not resp.headers["Content-type"].startswith('text/html'):
-            tty.debug("ignoring page " + url + " with content type " +
-                      resp.headers["Content-type"])
-            return pages, links
-
-        # Do the real GET request when we know it's just HTML.
-        req.get_method = lambda: "GET"
-        response = _urlopen(req, timeout=_timeout, context=context)
-        response_url = response.geturl()
-
-        # Read the page and and stick it in the map we'll return
-        page = response.read().decode('utf-8')
-        pages[response_url] = page
-
-        # Parse out the links in the page
-        link_parser = LinkParser()
-        subcalls = []
-        link_parser.feed(page)
-
-        while link_parser.links:
-            raw_link = link_parser.links.pop()
-            abs_link = urljoin(response_url, raw_link.strip())
-
-            links.add(abs_link)
-
-            # Skip stuff that looks like an archive
-            if any(raw_link.endswith(suf) for suf in ALLOWED_ARCHIVE_TYPES):
-                continue
+        content_type = response.headers.get('Content-type')
+        if not content_type or not content_type.startswith('text/html'):
+            return response.geturl(), content_type, None
+        return response.geturl(), content_type, response.read().decode(
+            'utf-8')
+    finally:
+        response.close()
 
-            # Skip things outside the root directory
-            if not abs_link.startswith(root):
-                continue
 
-            # Skip already-visited links
-            if abs_link in visited:
-                continue
+def _cache_key(url):
+    return 'web/{0}.json'.format(hashlib.sha1(url.encode('utf-8')).hexdigest())
 
-            # If we're not at max depth, follow links.
-            if depth < max_depth:
-                subcalls.append((abs_link, visited, root,
-                                 depth + 1, max_depth, raise_on_error))
-                visited.add(abs_link)
 
-        if subcalls:
-            pool = NonDaemonPool(processes=len(subcalls))
-            try:
-                results = pool.map(_spider_wrapper, subcalls)
+def _get_page(url, connections, cache_ttl):
+    """Fetch a page, from the response cache if it was fetched less than
+    ``cache_ttl`` seconds ago.  Returns the same as ``_http_get()``.
+    """
+    parsed = urlparse(url)
+    cacheable = cache_ttl and parsed.scheme in ('http', 'https', 'ftp')
+
+    if cacheable:
+        key = _cache_key(url)
+        try:
+            mtime = spack.misc_cache.mtime(key)
+            if mtime and time.time() - mtime < cache_ttl:
+                with spack.misc_cache.read_transaction(key) as f:
+                    entry = sjson.load(f)
+                if entry['url'] == url:
+                    return (entry['response_url'], entry['content_type'],
+                            entry['page'])
+        except Exception as e:
+            tty.debug('Ignoring cached response for {0}: {1}'.format(
+                url, str(e)))
+
+    if parsed.scheme in ('http', 'https') and not _uses_proxy(parsed):
+        result = _http_get(url, connections)
+    else:
+        result = _urllib_get(url, connections.context)
+
+    if cacheable:
+        response_url, content_type, page = result
+        entry = {'url': url, 'response_url': response_url,
+                 'content_type': content_type, 'page': page}
+        try:
+            with spack.misc_cache.write_transaction(key) as (old, new):
+                sjson.dump(entry, new)
+        except Exception as e:
+            tty.debug('Cannot cache response for {0}: {1}'.format(
+                url, str(e)))
+
+    return result
 
-                for sub_pages, sub_links in results:
-                    pages.update(sub_pages)
-                    links.update(sub_links)
 
-            finally:
-                pool.terminate()
-                pool.join()
+def _spider_page(url, connections, cache_ttl, raise_on_error):
+    """Fetch one page for ``_spider()``.
+
+    Returns (response_url, page), or None if the page can't be fetched
+    or is not HTML.  Errors are only reported in debug mode, except for
+    certificate problems.
+    """
+    try:
+        response_url, content_type, page = _get_page(
+            url, connections, cache_ttl)
+        if page is None:
+            if content_type is None:
+                tty.debug("ignoring page " + url)
+            else:
+                tty.debug("ignoring page " + url + " with content type " +
+                          content_type)
+            return None
+        return response_url, page
 
     except URLError as e:
         tty.debug(e)
@@ -205,27 +301,127 @@ def _spider(url, visited, root, depth, max_depth, raise_on_error):
         if raise_on_error:
             raise NoNetworkConnectionError(str(e), url)
 
-    except HTMLParseError as e:
-        # This error indicates that Python's HTML parser sucks.
-        msg = "Got an error parsing HTML."
-
-        # Pre-2.7.3 Pythons in particular have rather prickly HTML parsing.
-        if sys.version_info[:3] < (2, 7, 3):
-            msg += " Use Python 2.7.3 or newer for better HTML parsing."
-
-        tty.warn(msg, url, "HTMLParseError: " + str(e))
-
     except Exception as e:
         # Other types of errors are completely ignored, except in debug mode.
         tty.debug("Error in _spider: %s:%s" % (type(e), e),
                   traceback.format_exc())
 
+    return None
+
+
+def _spider(root_url, max_depth, concurrency, cache_ttl, raise_on_error):
+    """Fetches URL and any pages it links to up to max_depth.
+
+       Pages are fetched one level of links at a time, by up to
+       concurrency threads.  max_depth is the max depth of links to
+       follow from the root.
+
+       Prints out a warning only if the root can't be fetched; it ignores
+       errors with pages that the root links to.
+
+       Returns a tuple of:
+       - pages: dict of pages visited (URL) mapped to their full text.
+       - links: set of links encountered while visiting the pages.
+    """
+    pages = {}     # dict from page URL -> text content.
+    links = set()  # set of all links seen on visited pages.
+
+    # root may end with index.html -- chop that off.
+    root = root_url
+    if root.endswith('/index.html'):
+        root = re.sub('/index.html$', '', root)
+
+    connections = _ConnectionPool(_ssl_context())
+    pool = None
+    visited = set([root_url])
+    to_visit = [root_url]
+
+    def fetch(url):
+        return _spider_page(url, connections, cache_ttl, raise_on_error)
+
+    try:
+        for depth in range(max_depth + 1):
+            if len(to_visit) > 1 and concurrency > 1:
+                if pool is None:
+                    pool = multiprocessing.pool.ThreadPool(concurrency)
+                results = pool.map(fetch, to_visit)
+            else:
+                results = [fetch(url) for url in to_visit]
+
+            to_visit = []
+            for result in results:
+                if result is None:
+                    continue
+                response_url, page = result
+                pages[response_url] = page
+
+                # Parse out the links in the page
+                link_parser = LinkParser()
+                try:
+                    link_parser.feed(page)
+                except HTMLParseError as e:
+                    # This error indicates that Python's HTML parser sucks.
+                    msg = "Got an error parsing HTML."
+
+                    # Pre-2.7.3 Pythons in particular have rather prickly
+                    # HTML parsing.
+                    if sys.version_info[:3] < (2, 7, 3):
+                        msg += " Use Python 2.7.3 or newer for better HTML" \
+                               " parsing."
+
+                    tty.warn(msg, response_url, "HTMLParseError: " + str(e))
+
+                for raw_link in link_parser.links:
+                    abs_link = urljoin(response_url, raw_link.strip())
+
+                    links.add(abs_link)
+
+                    # Skip stuff that looks like an archive
+                    if any(raw_link.endswith(suf)
+                           for suf in ALLOWED_ARCHIVE_TYPES):
+                        continue
+
+                    # Skip things outside the root directory
+                    if not abs_link.startswith(root):
+                        continue
+
+                    # Skip already-visited links
+                    if abs_link in visited:
+                        continue
+
+                    # If we're not at max depth, follow links.
+                    if depth < max_depth:
+                        to_visit.append(abs_link)
+                        visited.add(abs_link)
+
+            if not to_visit:
+                break
+
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        connections.close()
+
     return pages, links
 
 
-def _spider_wrapper(args):
-    """Wrapper for using spider with multiprocessing."""
-    return _spider(*args)
+def _ssl_context():
+    """SSL context to open URLs with, or None if this python can't make
+    one (and therefore won't check certificates)."""
+    if sys.version_info < (2, 7, 9) or \
+            ((3,) < sys.version_info < (3, 4, 3)):
+        if not spack.insecure:
+            tty.warn("Spack will not check SSL certificates. You need to "
+                     "update your Python to enable certificate "
+                     "verification.")
+        return None
+
+    # We explicitly create default context to avoid error described in
+    # https://blog.sucuri.net/2016/03/beware-unverified-tls-certificates-php-python.html
+    return ssl._create_unverified_context() \
+        if spack.insecure \
+        else ssl.create_default_context()
 
 
 def _urlopen(*args, **kwargs):
@@ -237,20 +433,150 @@ def _urlopen(*args, **kwargs):
     return urlopen(*args, **kwargs)
 
 
-def spider(root_url, depth=0):
+def spider(root_url, depth=0, concurrency=None, cache_ttl=None):
     """Gets web pages from a root URL.
 
        If depth is specified (e.g., depth=2), then this will also follow
        up to <depth> levels of links from the root.
 
-       This will spawn processes to fetch the children, for much improved
-       performance over a sequential fetch.
+       Up to concurrency pages (default: ``_max_concurrency``) are
+       fetched at the same time, reusing one keep-alive connection per
+       host and thread.  If cache_ttl is given, pages fetched less than
+       cache_ttl seconds ago are taken from ``spack.misc_cache``.
 
     """
-    pages, links = _spider(root_url, set(), root_url, 0, depth, False)
+    pages, links = _spider(root_url, depth, concurrency or _max_concurrency,
+                           cache_ttl, False)
     return pages, links
 
 
+def read_if_modified(url, etag=None, last_modified=None):
+    """Fetch the content of a URL, unless it is unchanged.
+
+    The ``etag`` and ``last_modified`` validators of a previous response
+    are sent with the request, so the server can reply that the content
+    did not change instead of sending it again.
+
+    Returns:
+        tuple: (content, etag, last_modified), where content is None if
+        the server said the content did not change.  The validators are
+        those of the new response, or the ones given if it had none.
+
+    Raises:
+        URLError: if the URL can't be read (e.g. a 404)
+    """
+    request = Request(url)
+    if etag:
+        request.add_header('If-None-Match', etag)
+    if last_modified:
+        request.add_header('If-Modified-Since', last_modified)
+
+    try:
+        response = _urlopen(request, timeout=_timeout, context=_ssl_context())
+    except HTTPError as e:
+        if e.code == 304:
+            return None, etag, last_modified
+        raise
+
+    content = response.read()
+    headers = response.info()
+    return (content,
+            headers.get('ETag', etag),
+            headers.get('Last-Modified', last_modified))
+
+
+def download(url, path, hash_algorithm=None, resume=False):
+    """Download a URL to a file, hashing the data as it arrives.
+
+    The data is written to ``path + '.part'``, which is renamed to
+    ``path`` only once the download is complete, and kept if the
+    transfer fails, for a later call to resume from.  Redirects are
+    followed.
+
+    Args:
+        url (str): URL to download
+        path (str): file to save the data to
+        hash_algorithm (callable): constructor of a ``hashlib`` hash to
+            feed the data to, e.g. ``hashlib.md5``
+        resume (bool): if a ``.part`` file was left by an interrupted
+            download, ask the server for the rest of the data only
+
+    Returns:
+        tuple: (digest, content_type), where digest is the hex digest of
+        the data, or None if no hash_algorithm was given, and
+        content_type the ``Content-Type`` of the last response
+
+    Raises:
+        SpackWebError: if the URL can't be downloaded
+    """
+    hasher = hash_algorithm() if hash_algorithm else None
+    partial_file = path + '.part'
+
+    offset = 0
+    if resume and os.path.exists(partial_file):
+        offset = os.path.getsize(partial_file)
+
+    request = Request(url, headers={'User-Agent': _user_agent})
+    if offset:
+        request.add_header('Range', 'bytes={0}-'.format(offset))
+
+    try:
+        response = _urlopen(request, timeout=_timeout, context=_ssl_context())
+    except HTTPError as e:
+        if offset and e.code == 416:
+            # The partial file is no prefix of what the server has now
+            os.remove(partial_file)
+            return download(url, path, hash_algorithm)
+        raise SpackWebError('Failed to download {0}'.format(url), str(e))
+    except (URLError, socket.error, http_client.HTTPException) as e:
+        reason = getattr(e, 'reason', e)
+        if isinstance(reason, _ssl_errors):
+            raise SpackWebError(
+                'Failed to download {0}'.format(url),
+                "{0}. This is either an attack, or your cluster's SSL "
+                "configuration is bad.  If you believe your SSL "
+                "configuration is bad, you can try running spack -k, "
+                "which will not check SSL certificates. Use this at your "
+                "own risk.".format(reason))
+        raise SpackWebError('Failed to download {0}'.format(url), str(e))
+
+    try:
+        if offset and response.getcode() != 206:
+            # The server ignored the range and sends everything again
+            offset = 0
+
+        if offset and hasher:
+            with open(partial_file, 'rb') as f:
+                for chunk in iter(lambda: f.read(_chunk_size), b''):
+                    hasher.update(chunk)
+
+        received = 0
+        with open(partial_file, 'ab' if offset else 'wb') as f:
+            while True:
+                chunk = response.read(_chunk_size)
+                if not chunk:
+                    break
+                f.write(chunk)
+                received += len(chunk)
+                if hasher:
+                    hasher.update(chunk)
+
+        # Reading from a connection closed too early doesn't fail: it
+        # looks like the end of the data
+        length = response.headers.get('Content-Length')
+        if length and received < int(length):
+            raise http_client.IncompleteRead(b'', int(length) - received)
+        content_type = response.headers.get('Content-Type')
+    except (socket.error, http_client.HTTPException) as e:
+        # The data received so far is kept, to be resumed from
+        raise SpackWebError('Failed to download {0}'.format(url), str(e))
+    finally:
+        response.close()
+
+    os.rename(partial_file, path)
+    return (hasher.hexdigest() if hasher else None), content_type
+
+
 def find_versions_of_archive(archive_urls, list_url=None, list_depth=0):
     """Scrape web pages for new versions of a tarball.
 
@@ -285,7 +611,7 @@ def find_versions_of_archive(archive_urls, list_url=None, list_depth=0):
     pages = {}
     links = set()
     for lurl in list_urls:
-        pg, lnk = spider(lurl, depth=list_depth)
+        pg, lnk = spider(lurl, depth=list_depth, cache_ttl=_list_cache_ttl)
         pages.update(pg)
         links.update(lnk)
 
@@ -334,8 +660,76 @@ def find_versions_of_archive(archive_urls, list_url=None, list_depth=0):
     return versions
 
 
+class _ChecksumStages(object):
+    """Stages of the archives downloaded by
+    ``get_checksums_for_versions()``, each destroyed as soon as it is not
+    needed anymore."""
+
+    def __init__(self, keep_stage, inspect):
+        self.keep_stage = keep_stage
+        # Until an archive has been inspected, the archives downloaded
+        # so far are kept: any of them may be the one to inspect
+        self.inspect = inspect
+        self.stages = []
+        self.kept = []
+        self.lock = threading.Lock()
+
+    def download(self, url):
+        """Download an archive to a new stage and checksum it, in a
+        worker thread.
+
+        Returns:
+            tuple: (stage, checksum, None) on success, or (stage, None,
+            error message)
+        """
+        with self.lock:
+            # Creating the stage directories from several threads at
+            # once would race on their common parents
+            stage = spack.stage.Stage(url, keep=self.keep_stage)
+            stage.create()
+            self.stages.append(stage)
+
+        try:
+            checksum, content_type = download(
+                url, stage.save_filename, hashlib.md5)
+            result = stage, checksum, None
+        except SpackWebError as e:
+            result = stage, None, e.long_message or e.message
+        except Exception as e:
+            result = stage, None, str(e)
+
+        with self.lock:
+            if result[2] is None and self.inspect:
+                self.kept.append(stage)
+                return result
+        self.release(stage)
+        return result
+
+    def release(self, stage):
+        """Destroy a stage whose archive is not needed anymore."""
+        with self.lock:
+            if stage in self.kept:
+                self.kept.remove(stage)
+        if not self.keep_stage:
+            stage.destroy()
+
+    def inspected(self):
+        """Destroy the stages kept for inspection, and the next ones as
+        soon as they are downloaded."""
+        with self.lock:
+            self.inspect = False
+            kept, self.kept = self.kept, []
+        for stage in kept:
+            self.release(stage)
+
+    def release_all(self):
+        for stage in self.stages:
+            self.release(stage)
+
+
 def get_checksums_for_versions(
-        url_dict, name, first_stage_function=None, keep_stage=False):
+        url_dict, name, first_stage_function=None, keep_stage=False,
+        jobs=None):
     """Fetches and checksums archives from URLs.
 
     This function is called by both ``spack checksum`` and ``spack
@@ -343,12 +737,19 @@ def get_checksums_for_versions(
     inspect the first downloaded archive, e.g., to determine the build
     system.
 
+    Up to ``jobs`` archives are downloaded at the same time, and each is
+    checksummed while it is downloaded.  Unless ``keep_stage`` is set,
+    an archive is deleted as soon as it is checksummed, or once the
+    first archive has been inspected if it may be that one.
+
     Args:
         url_dict (dict): A dictionary of the form: version -> URL
         name (str): The name of the package
         first_stage_function (callable): function that takes a Stage and a URL;
             this is run on the stage of the first URL downloaded
         keep_stage (bool): whether to keep staging area when command completes
+        jobs (int): maximum number of concurrent downloads (default:
+            ``_max_concurrency``)
 
     Returns:
         (str): A multi-line string containing versions and corresponding hashes
@@ -378,27 +779,38 @@ def get_checksums_for_versions(
     urls = [url_dict[v] for v in versions]
 
     tty.msg("Downloading...")
+    stages = _ChecksumStages(keep_stage, first_stage_function is not None)
     version_hashes = []
-    i = 0
-    for url, version in zip(urls, versions):
+    try:
+        jobs = max(1, min(jobs or _max_concurrency, len(urls)))
+        pool = multiprocessing.pool.ThreadPool(jobs)
         try:
-            with spack.stage.Stage(url, keep=keep_stage) as stage:
-                # Fetch the archive
-                stage.fetch()
-                if i == 0 and first_stage_function:
-                    # Only run first_stage_function the first time,
-                    # no need to run it every time
-                    first_stage_function(stage, url)
-
-                # Checksum the archive and add it to the list
-                version_hashes.append((version, spack.util.crypto.checksum(
-                    hashlib.md5, stage.archive_file)))
-                i += 1
-        except spack.stage.FailedDownloadError:
-            tty.msg("Failed to fetch {0}".format(url))
-        except Exception as e:
-            tty.msg("Something failed on {0}, skipping.".format(url),
-                    "  ({0})".format(e))
+            results = pool.imap(stages.download, urls)
+            for i, (stage, checksum, error) in enumerate(results):
+                version, url = versions[i], urls[i]
+                if error is not None:
+                    tty.msg("Failed to fetch {0}".format(url), "  " + error)
+                    continue
+
+                if stages.inspect:
+                    # Only run first_stage_function on the first archive
+                    # that was downloaded, in version order
+                    try:
+                        first_stage_function(stage, url)
+                    except Exception as e:
+                        tty.msg(
+                            "Something failed on {0}, skipping.".format(url),
+                            "  ({0})".format(e))
+                        stages.release(stage)
+                        continue
+                    stages.inspected()
+
+                version_hashes.append((version, checksum))
+        finally:
+            pool.terminate()
+            pool.join()
+    finally:
+        stages.release_all()
 
     if not version_hashes:
         tty.die("Could not fetch any versions for {0}".format(name))
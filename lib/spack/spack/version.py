@@ -670,7 +670,10 @@ class VersionList(object):
             return None
 
     def copy(self):
-        return VersionList(self)
+        # Already sorted and non-redundant: no need to add() each version
+        clone = VersionList()
+        clone.versions = list(self.versions)
+        return clone
 
     def lowest(self):
         """Get the lowest version in the list."""